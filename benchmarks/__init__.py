@@ -0,0 +1,10 @@
+"""Benchmarks of the processing of the input JSON file
+
+This package contains the following modules:
+    * bench_decoder - measures the throughput of the decoding of the input lines
+    * generate_input - generates synthetic input JSON files with beacons readings
+    * bench_pipeline - measures a whole run, and every stage on its own, and writes a
+    machine-readable report
+    * bench_import - measures the startup of a run with a tiny input, and the modules
+    it imports, with `python -X importtime`
+"""
@@ -0,0 +1,116 @@
+"""Measures the throughput of the decoding of the lines of the input JSON file
+
+Compares, in lines per second, the json + pydantic path of
+`BaseStorage.parse_text_line()` with the fast decoder of `src.decoders`, and the whole
+line loop of `BaseStorage._iter_json_documents()` with and without the fast decoder.
+Finally, compares the reading of an input JSON file in text mode with the reading of
+the memory-mapped file, both with the fast decoder.
+
+Usage:
+    python benchmarks/bench_decoder.py [--lines LINES_COUNT]
+"""
+
+import argparse
+import inspect
+import os
+import random
+import sys
+import tempfile
+import time
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(
+        os.path.abspath(inspect.getfile(inspect.currentframe()))
+    )
+    parent_dir = os.path.dirname(current_dir)
+
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+    from src import constants
+    from src import decoders
+    from src.base_storage import BaseStorage
+    from src.options import InputOptions
+
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the decoding of the input lines"
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=200000,
+        help="number of lines of the generated input (default: 200000)",
+    )
+    lines_count = parser.parse_args().lines
+    random.seed(0)
+    lines = [
+        f'{{"BeaconId":{random.randint(100, 999)},'
+        f'"ant_id":{random.choice(constants.ANTENNA_IDS)},'
+        f'"dbm_ant":{random.uniform(-135, 0)!r},'
+        f'"timestamp":"2016-11-22T09:{random.randint(0, 59):02d}:00.000Z"}}'
+        for _ in range(lines_count)
+    ]
+
+    def measure(name, function):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<40} {lines_count / elapsed:>12,.0f} lines/sec")
+
+    input_lines = ["[", *(f"  {line}," for line in lines), "]"]
+    input_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    with input_file:
+        input_file.write("\n".join(input_lines))
+
+    storage = BaseStorage(
+        "", None, constants.DEFAULT_DBM_ANT_VALUE, constants.ANTENNA_IDS
+    )
+    fast_storage = BaseStorage(
+        "",
+        None,
+        constants.DEFAULT_DBM_ANT_VALUE,
+        constants.ANTENNA_IDS,
+        InputOptions(fast_decoder=True),
+    )
+    text_file_storage = BaseStorage(
+        input_file.name,
+        None,
+        constants.DEFAULT_DBM_ANT_VALUE,
+        constants.ANTENNA_IDS,
+        InputOptions(fast_decoder=True),
+    )
+    mapped_file_storage = BaseStorage(
+        input_file.name,
+        None,
+        constants.DEFAULT_DBM_ANT_VALUE,
+        constants.ANTENNA_IDS,
+        InputOptions(fast_decoder=True, memory_map=True),
+    )
+
+    measure(
+        "json + pydantic (parse_text_line)",
+        lambda: [storage.parse_text_line(line, 1) for line in lines],
+    )
+    measure(
+        "fast decoder (decode_line)",
+        lambda: [decoders.decode_line(line) for line in lines],
+    )
+    measure(
+        "line loop, json + pydantic",
+        lambda: list(storage._iter_json_documents(input_lines)),
+    )
+    measure(
+        "line loop, fast decoder",
+        lambda: list(fast_storage._iter_json_documents(input_lines)),
+    )
+    try:
+        measure(
+            "file, text mode, fast decoder",
+            lambda: list(text_file_storage._iter_input_json_documents()),
+        )
+        measure(
+            "file, memory-mapped, fast decoder",
+            lambda: list(mapped_file_storage._iter_input_json_documents()),
+        )
+    finally:
+        os.remove(input_file.name)
@@ -0,0 +1,254 @@
+"""Measures the startup of a run with a tiny input, and the modules it imports
+
+Small input JSON files are often processed in tight loops, where the time spent
+importing the modules dominates the run. For every storage engine, a tiny synthetic
+input JSON file (generated with `benchmarks.generate_input`) is processed several times
+by `bin/extract_beacons_vectors.py`, in a new interpreter started with
+`python -X importtime`, and are measured:
+
+    * the median wall time of the whole run
+    * the median time spent importing modules, as reported by `-X importtime`
+    * the cumulative import time of the heavy dependencies (h5py, numpy, pydantic and
+    ujson) that were imported by the run
+
+The results are written to a JSON report, together with the commit and the Python
+version, so the reports of different commits can be compared.
+
+Usage:
+    python benchmarks/bench_import.py [OPTIONS]
+
+Example:
+    python benchmarks/bench_import.py -e lite -e memory -e hdf5 --repeat 10
+"""
+
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+HEAVY_MODULES = ("h5py", "numpy", "pydantic", "ujson")
+
+
+def _parse_importtime(stderr: str) -> typing.Tuple[int, typing.Dict[str, int]]:
+    """Parses the report of `-X importtime`
+
+    Every imported module is reported in a line with the following format:
+    import time: self [us] | cumulative | imported package
+
+    Parameters
+    ----------
+    stderr : str
+        The standard error of the run
+
+    Returns
+    -------
+    typing.Tuple[int, typing.Dict[str, int]]
+        the total microseconds spent importing modules, and the cumulative
+        microseconds of every imported heavy dependency.
+    """
+
+    total_us = 0
+    heavy_modules_us = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_us, cumulative_us, module_name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # The header of the report
+            continue
+
+        total_us += int(self_us)
+        module_name = module_name.strip()
+        if module_name in HEAVY_MODULES:
+            heavy_modules_us[module_name] = int(cumulative_us)
+
+    return total_us, heavy_modules_us
+
+
+def run_engine(
+    engine: str,
+    input_file_path: str,
+    main_args: typing.List[str],
+    repeat: int,
+) -> typing.Dict[str, typing.Any]:
+    """Processes the input JSON file several times with an engine, in new processes
+
+    Parameters
+    ----------
+    engine : str
+        The storage engine
+    input_file_path : str
+        The input JSON file
+    main_args : typing.List[str]
+        Extra arguments of the command line, used to configure the run
+    repeat : int
+        Number of runs
+
+    Returns
+    -------
+    typing.Dict[str, typing.Any]
+        the median wall time and import time in seconds, and the heavy dependencies
+        imported by the runs.
+    """
+
+    script_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "bin",
+        "extract_beacons_vectors.py",
+    )
+    wall_times = []
+    import_times = []
+    heavy_modules_us = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as output_directory_path:
+            start = time.perf_counter()
+            completed_process = subprocess.run(
+                [
+                    sys.executable,
+                    "-X",
+                    "importtime",
+                    script_path,
+                    *main_args,
+                    "-e",
+                    engine,
+                    input_file_path,
+                    output_directory_path,
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=True,
+                text=True,
+            )
+            wall_times.append(time.perf_counter() - start)
+
+        total_us, heavy_modules_us = _parse_importtime(completed_process.stderr)
+        import_times.append(total_us / 1e6)
+
+    return {
+        "wall_time_s": round(statistics.median(wall_times), 4),
+        "import_time_s": round(statistics.median(import_times), 4),
+        "heavy_modules_ms": {
+            module_name: round(cumulative_us / 1000, 1)
+            for module_name, cumulative_us in heavy_modules_us.items()
+        },
+    }
+
+
+def init_argparse() -> argparse.ArgumentParser:
+    """Initialize an arguments parser, to parse the command line's arguments
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        arguments parser to be used to process command line arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Measure the startup of a run, and the modules it imports"
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=1000,
+        help="number of records of the generated input (default: 1000)",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        action="append",
+        dest="engines",
+        help="storage engine to measure. It can be used more than once "
+        "(default: lite and hdf5)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="number of runs of every engine (default: 5)",
+    )
+    parser.add_argument(
+        "--main-args",
+        default="",
+        help="extra arguments of the command line used in every run",
+    )
+    parser.add_argument(
+        "--report",
+        default="bench_import_report.json",
+        help="path of the JSON report (default: bench_import_report.json)",
+    )
+    return parser
+
+
+def run_benchmarks(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """Runs every engine, and builds the report
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        contains the user supplied command line arguments
+
+    Returns
+    -------
+    typing.Dict[str, typing.Any]
+        the report.
+    """
+
+    from benchmarks.bench_pipeline import _git_commit
+    from benchmarks.generate_input import generate_input
+
+    main_args = shlex.split(args.main_args)
+    engines = args.engines or ["lite", "hdf5"]
+    results = []
+    with tempfile.TemporaryDirectory() as input_directory_path:
+        input_file_path = os.path.join(input_directory_path, "input.json")
+        generate_input(input_file_path, args.records)
+        input_bytes = os.path.getsize(input_file_path)
+        for engine in engines:
+            result = run_engine(engine, input_file_path, main_args, args.repeat)
+            results.append({"engine": engine, **result})
+            heavy_modules = ", ".join(
+                f"{module_name} {cumulative_ms} ms"
+                for module_name, cumulative_ms in result["heavy_modules_ms"].items()
+            )
+            print(
+                f"{engine:<12} {result['wall_time_s']:>8.3f} s wall "
+                f"{result['import_time_s']:>8.3f} s imports   {heavy_modules or '-'}"
+            )
+
+    return {
+        "commit": _git_commit(os.path.dirname(os.path.abspath(__file__))),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "input": {"records": args.records, "bytes": input_bytes},
+        "main_args": main_args,
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(
+        os.path.abspath(inspect.getfile(inspect.currentframe()))
+    )
+    parent_dir = os.path.dirname(current_dir)
+
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+    arguments = init_argparse().parse_args()
+    report = run_benchmarks(arguments)
+    with open(arguments.report, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+
+    print(f"The report was written to '{arguments.report}'")
@@ -0,0 +1,429 @@
+"""Measures a whole run, and every stage of it on its own, with a synthetic input
+
+A synthetic input JSON file is generated with `benchmarks.generate_input` (or an
+existing one is used), and for every storage engine are measured:
+
+    * parse - the reading, decoding and validation of the input JSON file
+    * aggregate - the aggregation of the already parsed readings, until every beacon
+    vector is built, without writing them
+    * write - the serialization and writing of the already built results records
+    * main - the whole run of `main.main()`
+
+Every case runs in its own process, so its peak RSS isn't affected by the other ones.
+The wall time, the records per second (input records for parse, aggregate and main,
+and results records for write) and the peak RSS of every case are written to a JSON
+report, together with the commit, the Python version and the generator parameters,
+so the reports of different commits can be compared.
+
+Usage:
+    python benchmarks/bench_pipeline.py [OPTIONS]
+
+Example:
+    python benchmarks/bench_pipeline.py --records 3000000 -e memory -e columnar \\
+        --main-args="--fast-decoder" --report report.json
+"""
+
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+CASES = ("parse", "aggregate", "write", "main")
+
+
+def _peak_rss_mb() -> float:
+    """Gets the peak resident set size of the process and of its children
+
+    Returns
+    -------
+    float
+        the peak RSS in megabytes.
+    """
+
+    peak_rss_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in kilobytes in Linux, and in bytes in macOS:
+    if sys.platform == "darwin":
+        peak_rss_kb //= 1024
+
+    return round(peak_rss_kb / 1024, 1)
+
+
+def _git_commit(directory: str) -> typing.Optional[str]:
+    """Gets the commit checked out in a directory
+
+    Parameters
+    ----------
+    directory : str
+        A directory of the git repository
+
+    Returns
+    -------
+    typing.Optional[str]
+        the commit hash, with the suffix '-dirty' if there are uncommitted changes, or
+        None if it can't be found.
+    """
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=directory,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=directory,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return f"{commit}-dirty" if status else commit
+
+
+def run_case(
+    case: str, engine: str, input_file_path: str, main_args: typing.List[str]
+) -> typing.Dict[str, typing.Any]:
+    """Runs a benchmark case in the current process
+
+    Parameters
+    ----------
+    case : str
+        One of CASES
+    engine : str
+        The storage engine
+    input_file_path : str
+        The input JSON file
+    main_args : typing.List[str]
+        Extra arguments of the command line, used to configure the run
+
+    Returns
+    -------
+    typing.Dict[str, typing.Any]
+        the wall time in seconds, the number of processed records, and the peak RSS.
+    """
+
+    from src import compressed_input
+    from src import constants
+    from src import main
+    from src import planner
+    from src import utils
+    from src.output_processor import OutputProcessor
+
+    class CollectingOutputProcessor(OutputProcessor):
+        """Keeps the results records in memory, instead of writing them"""
+
+        def __init__(self):
+            super().__init__(os.devnull)
+            self.records = []
+
+        def initialize(self) -> None:
+            pass
+
+        def close(self) -> None:
+            pass
+
+        def persist_record(self, record) -> None:
+            self.records.append(record)
+
+    with tempfile.TemporaryDirectory() as output_directory_path:
+        args = utils.init_argparse().parse_args(
+            [*main_args, "-e", engine, input_file_path, output_directory_path]
+        )
+        if not utils.validate_antenna_schema(args):
+            raise ValueError(f"Invalid antennas schema in: {main_args}")
+
+        planner.plan_execution(args)
+        args.compression = compressed_input.detect_compression(input_file_path)
+
+        if case == "main":
+            start = time.perf_counter()
+            main.main(
+                [*main_args, "-e", engine, input_file_path, output_directory_path]
+            )
+            wall_time = time.perf_counter() - start
+            records_count = None
+        else:
+            output_processor = CollectingOutputProcessor()
+            storage = main.create_storage(args, input_file_path, output_processor)
+            start = time.perf_counter()
+            json_documents = list(storage._iter_input_json_documents())
+            wall_time = time.perf_counter() - start
+            records_count = len(json_documents)
+
+        if case in ("aggregate", "write"):
+            start = time.perf_counter()
+            with storage:
+                for json_document in json_documents:
+                    storage._process_json_record(json_document)
+
+                storage.persist_beacons_vectors_to_results_file()
+
+            wall_time = time.perf_counter() - start
+
+        if case == "write":
+            del json_documents
+            records = output_processor.records
+            results_output_processor = OutputProcessor(
+                os.path.join(output_directory_path, constants.RESULTS_FILE_NAME),
+                args.output_format,
+            )
+            start = time.perf_counter()
+            results_output_processor.initialize()
+            for record in records:
+                results_output_processor.persist_record(record)
+
+            results_output_processor.close()
+            wall_time = time.perf_counter() - start
+            records_count = len(records)
+
+    return {
+        "wall_time_s": round(wall_time, 4),
+        "records": records_count,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_case_in_subprocess(
+    case: str,
+    engine: str,
+    input_file_path: str,
+    main_args: typing.List[str],
+    verbose: bool,
+) -> typing.Dict[str, typing.Any]:
+    """Runs a benchmark case in a new process of this script
+
+    Parameters
+    ----------
+    case : str
+        One of CASES
+    engine : str
+        The storage engine
+    input_file_path : str
+        The input JSON file
+    main_args : typing.List[str]
+        Extra arguments of the command line, used to configure the run
+    verbose : bool
+        When True, the logs of the run are shown
+
+    Returns
+    -------
+    typing.Dict[str, typing.Any]
+        the results of the case.
+    """
+
+    completed_process = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--run-case",
+            case,
+            "--engine",
+            engine,
+            "--input",
+            input_file_path,
+            f"--main-args={shlex.join(main_args)}",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL,
+        check=True,
+        text=True,
+    )
+    return json.loads(completed_process.stdout.splitlines()[-1])
+
+
+def init_argparse() -> argparse.ArgumentParser:
+    """Initialize an arguments parser, to parse the command line's arguments
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        arguments parser to be used to process command line arguments
+    """
+
+    from benchmarks.generate_input import add_generator_arguments
+
+    parser = argparse.ArgumentParser(
+        description="Measure a run, and every stage of it, with a synthetic input"
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=200000,
+        help="number of records of the generated input (default: 200000)",
+    )
+    parser.add_argument(
+        "--input",
+        help="use an existing input JSON file, instead of generating one",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        action="append",
+        dest="engines",
+        help="storage engine to measure. It can be used more than once "
+        "(default: memory)",
+    )
+    parser.add_argument(
+        "--case",
+        action="append",
+        dest="cases",
+        choices=CASES,
+        help="case to measure. It can be used more than once (default: all)",
+    )
+    parser.add_argument(
+        "--main-args",
+        default="",
+        help="extra arguments of the command line used in every case, e.g. "
+        "--main-args='--fast-decoder --format compact'",
+    )
+    parser.add_argument(
+        "--report",
+        default="bench_report.json",
+        help="path of the JSON report (default: bench_report.json)",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the logs")
+    parser.add_argument("--run-case", choices=CASES, help=argparse.SUPPRESS)
+    add_generator_arguments(parser)
+    return parser
+
+
+def run_benchmarks(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """Runs every case for every engine, and builds the report
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        contains the user supplied command line arguments
+
+    Returns
+    -------
+    typing.Dict[str, typing.Any]
+        the report.
+    """
+
+    from benchmarks.generate_input import generate_input
+
+    main_args = shlex.split(args.main_args)
+    engines = args.engines or ["memory"]
+    cases = args.cases or list(CASES)
+    generator_parameters = None
+    with tempfile.TemporaryDirectory() as input_directory_path:
+        input_file_path = args.input
+        if input_file_path is None:
+            generator_parameters = {
+                "records": args.records,
+                "beacons": args.beacons,
+                "antenna_ids": args.antenna_ids,
+                "disorder_window": args.disorder_window,
+                "missing_rate": args.missing_rate,
+                "duplicate_rate": args.duplicate_rate,
+                "malformed_rate": args.malformed_rate,
+                "layout": args.layout,
+                "seed": args.seed,
+            }
+            input_file_path = os.path.join(input_directory_path, "input.json")
+            generate_input(
+                input_file_path,
+                args.records,
+                args.beacons,
+                args.antenna_ids,
+                args.disorder_window,
+                args.missing_rate,
+                args.duplicate_rate,
+                args.malformed_rate,
+                args.layout,
+                args.seed,
+            )
+
+        results = []
+        input_records_count = None
+        for engine in engines:
+            for case in cases:
+                result = _run_case_in_subprocess(
+                    case, engine, input_file_path, main_args, args.verbose
+                )
+                if case == "parse":
+                    input_records_count = result["records"]
+                elif case != "write":
+                    result["records"] = result["records"] or input_records_count
+
+                records_per_sec = (
+                    round(result["records"] / result["wall_time_s"])
+                    if result["records"] and result["wall_time_s"]
+                    else None
+                )
+                results.append(
+                    {
+                        "case": case,
+                        "engine": engine,
+                        **result,
+                        "records_per_sec": records_per_sec,
+                    }
+                )
+                print(
+                    f"{engine:<12} {case:<10} {result['wall_time_s']:>10.3f} s "
+                    f"{records_per_sec or 0:>12,} records/sec "
+                    f"{result['peak_rss_mb']:>10.1f} MB"
+                )
+
+        input_bytes = os.path.getsize(input_file_path)
+
+    return {
+        "commit": _git_commit(os.path.dirname(os.path.abspath(__file__))),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "input": {
+            "path": args.input,
+            "bytes": input_bytes,
+            "generator": generator_parameters,
+        },
+        "main_args": main_args,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(
+        os.path.abspath(inspect.getfile(inspect.currentframe()))
+    )
+    parent_dir = os.path.dirname(current_dir)
+
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+    arguments = init_argparse().parse_args()
+    if arguments.run_case:
+        print(
+            json.dumps(
+                run_case(
+                    arguments.run_case,
+                    arguments.engines[0],
+                    arguments.input,
+                    shlex.split(arguments.main_args),
+                )
+            )
+        )
+    else:
+        report = run_benchmarks(arguments)
+        with open(arguments.report, "w") as report_file:
+            json.dump(report, report_file, indent=4)
+
+        print(f"The report was written to '{arguments.report}'")
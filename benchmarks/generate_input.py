@@ -0,0 +1,308 @@
+"""Generates a synthetic input JSON file with beacons readings
+
+At every timestamp (one per minute), every beacon records a reading of every antenna,
+and the readings are written until the requested number of records is reached. The
+generated file can be tuned with:
+
+    * the number of beacons, and the antennas ids
+    * the disorder of the timestamps: every reading is moved at most
+    `disorder_window` records away from its position in the timestamps order
+    * the rate of missing readings, of duplicated readings and of malformed lines
+    * the layout: a JSON document per line, a pretty printed array, or a minified
+    array in a single line
+
+The same parameters and seed always generate the same file, so the benchmarks are
+comparable across commits.
+
+Usage:
+    python benchmarks/generate_input.py [OPTIONS] OUTPUT_FILE RECORDS_COUNT
+
+This file can also be imported as a module and contains the following functions:
+    * add_generator_arguments(parser) - adds the generator options to a parser
+    * generate_input(...) - writes a synthetic input JSON file
+"""
+
+import argparse
+import heapq
+import json
+import random
+import typing
+
+LINES_LAYOUT = "lines"
+PRETTY_LAYOUT = "pretty"
+MINIFIED_LAYOUT = "minified"
+LAYOUTS = (LINES_LAYOUT, PRETTY_LAYOUT, MINIFIED_LAYOUT)
+
+DEFAULT_ANTENNA_IDS = [201, 202, 203, 204, 205, 206]
+# Minutes since the beginning of the month of the first timestamp (2016-11-22T09:00):
+FIRST_TIMESTAMP_MINUTE = (22 - 1) * 24 * 60 + 9 * 60
+
+# Lines that can't be decoded, or whose JSON document is invalid:
+MALFORMED_LINES = (
+    '{"BeaconId":101,"ant_id":201,"dbm_ant":-70.5,"timestamp":"2016-11-22T09:',
+    '{"BeaconId":101,"ant_id":201,"timestamp":"2016-11-22T09:47:00.000Z"}',
+    '{"BeaconId":"x","ant_id":201,"dbm_ant":-70.5,"timestamp":"2016-11-22T09:47:00Z"}',
+    '{"BeaconId":101,"ant_id":201,"dbm_ant":-70.5,"timestamp":"not a timestamp"}',
+    "BeaconId=101 ant_id=201 dbm_ant=-70.5",
+    "",
+)
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds to a parser the options of the generator
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser where the options are added
+    """
+
+    parser.add_argument(
+        "--beacons", type=int, default=300, help="number of beacons (default: 300)"
+    )
+    parser.add_argument(
+        "--antenna-ids",
+        type=lambda value: [int(ant_id) for ant_id in value.split(",")],
+        default=DEFAULT_ANTENNA_IDS,
+        help="comma separated antennas ids (default: 201,202,203,204,205,206)",
+    )
+    parser.add_argument(
+        "--disorder-window",
+        type=int,
+        default=0,
+        help="max distance, in records, that a reading is moved away from the "
+        "timestamps order (default: 0)",
+    )
+    parser.add_argument(
+        "--missing-rate",
+        type=float,
+        default=0.1,
+        help="probability of a reading to be missing (default: 0.1)",
+    )
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.0,
+        help="probability of a reading to be recorded twice (default: 0.0)",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="probability of a line to be malformed (default: 0.0)",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default=LINES_LAYOUT,
+        help="'lines' for a JSON document per line, 'pretty' for a pretty printed "
+        "array, or 'minified' for an array in a single line (default: lines)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the generator (default: 0)"
+    )
+
+
+def _iter_readings(
+    rng: random.Random,
+    beacons_count: int,
+    antenna_ids: typing.List[int],
+    missing_rate: float,
+    duplicate_rate: float,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Returns the readings of every beacon, in the order of their timestamps
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random numbers generator
+    beacons_count : int
+        The number of beacons
+    antenna_ids : typing.List[int]
+        The antennas ids
+    missing_rate : float
+        The probability of a reading to be missing
+    duplicate_rate : float
+        The probability of a reading to be recorded twice
+
+    Returns
+    -------
+    typing.Iterator[typing.Dict[str, typing.Any]]
+        an endless sequence of readings.
+    """
+
+    minute = FIRST_TIMESTAMP_MINUTE
+    while True:
+        day, minute_of_day = divmod(minute, 24 * 60)
+        month_day = day % 28 + 1
+        timestamp = (
+            f"2016-11-{month_day:02d}T{minute_of_day // 60:02d}:"
+            f"{minute_of_day % 60:02d}:00.000Z"
+        )
+        for beacon_id in range(100, 100 + beacons_count):
+            for ant_id in antenna_ids:
+                if rng.random() < missing_rate:
+                    continue
+
+                yield {
+                    "BeaconId": beacon_id,
+                    "ant_id": ant_id,
+                    "dbm_ant": rng.uniform(-135, 0),
+                    "timestamp": timestamp,
+                }
+                if rng.random() < duplicate_rate:
+                    yield {
+                        "BeaconId": beacon_id,
+                        "ant_id": ant_id,
+                        "dbm_ant": rng.uniform(-135, 0),
+                        "timestamp": timestamp,
+                    }
+
+        minute += 1
+
+
+def _iter_disordered(
+    rng: random.Random, items: typing.Iterator[typing.Any], disorder_window: int
+) -> typing.Iterator[typing.Any]:
+    """Moves every item at most `disorder_window` positions away from its position
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random numbers generator
+    items : typing.Iterator[typing.Any]
+        The items to disorder
+    disorder_window : int
+        The max distance that an item is moved
+
+    Returns
+    -------
+    typing.Iterator[typing.Any]
+        the items, in the new order.
+    """
+
+    if disorder_window <= 0:
+        yield from items
+        return
+
+    # Every item is delayed by a random number of positions, and only the items of
+    # the window are in memory at once:
+    pending: typing.List[typing.Tuple[float, int, typing.Any]] = []
+    for index, item in enumerate(items):
+        heapq.heappush(pending, (index + rng.uniform(0, disorder_window), index, item))
+        if len(pending) > disorder_window:
+            yield heapq.heappop(pending)[2]
+
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def generate_input(
+    output_file_path: str,
+    records_count: int,
+    beacons: int = 300,
+    antenna_ids: typing.Optional[typing.List[int]] = None,
+    disorder_window: int = 0,
+    missing_rate: float = 0.1,
+    duplicate_rate: float = 0.0,
+    malformed_rate: float = 0.0,
+    layout: str = LINES_LAYOUT,
+    seed: int = 0,
+) -> int:
+    """Writes a synthetic input JSON file
+
+    Parameters
+    ----------
+    output_file_path : str
+        The path of the generated file
+    records_count : int
+        The number of records, including the malformed ones
+    beacons : int
+        The number of beacons
+    antenna_ids : typing.Optional[typing.List[int]]
+        The antennas ids. When None, DEFAULT_ANTENNA_IDS are used
+    disorder_window : int
+        The max distance, in records, that a reading is moved away from the
+        timestamps order
+    missing_rate : float
+        The probability of a reading to be missing
+    duplicate_rate : float
+        The probability of a reading to be recorded twice
+    malformed_rate : float
+        The probability of a line to be malformed. The malformed lines are written
+        only with the 'lines' layout
+    layout : str
+        Either LINES_LAYOUT, PRETTY_LAYOUT or MINIFIED_LAYOUT
+    seed : int
+        The seed of the random numbers generator
+
+    Returns
+    -------
+    int
+        the number of records written.
+    """
+
+    rng = random.Random(seed)
+    readings = _iter_disordered(
+        rng,
+        _iter_readings(
+            rng,
+            beacons,
+            antenna_ids or DEFAULT_ANTENNA_IDS,
+            missing_rate,
+            duplicate_rate,
+        ),
+        disorder_window,
+    )
+    with open(output_file_path, "w") as output_file:
+        if layout == MINIFIED_LAYOUT:
+            separator = ","
+            output_file.write("[")
+        else:
+            separator = ",\n"
+            output_file.write("[\n")
+
+        for index in range(records_count):
+            if index:
+                output_file.write(separator)
+
+            if layout == LINES_LAYOUT and rng.random() < malformed_rate:
+                output_file.write(f"  {rng.choice(MALFORMED_LINES)}")
+                continue
+
+            reading = next(readings)
+            if layout == PRETTY_LAYOUT:
+                document = json.dumps(reading, indent=2)
+                output_file.write("  " + document.replace("\n", "\n  "))
+            elif layout == MINIFIED_LAYOUT:
+                output_file.write(json.dumps(reading, separators=(",", ":")))
+            else:
+                output_file.write(f"  {json.dumps(reading, separators=(',', ':'))}")
+
+        output_file.write("]" if layout == MINIFIED_LAYOUT else "\n]\n")
+
+    return records_count
+
+
+if __name__ == "__main__":
+    arguments_parser = argparse.ArgumentParser(
+        description="Generate a synthetic input JSON file with beacons readings"
+    )
+    arguments_parser.add_argument("output_file", help="path of the generated file")
+    arguments_parser.add_argument(
+        "records_count", type=int, help="number of records of the generated file"
+    )
+    add_generator_arguments(arguments_parser)
+    args = arguments_parser.parse_args()
+    generate_input(
+        args.output_file,
+        args.records_count,
+        args.beacons,
+        args.antenna_ids,
+        args.disorder_window,
+        args.missing_rate,
+        args.duplicate_rate,
+        args.malformed_rate,
+        args.layout,
+        args.seed,
+    )
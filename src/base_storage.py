@@ -0,0 +1,1360 @@
+"""Contains the logic shared by every beacons storage engine
+
+Every storage engine reads the input JSON file one line at a time, validates every JSON
+document found in it, and aggregates the readings of every beacon in its own kind of
+staging storage, before persist them to the JSON results file. A beacon is identified
+by its BeaconId and the instant of its timestamp, as a pair of ints. The input JSON file
+can also be followed while other process appends lines to it, like `tail -f`.
+
+When an allowed lateness is configured, an event-time watermark follows the max
+timestamp seen minus the allowed lateness, and the beacons older than it are evicted
+from the staging storage, so the state is proportional to the disorder of the input,
+and not to its length.
+
+The readings of antennas that are not expected are dropped, or counted by antenna id,
+and optionally written to a side file, so they can be inspected afterwards.
+
+This file can be imported as a module and contains the following classes:
+    * BaseStorage - base class of the storage engines, provides the parsing of the
+    input JSON file
+"""
+
+import array
+import collections
+import heapq
+import json
+import logging
+import mmap
+import os
+import sys
+import time
+import types
+import typing
+
+from src import compressed_input
+from src import constants
+from src import decoders
+from src import models
+from src import reductions
+from src.checkpoint import CheckpointStore
+from src.checkpoint import OpenBeacon
+from src import timestamps
+from src.json_stream import JSONArrayReader
+from src.lines_parser import LinesParser
+from src.models import BeaconKey
+from src.options import AggregationOptions
+from src.options import CheckpointOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.pipeline import Pipeline
+from src.run_stats import RunStats
+from src.run_stats import measure
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+
+class BaseStorage(LinesParser):
+    """Base class for the storage and retrieval of the beacons data
+
+    The lines of the input JSON file are parsed, and the parsed and rejected JSON
+    documents are counted, as done by the `LinesParser`.
+
+    Subclasses must implement `_process_json_record()` and
+    `persist_beacons_vectors_to_results_file()`, and can override
+    `_open_staging_storage()` and `_close_staging_storage()` to manage the resources
+    used as staging storage. The subclasses that support checkpoints must implement
+    `_iter_open_beacons()` and `_restore_open_beacon()`, and the ones that support an
+    event-time watermark must implement `_evict_open_beacons()`, call
+    `_watch_open_beacon()` for every beacon they open, and `_advance_watermark()` for
+    every reading.
+
+    Attributes
+    ----------
+    WHITESPACE_BYTES : bytes
+        the bytes stripped from the beginning and end of the lines of a memory-mapped
+        input JSON file.
+
+    VECTOR_TYPECODES : typing.Dict[str, str]
+        array typecode of the beacons vectors, for every supported vector dtype.
+
+    PIPELINE_BLOCK_SIZE : int
+        approximated size in bytes of the blocks of lines read by the reader thread,
+        when the input JSON file is parsed in a pipeline.
+
+    READINGS_COUNTS_TYPECODE : str
+        array typecode of the number of readings received for every slot of a beacon
+        vector, when they are counted.
+    """
+
+    WHITESPACE_BYTES = b" \t\n\r\x0b\x0c"
+    VECTOR_TYPECODES = {
+        constants.FLOAT64_VECTOR_DTYPE: "d",
+        constants.FLOAT32_VECTOR_DTYPE: "f",
+    }
+    PIPELINE_BLOCK_SIZE = 1 << 20
+    READINGS_COUNTS_TYPECODE = "I"
+
+    def __enter__(self) -> "BaseStorage":
+        """Context Manager to ensure the closure of open files
+
+        Returns
+        -------
+        BaseStorage:
+            the instance of the storage being used as a context manager
+        """
+
+        logging.debug("%s.__enter__()", self.__class__.__name__)
+        try:
+            self._open_staging_storage()
+            if not self._resume_from_checkpoint():
+                # We will store the results with the required JSON
+                # structure in a file in constants.RESULT_FILE_PATH:
+                self._output_processor.initialize()
+                self._open_unknown_antennas_file()
+
+            return self
+        except Exception:
+            logging.exception("Error:")
+            # Release what was opened, and let the caller know that the storage
+            # can't be used:
+            self.__exit__(*sys.exc_info())
+            raise
+
+    def __exit__(
+        self,
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_val: typing.Optional[BaseException],
+        exc_tb: typing.Optional[types.TracebackType],
+    ) -> typing.Optional[bool]:
+        """Closes the used files
+
+        Closes the files used as staging storage, as well as the results JSON file.
+        An error raised while closing them is propagated, unless the context is
+        being exited because of another exception, so the errors of the background
+        threads of the output processor are not lost.
+
+        Parameters
+        ----------
+        exc_type : typing.Optional[typing.Type[BaseException]]
+            Type of the exception that caused the context to be exited
+        exc_val : typing.Optional[BaseException]
+            The exception that caused the context to be exited
+        exc_tb : typing.Optional[types.TracebackType]
+            Traceback related to the call stack associated to the exception
+
+        Returns
+        -------
+        typing.Optional[bool]:
+            If an exception is supplied, and the method wishes to suppress the
+            exception (i.e., prevent it from being propagated), it should return a true
+            value. Otherwise, the exception will be processed normally upon exit from
+            this method.
+        """
+
+        logging.debug(
+            "%s.__exit__(exc_type=%s, exc_val=%s, exc_tb=%s)",
+            self.__class__.__name__,
+            exc_type,
+            exc_val,
+            exc_tb,
+        )
+        close_error: typing.Optional[Exception] = None
+        try:
+            self._close_staging_storage()
+        except Exception as error:
+            logging.exception("Error:")
+            close_error = error
+
+        try:
+            self._output_processor.close()
+        except Exception as error:
+            logging.exception("Error:")
+            close_error = close_error or error
+
+        if self._unknown_antennas_file is not None:
+            try:
+                self._unknown_antennas_file.close()
+            except Exception as error:
+                logging.exception("Error:")
+                close_error = close_error or error
+
+        if self._stats is not None:
+            self._update_run_stats()
+
+        if exc_type is None and close_error is not None:
+            raise close_error
+
+        if exc_type is None and self._checkpoint_store is not None:
+            # The run is complete, there is nothing left to resume:
+            self._checkpoint_store.clear()
+
+        return False
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+        checkpoint_options: typing.Optional[CheckpointOptions] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        checkpoint_options : typing.Optional[CheckpointOptions]
+            Options used to save checkpoints of the run, and to resume it. When None,
+            checkpoints are not saved.
+        """
+
+        logging.debug(
+            "%s.__init__(input_json_file_path=%s, default_dbm_ant_value=%s, "
+            "expected_antenna_ids=%s)",
+            self.__class__.__name__,
+            input_json_file_path,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+        )
+
+        self._input_json_file_path: str = input_json_file_path
+        self._output_processor: OutputProcessor = out_processor
+        self._default_dbm_ant_value: float = default_dbm_ant_value
+        self._expected_antenna_ids: typing.List[int] = expected_antenna_ids
+        self._input_options: InputOptions = input_options or InputOptions()
+        super().__init__(self._input_options.fast_decoder, stats)
+        self._aggregation_options: AggregationOptions = (
+            aggregation_options or AggregationOptions()
+        )
+
+        # Resolve once every expected antenna id to its dense slot in the beacon
+        # vector, so the presence of the readings can be tracked with a bitmask:
+        self._antenna_slots: typing.Dict[int, int] = {
+            ant_id: slot for slot, ant_id in enumerate(expected_antenna_ids)
+        }
+        self._full_mask: int = (1 << len(expected_antenna_ids)) - 1
+        self._vector_typecode: str = self.VECTOR_TYPECODES[
+            self._aggregation_options.vector_dtype
+        ]
+
+        # The readings of every slot are only counted when the duplicated readings
+        # are not just overwritten, or when their counts are written:
+        duplicates_reduction = self._aggregation_options.duplicates_reduction
+        self._count_vector: bool = self._aggregation_options.count_vector
+        self._count_readings: bool = (
+            duplicates_reduction != constants.LAST_REDUCTION or self._count_vector
+        )
+        self._reduce_reading: reductions.ReadingReducer = reductions.READING_REDUCERS[
+            duplicates_reduction
+        ]
+        self._merge_aggregates: reductions.AggregateMerger = (
+            reductions.AGGREGATE_MERGERS[duplicates_reduction]
+        )
+
+        self._checkpoint_options: typing.Optional[
+            CheckpointOptions
+        ] = checkpoint_options
+        self._checkpoint_store: typing.Optional[CheckpointStore] = (
+            None
+            if checkpoint_options is None
+            else CheckpointStore(
+                checkpoint_options.state_directory,
+                self._vector_typecode,
+                len(expected_antenna_ids),
+                self._count_readings,
+            )
+        )
+        # Position in the input JSON file of the next line to parse, when the
+        # checkpoints are enabled:
+        self._input_offset: int = 0
+        self._next_line_index: int = 1
+        # Number of bytes read from the input JSON file, once decompressed, counted by
+        # the iterators of its lines:
+        self._bytes_read_count: int = 0
+        self._records_completed_early_count: int = 0
+        self._results_records_count: int = 0
+
+        # Event-time watermark, used when an allowed lateness is configured:
+        allowed_lateness = self._aggregation_options.allowed_lateness
+        self._allowed_lateness_ns: typing.Optional[int] = (
+            None if allowed_lateness is None else int(allowed_lateness * 1e9)
+        )
+        self._max_epoch_ns: typing.Optional[int] = None
+        self._watermark_ns: typing.Optional[int] = None
+        # Heap with the nanoseconds since the Unix epoch and the BeaconId of the open
+        # beacons, so the oldest ones are found first. The beacons that are completed
+        # are not removed from it, so an entry can refer to a beacon no longer open:
+        self._open_beacons_by_time: typing.List[typing.Tuple[int, int]] = []
+        self._records_late_count: int = 0
+        self._records_evicted_count: int = 0
+
+        # Number of readings of every antenna that is not expected, when they are
+        # counted:
+        self._unknown_antennas_counts: typing.Dict[int, int] = collections.Counter()
+        self._unknown_antennas_file: typing.Optional[typing.TextIO] = None
+
+    def _open_staging_storage(self) -> None:
+        """Opens the resources used to store temporarily the beacons readings"""
+
+    def _close_staging_storage(self) -> None:
+        """Closes the resources used to store temporarily the beacons readings"""
+
+    def _iter_open_beacons(self) -> typing.Iterator[OpenBeacon]:
+        """Returns every open beacon of the staging storage, to save a checkpoint
+
+        Returns
+        -------
+        typing.Iterator[OpenBeacon]
+            the key, the vector, the bitmask and the readings counts of every open
+            beacon.
+        """
+
+        raise NotImplementedError
+
+    def _restore_open_beacon(
+        self,
+        beacon_key: BeaconKey,
+        dbm_ant_row: typing.Sequence[float],
+        sampled_antennas_mask: int,
+        readings_counts: typing.Optional[typing.Sequence[int]],
+    ) -> None:
+        """Stores an open beacon of a checkpoint in the staging storage
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            The BeaconId and the nanoseconds since the Unix epoch of the beacon
+        dbm_ant_row : typing.Sequence[float]
+            The dbm_ant readings of the beacon, with a slot for every expected antenna
+        sampled_antennas_mask : int
+            The bitmask of the slots for which a dbm_ant reading was received
+        readings_counts : typing.Optional[typing.Sequence[int]]
+            The number of readings received for every slot, or None when they are not
+            counted
+        """
+
+        raise NotImplementedError
+
+    def _new_readings_counts(
+        self, sampled_antennas_mask: int = 0
+    ) -> typing.Optional[array.array]:
+        """Creates the number of readings of every slot of a new beacon vector
+
+        Parameters
+        ----------
+        sampled_antennas_mask : int
+            The bitmask of the slots that already have one reading
+
+        Returns
+        -------
+        typing.Optional[array.array]
+            a count for every expected antenna, or None when the readings are not
+            counted.
+        """
+
+        if not self._count_readings:
+            return None
+
+        return array.array(
+            self.READINGS_COUNTS_TYPECODE,
+            [
+                sampled_antennas_mask >> slot & 1
+                for slot in range(len(self._expected_antenna_ids))
+            ],
+        )
+
+    def _evict_open_beacons(self, beacon_keys: typing.List[BeaconKey]) -> int:
+        """Persists the open beacons, with the default value for their absent
+        antennas, and removes them from the staging storage
+
+        Parameters
+        ----------
+        beacon_keys : typing.List[BeaconKey]
+            The keys of the beacons to evict, sorted by timestamp and BeaconId. The
+            ones that are no longer open are skipped
+
+        Returns
+        -------
+        int
+            the number of evicted beacons.
+        """
+
+        raise NotImplementedError
+
+    def _watch_open_beacon(self, beacon_key: BeaconKey) -> None:
+        """Keeps track of a new open beacon, to evict it once it's older than the
+        watermark
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            The BeaconId and the nanoseconds since the Unix epoch of the beacon
+        """
+
+        beacon_id, epoch_ns = beacon_key
+        heapq.heappush(self._open_beacons_by_time, (epoch_ns, beacon_id))
+
+    def _advance_watermark(self, beacon_key: BeaconKey) -> bool:
+        """Advances the event-time watermark with the timestamp of a reading
+
+        The open beacons older than the new watermark are evicted.
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            The BeaconId and the nanoseconds since the Unix epoch of the reading
+
+        Returns
+        -------
+        bool
+            False if the reading is older than the watermark, so it's late and must
+            be ignored, or True otherwise.
+        """
+
+        epoch_ns = beacon_key[1]
+        if self._watermark_ns is not None and epoch_ns < self._watermark_ns:
+            self._records_late_count += 1
+            logging.debug(
+                "The reading of the beacon '%s' arrived after the watermark. It will "
+                "be ignored",
+                self._format_beacon_key(beacon_key),
+            )
+            return False
+
+        if self._max_epoch_ns is not None and epoch_ns <= self._max_epoch_ns:
+            return True
+
+        self._max_epoch_ns = epoch_ns
+        self._watermark_ns = epoch_ns - self._allowed_lateness_ns
+        open_beacons_by_time = self._open_beacons_by_time
+        expired_beacon_keys = []
+        while open_beacons_by_time and open_beacons_by_time[0][0] < self._watermark_ns:
+            expired_epoch_ns, beacon_id = heapq.heappop(open_beacons_by_time)
+            expired_beacon_keys.append((beacon_id, expired_epoch_ns))
+
+        if expired_beacon_keys:
+            with measure(self._stats, "evict"):
+                self._records_evicted_count += self._evict_open_beacons(
+                    expired_beacon_keys
+                )
+
+        return True
+
+    def _open_unknown_antennas_file(
+        self, position: typing.Optional[int] = None
+    ) -> None:
+        """Opens the side file of the readings of antennas that are not expected
+
+        It's only opened when they are written to a side file.
+
+        Parameters
+        ----------
+        position : typing.Optional[int]
+            The position where the side file is truncated, to continue writing it
+            after a checkpoint. When None, the side file is created from scratch
+        """
+
+        if (
+            self._aggregation_options.unknown_antennas
+            != constants.SIDE_FILE_UNKNOWN_ANTENNAS
+        ):
+            return
+
+        file_path = self._aggregation_options.unknown_antennas_file_path
+        if position is None:
+            self._unknown_antennas_file = open(file_path, "w")
+        else:
+            self._unknown_antennas_file = open(file_path, "r+")
+            self._unknown_antennas_file.seek(position)
+            self._unknown_antennas_file.truncate()
+
+    def _skip_unknown_antenna(self, json_record: "JSONDocumentModel") -> None:
+        """Handles the reading of an antenna that is not expected, as configured
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        if (
+            self._aggregation_options.unknown_antennas
+            == constants.DROP_UNKNOWN_ANTENNAS
+        ):
+            logging.debug(
+                "The antenna '%s' is not an expected antenna. The reading will be "
+                "ignored",
+                json_record.ant_id,
+            )
+            return
+
+        self._unknown_antennas_counts[json_record.ant_id] += 1
+        if self._unknown_antennas_file is not None:
+            self._unknown_antennas_file.write(
+                json.dumps(
+                    {
+                        "BeaconId": json_record.beacon_id,
+                        "ant_id": json_record.ant_id,
+                        "dbm_ant": json_record.dbm_ant,
+                        "timestamp": json_record.timestamp,
+                    },
+                    separators=(",", ":"),
+                )
+                + "\n"
+            )
+
+    def _log_unknown_antennas(self) -> None:
+        """Logs how many readings of antennas that are not expected were found"""
+
+        if not self._unknown_antennas_counts:
+            return
+
+        logging.warning(
+            "%s readings of antennas that are not expected were ignored, by antenna "
+            "id: %s",
+            sum(self._unknown_antennas_counts.values()),
+            dict(sorted(self._unknown_antennas_counts.items())),
+        )
+        if self._unknown_antennas_file is not None:
+            logging.info(
+                "They were written to: '%s'",
+                self._aggregation_options.unknown_antennas_file_path,
+            )
+
+    def _get_checkpoint_run(self) -> typing.Dict[str, typing.Any]:
+        """Gets what identifies the run of a checkpoint
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            the input JSON file, the storage engine, the expected antennas, the
+            default dbm_ant value, the type of the beacons vectors and how they are
+            aggregated. A checkpoint can only be resumed by the same run.
+        """
+
+        return {
+            "input_json_file_path": os.path.abspath(self._input_json_file_path),
+            "storage": self.__class__.__name__,
+            "expected_antenna_ids": list(self._expected_antenna_ids),
+            "default_dbm_ant_value": self._default_dbm_ant_value,
+            "vector_typecode": self._vector_typecode,
+            "allowed_lateness_ns": self._allowed_lateness_ns,
+            "duplicates_reduction": self._aggregation_options.duplicates_reduction,
+            "count_vector": self._count_vector,
+            "unknown_antennas": self._aggregation_options.unknown_antennas,
+        }
+
+    def _save_checkpoint(self) -> None:
+        """Saves a checkpoint with the positions, counters and open beacons of the run
+
+        It must be called between two JSON documents, once the previous one was
+        processed.
+        """
+
+        with measure(self._stats, "checkpoint"):
+            if self._unknown_antennas_file is not None:
+                self._unknown_antennas_file.flush()
+
+            state = {
+                "run": self._get_checkpoint_run(),
+                "input_offset": self._input_offset,
+                "line_index": self._next_line_index,
+                "records_parsed_count": self._records_parsed_count,
+                "records_rejected_count": self._records_rejected_count,
+                "records_late_count": self._records_late_count,
+                "records_evicted_count": self._records_evicted_count,
+                "max_epoch_ns": self._max_epoch_ns,
+                "unknown_antennas_counts": {
+                    str(ant_id): count
+                    for ant_id, count in self._unknown_antennas_counts.items()
+                },
+                "unknown_antennas_file_position": (
+                    None
+                    if self._unknown_antennas_file is None
+                    else self._unknown_antennas_file.tell()
+                ),
+                "output": self._output_processor.checkpoint(),
+            }
+            open_beacons_count = self._checkpoint_store.save(
+                state, self._iter_open_beacons()
+            )
+
+        logging.info(
+            "A checkpoint was saved at the byte %s of the input JSON file, with %s "
+            "open beacons",
+            self._input_offset,
+            open_beacons_count,
+        )
+
+    def _resume_from_checkpoint(self) -> bool:
+        """Restores the state of the run from the last checkpoint, when resuming
+
+        The results file is truncated at the position of the checkpoint, so the
+        records written after it are not duplicated. Without resuming, a previous
+        checkpoint is removed.
+
+        Returns
+        -------
+        bool
+            True if the run was restored from a checkpoint, or False if it must start
+            from the beginning.
+        """
+
+        if self._checkpoint_store is None:
+            return False
+
+        if not self._checkpoint_options.resume:
+            self._checkpoint_store.clear()
+            return False
+
+        checkpoint = self._checkpoint_store.load()
+        if checkpoint is None:
+            logging.info(
+                "There isn't a checkpoint in '%s'. The run will start from the "
+                "beginning",
+                self._checkpoint_options.state_directory,
+            )
+            return False
+
+        state, open_beacons = checkpoint
+        if state["run"] != self._get_checkpoint_run():
+            raise ValueError(
+                f"The checkpoint in '{self._checkpoint_options.state_directory}' "
+                f"belongs to another run: {state['run']}"
+            )
+
+        if os.path.getsize(self._input_json_file_path) < state["input_offset"]:
+            raise ValueError(
+                "The input JSON file is shorter than when the checkpoint was saved"
+            )
+
+        self._output_processor.resume(state["output"])
+        self._open_unknown_antennas_file(state["unknown_antennas_file_position"])
+        open_beacons_count = 0
+        for open_beacon in open_beacons:
+            self._restore_open_beacon(*open_beacon)
+            open_beacons_count += 1
+
+        self._input_offset = state["input_offset"]
+        self._next_line_index = state["line_index"]
+        self._records_parsed_count = state["records_parsed_count"]
+        self._records_rejected_count = state["records_rejected_count"]
+        self._records_late_count = state["records_late_count"]
+        self._records_evicted_count = state["records_evicted_count"]
+        self._max_epoch_ns = state["max_epoch_ns"]
+        self._unknown_antennas_counts.update(
+            {
+                int(ant_id): count
+                for ant_id, count in state["unknown_antennas_counts"].items()
+            }
+        )
+        if self._max_epoch_ns is not None and self._allowed_lateness_ns is not None:
+            self._watermark_ns = self._max_epoch_ns - self._allowed_lateness_ns
+        logging.info(
+            "The run is resumed from the byte %s of the input JSON file, with %s open "
+            "beacons",
+            self._input_offset,
+            open_beacons_count,
+        )
+        return True
+
+    def _get_beacon_key(
+        self, json_record: "JSONDocumentModel"
+    ) -> typing.Optional[BeaconKey]:
+        """Gets the key that identifies the beacon of a reading
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+
+        Returns
+        -------
+        typing.Optional[BeaconKey]
+            the BeaconId and the nanoseconds since the Unix epoch of the timestamp, or
+            None if the timestamp is not a valid ISO-8601 timestamp.
+        """
+
+        epoch_ns = timestamps.parse_timestamp(json_record.timestamp)
+        if epoch_ns is None:
+            self._records_rejected_count += 1
+            logging.warning(
+                "The timestamp '%s' of the BeaconId '%s' is not a valid ISO-8601 "
+                "timestamp. The reading will be ignored",
+                json_record.timestamp,
+                json_record.beacon_id,
+            )
+            return None
+
+        return json_record.beacon_id, epoch_ns
+
+    def _build_dbm_ant_vector(
+        self, dbm_ant_row: typing.Sequence[float], sampled_antennas_mask: int
+    ) -> typing.List[float]:
+        """Builds the vector of dbm_ant readings of a beacon, to be saved in the output
+
+        Parameters
+        ----------
+        dbm_ant_row : typing.Sequence[float]
+            The dbm_ant readings of the beacon, with a slot for every expected antenna
+        sampled_antennas_mask : int
+            The bitmask of the slots for which a dbm_ant reading was received
+
+        Returns
+        -------
+        typing.List[float]
+            the dbm_ant readings, sorted as the expected antennas. The default value is
+            used as it was supplied for the absent antennas, so the results are written
+            exactly the same by every storage engine.
+        """
+
+        default_dbm_ant_value = self._default_dbm_ant_value
+        return [
+            dbm_ant if sampled_antennas_mask >> slot & 1 else default_dbm_ant_value
+            for slot, dbm_ant in enumerate(dbm_ant_row)
+        ]
+
+    @staticmethod
+    def _format_beacon_key(beacon_key: BeaconKey) -> str:
+        """Formats the key of a beacon, as it's written in the JSON results file
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            The BeaconId and the nanoseconds since the Unix epoch of the beacon
+
+        Returns
+        -------
+        str
+            the BeaconId and the ISO-8601 timestamp. Example:
+            "101, 1999-06-17T00:11:00.000Z"
+        """
+
+        beacon_id, epoch_ns = beacon_key
+        return f"{beacon_id}, {timestamps.format_timestamp(epoch_ns)}"
+
+    def _process_json_record(self, json_record: "JSONDocumentModel") -> None:
+        """Process a JSON document record
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        raise NotImplementedError
+
+    def persist_beacons_vectors_to_results_file(self) -> None:
+        """Persist in the JSON results file the beacons vectors still in the storage"""
+
+        raise NotImplementedError
+
+    def parse_json_documents_from_file(self) -> None:
+        """Reads one line at a time from the input JSON file, and process it."""
+
+        logging.debug("%s.parse_json_documents_from_file()", self.__class__.__name__)
+        if self._input_options.pipelined:
+            self._parse_pipelined_json_documents()
+        elif self._stats is not None:
+            self._process_measured_json_documents(self._iter_input_json_documents())
+        else:
+            for json_document in self._iter_input_json_documents():
+                # Process the Python dict with the JSON document data:
+                self._process_json_record(json_document)
+
+        self._records_completed_early_count = (
+            self._output_processor.results_records_count - self._records_evicted_count
+        )
+
+        if self._records_late_count:
+            logging.warning(
+                "%s readings arrived after the watermark, once their beacons were "
+                "written, and were ignored",
+                self._records_late_count,
+            )
+
+        self._log_unknown_antennas()
+        if self._closing_bracket_found:
+            logging.info(
+                "In total, there were processed %s JSON documents",
+                self._records_parsed_count,
+            )
+
+    def _parse_pipelined_json_documents(self) -> None:
+        """Reads and parses the input JSON file in background threads, and process it.
+
+        A reader thread reads the input JSON file in blocks of lines, and a parser
+        thread parses them, while the readings are aggregated in the calling thread,
+        which is the only one that accesses the staging storage. An error in any of the
+        threads is raised here.
+
+        The parser thread counts the parsed and rejected JSON documents, and measures
+        their validation, in its own block parser, so it doesn't update any state
+        shared with the calling thread. Its counts are added up once it's stopped.
+
+        There is a single parser thread on purpose: the lines are parsed by Python
+        code that holds the GIL, so more parser threads would not parse them faster,
+        and the blocks are kept in order without reordering them. The parsing is run
+        in parallel by the worker processes of the `ParallelStorage` instead.
+        """
+
+        block_parser = self._create_block_parser()
+        try:
+            with self._open_input_json_file() as input_json_file:
+                with Pipeline(
+                    self._iter_lines_blocks(input_json_file),
+                    block_parser._parse_lines_block,
+                ) as pipeline:
+                    if self._stats is not None:
+                        self._process_measured_json_documents(pipeline)
+                        return
+
+                    for json_document in pipeline:
+                        self._process_json_record(json_document)
+        finally:
+            # The threads of the pipeline were joined when it was exited:
+            self._records_parsed_count += block_parser._records_parsed_count
+            self._records_rejected_count += block_parser._records_rejected_count
+            self._closing_bracket_found = block_parser._closing_bracket_found
+            if self._stats is not None:
+                for stage, seconds in block_parser._stats.timings.items():
+                    self._stats.add_time(stage, seconds)
+
+    def _create_block_parser(self) -> LinesParser:
+        """Creates the parser of the blocks of lines, used by the parser thread
+
+        It only has the decoder option of the storage, and its own counters and stats,
+        so the parser thread doesn't share any state with the calling thread.
+
+        Returns
+        -------
+        LinesParser
+            the block parser.
+        """
+
+        return LinesParser(
+            self._input_options.fast_decoder,
+            None if self._stats is None else RunStats(),
+        )
+
+    def _process_measured_json_documents(
+        self, json_documents: typing.Iterable["JSONDocumentModel"]
+    ) -> None:
+        """Process the JSON documents, measuring the time spent parsing and
+        aggregating them
+
+        It's only used when the stats are enabled, so the loop of the other case
+        doesn't pay for the measures.
+
+        Parameters
+        ----------
+        json_documents : typing.Iterable[JSONDocumentModel]
+            The JSON documents parsed from the input JSON file
+        """
+
+        timings = self._stats.timings
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        for json_document in json_documents:
+            parsed = perf_counter()
+            timings["parse"] += parsed - start
+            self._process_json_record(json_document)
+            start = perf_counter()
+            timings["aggregate"] += start - parsed
+
+        timings["parse"] += perf_counter() - start
+
+    def _update_run_stats(self) -> None:
+        """Updates the counters of the run stats, once the results were written"""
+
+        results_records_count = self._output_processor.results_records_count
+        self._stats.set_counter("records_parsed", self._records_parsed_count)
+        self._stats.set_counter("records_rejected", self._records_rejected_count)
+        self._stats.set_counter(
+            "records_completed_early", self._records_completed_early_count
+        )
+        self._stats.set_counter(
+            "records_flushed_at_end",
+            results_records_count
+            - self._records_completed_early_count
+            - self._records_evicted_count,
+        )
+        if self._allowed_lateness_ns is not None:
+            self._stats.set_counter("records_late", self._records_late_count)
+            self._stats.set_counter("records_evicted", self._records_evicted_count)
+
+        if (
+            self._aggregation_options.unknown_antennas
+            != constants.DROP_UNKNOWN_ANTENNAS
+        ):
+            self._stats.set_counter(
+                "records_unknown_antenna", sum(self._unknown_antennas_counts.values())
+            )
+
+        self._stats.set_counter("bytes_read", self._bytes_read_count)
+
+    def _open_input_json_file(self) -> typing.TextIO:
+        """Opens the input JSON file in text mode
+
+        A compressed input JSON file is decompressed in the background while it's
+        read.
+
+        Returns
+        -------
+        typing.TextIO
+            the input JSON file, or its decompressed content.
+        """
+
+        return compressed_input.open_input_file(
+            self._input_json_file_path,
+            self._input_options.compression,
+            self._input_options.decompression_threads,
+        )
+
+    def _iter_lines_blocks(
+        self, input_json_file: typing.TextIO
+    ) -> typing.Iterator[typing.Tuple[int, typing.List[str]]]:
+        """Reads the input JSON file in blocks of whole lines
+
+        Parameters
+        ----------
+        input_json_file : typing.TextIO
+            The input JSON file, opened in text mode
+
+        Returns
+        -------
+        typing.Iterator[typing.Tuple[int, typing.List[str]]]
+            the number of the first line of every block, and its lines.
+        """
+
+        line_index = 1
+        while True:
+            lines = input_json_file.readlines(self.PIPELINE_BLOCK_SIZE)
+            if not lines:
+                return
+
+            self._bytes_read_count += sum(map(self._get_encoded_size, lines))
+            yield line_index, lines
+            line_index += len(lines)
+
+    def _iter_input_json_documents(self) -> typing.Iterator["JSONDocumentModel"]:
+        """Parses the JSON documents from the input JSON file.
+
+        The input JSON file is read as specified by the input options.
+
+        Returns
+        -------
+        typing.Iterator[JSONDocumentModel]
+            the valid JSON documents found in the input JSON file.
+        """
+
+        if self._checkpoint_store is not None:
+            yield from self._iter_checkpointed_json_documents()
+            return
+
+        if self._input_options.follow:
+            with open(self._input_json_file_path, "rb") as input_json_file:
+                yield from self._iter_json_documents(
+                    self._iter_followed_lines(input_json_file)
+                )
+
+            return
+
+        if self._input_options.memory_map:
+            with open(self._input_json_file_path, "rb") as input_json_file:
+                # An empty file can't be memory-mapped, and doesn't have documents:
+                if not os.fstat(input_json_file.fileno()).st_size:
+                    return
+
+                with mmap.mmap(
+                    input_json_file.fileno(), 0, access=mmap.ACCESS_READ
+                ) as mapped_file:
+                    if hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+
+                    yield from self._iter_mapped_json_documents(mapped_file)
+
+            return
+
+        # The JSON file could be huge, so it must be parsed one line at a time, for
+        # not get OutOfMemory exception:
+        with self._open_input_json_file() as input_json_file:
+            if self._input_options.input_format == constants.STREAM_INPUT_FORMAT:
+                yield from self._iter_streamed_json_documents(input_json_file)
+            else:
+                yield from self._iter_json_documents(
+                    self._iter_counted_lines(input_json_file)
+                )
+
+    def _iter_checkpointed_json_documents(self) -> typing.Iterator["JSONDocumentModel"]:
+        """Parses the JSON documents from the input JSON file, saving checkpoints.
+
+        The parsing starts at the position restored from the last checkpoint, and a
+        new checkpoint is saved, at most every checkpoint interval, once the previous
+        JSON document was processed.
+
+        Returns
+        -------
+        typing.Iterator[JSONDocumentModel]
+            the valid JSON documents found in the input JSON file.
+        """
+
+        interval = self._checkpoint_options.interval
+        next_checkpoint_time = time.monotonic() + interval
+        with open(self._input_json_file_path, "rb") as input_json_file:
+            input_json_file.seek(self._input_offset)
+            lines = (
+                self._iter_followed_lines(input_json_file)
+                if self._input_options.follow
+                else self._iter_tracked_lines(input_json_file)
+            )
+            for json_document in self._iter_json_documents(
+                lines, self._next_line_index
+            ):
+                yield json_document
+                # Here the JSON document was already processed:
+                if time.monotonic() >= next_checkpoint_time:
+                    self._save_checkpoint()
+                    next_checkpoint_time = time.monotonic() + interval
+
+    @staticmethod
+    def _get_encoded_size(text: str) -> int:
+        """Gets the number of bytes of a text decoded from the input JSON file
+
+        Parameters
+        ----------
+        text : str
+            The decoded text
+
+        Returns
+        -------
+        int
+            the number of bytes of the text encoded in UTF-8. An ASCII text, as the
+            JSON documents usually are, isn't encoded again.
+        """
+
+        return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+    def _iter_counted_lines(
+        self, input_json_file: typing.TextIO
+    ) -> typing.Iterator[str]:
+        """Reads the lines of the input JSON file, counting their bytes
+
+        Parameters
+        ----------
+        input_json_file : typing.TextIO
+            The input JSON file, opened in text mode
+
+        Returns
+        -------
+        typing.Iterator[str]
+            the lines.
+        """
+
+        for line in input_json_file:
+            self._bytes_read_count += self._get_encoded_size(line)
+            yield line
+
+    def _iter_tracked_lines(
+        self, input_json_file: typing.BinaryIO
+    ) -> typing.Iterator[str]:
+        """Reads the lines of the input JSON file, keeping track of their position
+
+        Parameters
+        ----------
+        input_json_file : typing.BinaryIO
+            The input JSON file, opened in binary mode
+
+        Returns
+        -------
+        typing.Iterator[str]
+            the decoded lines.
+        """
+
+        for line in input_json_file:
+            self._input_offset += len(line)
+            self._bytes_read_count += len(line)
+            self._next_line_index += 1
+            yield line.decode("utf-8")
+
+    def _iter_followed_lines(
+        self, input_json_file: typing.BinaryIO
+    ) -> typing.Iterator[str]:
+        """Reads the lines of the input JSON file, and then the lines appended to it
+
+        Once the end of the file is reached, the results written so far are flushed,
+        and the file is polled for new lines. A line is only returned once it's
+        complete, so a line that is being appended is never parsed in pieces. If the
+        file is truncated, it's followed again from its beginning. It stops when the
+        idle timeout expires, or when the run is interrupted with Ctrl+C while it
+        waits for new lines.
+
+        Parameters
+        ----------
+        input_json_file : typing.BinaryIO
+            The input JSON file, opened in binary mode
+
+        Returns
+        -------
+        typing.Iterator[str]
+            the decoded lines, keeping track of their position.
+        """
+
+        poll_interval = self._input_options.follow_poll_interval
+        idle_timeout = self._input_options.follow_idle_timeout
+        partial_line = b""
+        idle_since: typing.Optional[float] = None
+        while True:
+            line = input_json_file.readline()
+            if line.endswith(b"\n"):
+                line = partial_line + line
+                partial_line = b""
+                idle_since = None
+                self._input_offset += len(line)
+                self._bytes_read_count += len(line)
+                self._next_line_index += 1
+                yield line.decode("utf-8")
+                continue
+
+            # The end of the file was reached, keep the incomplete last line until
+            # the rest of it is appended:
+            partial_line += line
+            if idle_since is None:
+                idle_since = time.monotonic()
+                # Let the readers of the results see the beacons completed so far:
+                self._output_processor.flush()
+            elif idle_timeout is not None and (
+                time.monotonic() - idle_since >= idle_timeout
+            ):
+                logging.info(
+                    "No new lines were appended to the input JSON file in %s "
+                    "seconds. It will not be followed anymore",
+                    idle_timeout,
+                )
+                break
+
+            if os.fstat(input_json_file.fileno()).st_size < input_json_file.tell():
+                logging.warning(
+                    "The input JSON file was truncated. It will be followed from its "
+                    "beginning"
+                )
+                input_json_file.seek(0)
+                partial_line = b""
+                self._input_offset = 0
+                self._next_line_index = 1
+                continue
+
+            try:
+                time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                logging.info("The input JSON file will not be followed anymore")
+                break
+
+        if partial_line:
+            # The last line was not ended with a line break:
+            self._input_offset += len(partial_line)
+            self._bytes_read_count += len(partial_line)
+            self._next_line_index += 1
+            yield partial_line.decode("utf-8")
+
+    def _iter_mapped_json_documents(
+        self, mapped_file: mmap.mmap
+    ) -> typing.Iterator["JSONDocumentModel"]:
+        """Parses the JSON documents from the lines of the memory-mapped input file.
+
+        The lines boundaries are found on the raw bytes, and every line is handed over
+        to the decoder as offsets in the mapped file, so no line is copied unless it
+        must be parsed with json and pydantic. It applies the same rules than
+        `_iter_json_documents()`.
+
+        Parameters
+        ----------
+        mapped_file : mmap.mmap
+            The memory-mapped input JSON file
+
+        Returns
+        -------
+        typing.Iterator[JSONDocumentModel]
+            the valid JSON documents found in the lines.
+        """
+
+        fast_decoder = self._input_options.fast_decoder
+        file_size = len(mapped_file)
+        line_index = 1
+        next_line_start = 0
+        while next_line_start < file_size:
+            start = next_line_start
+            end = mapped_file.find(b"\n", start)
+            if end < 0:
+                end = file_size
+
+            next_line_start = end + 1
+            # Strip the spaces without copying the line:
+            while start < end and mapped_file[start] in self.WHITESPACE_BYTES:
+                start += 1
+
+            while end > start and mapped_file[end - 1] in self.WHITESPACE_BYTES:
+                end -= 1
+
+            logging.debug("Line '%s''s content after strip spaces:", line_index)
+            if start == end:
+                logging.warning("Line '%s' is empty, it will be ignored", line_index)
+                line_index += 1
+                continue
+
+            if end - start == 1 and mapped_file[start] == ord("]"):
+                logging.debug("The end of the file was found at line #'%s'", line_index)
+                self._closing_bracket_found = True
+                break
+
+            if end - start == 1 and mapped_file[start] == ord("["):
+                logging.debug(
+                    "The first line of the file was found at line #'%s'", line_index
+                )
+                line_index += 1
+                continue
+
+            # Looking for the index of the character that close a JSON document
+            # definition:
+            close_brace_idx = mapped_file.rfind(b"}", start, end)
+            if close_brace_idx < 0 or mapped_file.find(b"{", start, end) < 0:
+                logging.error(
+                    "Line #'%s' is malformed. Every JSON document should be in "
+                    "its own line:",
+                    line_index,
+                )
+                self._records_rejected_count += 1
+                line_index += 1
+                continue
+
+            if mapped_file[start] != ord("{"):
+                logging.warning(
+                    "Line #'%s' is malformed. The open curly brace character "
+                    "'{' must be the first in the every line",
+                    line_index,
+                )
+                self._records_rejected_count += 1
+                line_index += 1
+                continue
+
+            # Ignore any character(including the ',' character) that appears after
+            # the '}' character, at the end of the line:
+            json_document: typing.Optional["JSONDocumentModel"] = None
+            if fast_decoder:
+                json_document = decoders.decode_line_bytes(
+                    mapped_file, start, close_brace_idx + 1
+                )
+
+            if json_document is None:
+                json_document = self.parse_text_line(
+                    mapped_file[start : close_brace_idx + 1].decode("utf-8"),
+                    line_index,
+                )
+
+            line_index += 1
+            if json_document is None:
+                # Line doesn't contains a valid JSON document:
+                self._records_rejected_count += 1
+                continue
+
+            self._records_parsed_count += 1
+            yield json_document
+
+        self._bytes_read_count += min(next_line_start, file_size)
+
+    def _iter_streamed_json_documents(
+        self, input_json_file: typing.TextIO
+    ) -> typing.Iterator["JSONDocumentModel"]:
+        """Parses incrementally the JSON documents of the top level JSON array.
+
+        Parameters
+        ----------
+        input_json_file : typing.TextIO
+            The input JSON file, opened in text mode
+
+        Returns
+        -------
+        typing.Iterator[JSONDocumentModel]
+            the valid JSON documents found in the array.
+        """
+
+        json_array_reader = JSONArrayReader(input_json_file)
+        for document_index, data in json_array_reader:
+            json_document: typing.Optional["JSONDocumentModel"] = None
+            if self._input_options.fast_decoder:
+                json_document = decoders.decode_document(data)
+
+            if json_document is None:
+                json_document = self.parse_json_document(data, document_index)
+
+            if json_document is None:
+                self._records_rejected_count += 1
+                continue
+
+            self._records_parsed_count += 1
+            yield json_document
+
+        self._closing_bracket_found = json_array_reader.array_closed
+        self._bytes_read_count += json_array_reader.bytes_read
+
+    def parse_json_document(
+        self, data: typing.Any, document_index: int
+    ) -> typing.Optional["JSONDocumentModel"]:
+        """Validates a decoded JSON document, and initialize a JSONDocumentModel with it
+
+        Parameters
+        ----------
+        data : typing.Any
+            A JSON document decoded from the input JSON array
+        document_index : int
+            Represents the base 1 index, of the JSON document in the input JSON array
+
+        Returns
+        -------
+        typing.Optional[JSONDocumentModel]
+            If the JSON document contains the expected fields, will be returned a
+            JSONDocumentModel instance with the data. If not, None will be returned.
+        """
+
+        logging.debug("%s.parse_json_document(...)", self.__class__.__name__)
+        try:
+            if not isinstance(data, dict):
+                raise TypeError("A JSON document must be an object")
+
+            # pydantic is only imported the first time that the model is accessed, and
+            # a pydantic.ValidationError is a ValueError:
+            with measure(self._stats, "validation"):
+                return models.JSONDocumentModel(**data)
+        except (TypeError, ValueError):
+            logging.warning(
+                "JSON document #'%s' is invalid or malformed. It must contain "
+                "all/just the expected fields. It will be ignored",
+                document_index,
+            )
+            return None
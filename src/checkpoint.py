@@ -0,0 +1,262 @@
+"""Provides the storage of the checkpoints of a run, to resume it after an interruption
+
+A checkpoint has two files in the state directory:
+
+    * the open beacons file, with the vector and the bitmask of every open beacon, and
+    the number of readings of every slot when they are counted, in a compact binary
+    format. Its name contains the generation of the checkpoint, so a new
+    checkpoint never overwrites the files of the last consistent one
+    * the state file, a JSON document with the generation of the checkpoint, the
+    position in the input JSON file and in the results file, and the counters of the
+    run. It's replaced atomically once the open beacons file was written, so it always
+    refers to a complete checkpoint
+
+The cost of a checkpoint is proportional to the number of open beacons, and not to the
+size of the input already processed.
+
+This file can be imported as a module and contains the following classes:
+    * CheckpointStore - saves and loads the checkpoints of a run
+"""
+
+import array
+import glob
+import json
+import logging
+import os
+import struct
+import typing
+
+from src.models import BeaconKey
+
+OpenBeacon = typing.Tuple[
+    BeaconKey, typing.Sequence[float], int, typing.Optional[typing.Sequence[int]]
+]
+
+
+class CheckpointStore:
+    """Saves and loads the checkpoints of a run in a state directory
+
+    Attributes
+    ----------
+    STATE_FILE_NAME : str
+        name of the JSON file with the state of the last consistent checkpoint.
+
+    OPEN_BEACONS_FILE_NAME_FORMAT : str
+        format of the name of the open beacons file of a checkpoint, from its
+        generation.
+
+    BEACON_KEY : struct.Struct
+        binary format of the BeaconId and the nanoseconds since the Unix epoch of an
+        open beacon.
+
+    READINGS_COUNTS_TYPECODE : str
+        array typecode of the number of readings of every slot of an open beacon.
+    """
+
+    STATE_FILE_NAME = "checkpoint.json"
+    OPEN_BEACONS_FILE_NAME_FORMAT = "open_beacons.%s.bin"
+    BEACON_KEY = struct.Struct("<qq")
+    READINGS_COUNTS_TYPECODE = "I"
+
+    def __init__(
+        self,
+        state_directory: str,
+        vector_typecode: str,
+        vector_size: int,
+        readings_counts: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        state_directory : str
+            The directory where the checkpoints are stored. It's created if required
+        vector_typecode : str
+            The array typecode of the beacons vectors
+        vector_size : int
+            The number of slots of the beacons vectors
+        readings_counts : bool
+            When True, the number of readings of every slot of the open beacons is
+            also saved
+        """
+
+        logging.debug(
+            "%s.__init__(state_directory=%s)", self.__class__.__name__, state_directory
+        )
+        os.makedirs(state_directory, exist_ok=True)
+        self._state_directory: str = state_directory
+        self._vector_typecode: str = vector_typecode
+        self._vector_size: int = vector_size
+        self._mask_size: int = (vector_size + 7) // 8
+        self._row_size: int = array.array(vector_typecode).itemsize * vector_size
+        self._readings_counts_size: int = (
+            array.array(self.READINGS_COUNTS_TYPECODE).itemsize * vector_size
+            if readings_counts
+            else 0
+        )
+        self._generation: int = 0
+
+    def _get_open_beacons_file_path(self, generation: int) -> str:
+        """Gets the path of the open beacons file of a checkpoint
+
+        Parameters
+        ----------
+        generation : int
+            The generation of the checkpoint
+
+        Returns
+        -------
+        str
+            the path of the file in the state directory.
+        """
+
+        return os.path.join(
+            self._state_directory, self.OPEN_BEACONS_FILE_NAME_FORMAT % generation
+        )
+
+    def save(
+        self,
+        state: typing.Dict[str, typing.Any],
+        open_beacons: typing.Iterable[OpenBeacon],
+    ) -> int:
+        """Saves a new checkpoint, replacing the previous one once it's complete
+
+        Parameters
+        ----------
+        state : typing.Dict[str, typing.Any]
+            The positions and counters of the run. It must be serializable as JSON
+        open_beacons : typing.Iterable[OpenBeacon]
+            The key, the vector, the bitmask and the readings counts of every open
+            beacon
+
+        Returns
+        -------
+        int
+            the number of open beacons saved.
+        """
+
+        generation = self._generation + 1
+        open_beacons_count = 0
+        with open(self._get_open_beacons_file_path(generation), "wb") as open_file:
+            for beacon_key, row, mask, readings_counts in open_beacons:
+                open_file.write(self.BEACON_KEY.pack(*beacon_key))
+                open_file.write(mask.to_bytes(self._mask_size, "little"))
+                open_file.write(array.array(self._vector_typecode, row).tobytes())
+                if self._readings_counts_size:
+                    open_file.write(
+                        array.array(
+                            self.READINGS_COUNTS_TYPECODE, readings_counts
+                        ).tobytes()
+                    )
+                open_beacons_count += 1
+
+            open_file.flush()
+            os.fsync(open_file.fileno())
+
+        state = {**state, "generation": generation}
+        state_file_path = os.path.join(self._state_directory, self.STATE_FILE_NAME)
+        with open(f"{state_file_path}.tmp", "w") as state_file:
+            json.dump(state, state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+
+        # From here on, the new checkpoint is the last consistent one:
+        os.replace(f"{state_file_path}.tmp", state_file_path)
+        self._generation = generation
+        self._remove_open_beacons_files(keep_generation=generation)
+        return open_beacons_count
+
+    def load(
+        self,
+    ) -> typing.Optional[
+        typing.Tuple[typing.Dict[str, typing.Any], typing.Iterator[OpenBeacon]]
+    ]:
+        """Loads the last consistent checkpoint
+
+        Returns
+        -------
+        typing.Optional[typing.Tuple[typing.Dict, typing.Iterator[OpenBeacon]]]
+            the state of the checkpoint, and its open beacons, or None if there isn't
+            a checkpoint in the state directory.
+        """
+
+        state_file_path = os.path.join(self._state_directory, self.STATE_FILE_NAME)
+        if not os.path.isfile(state_file_path):
+            return None
+
+        with open(state_file_path) as state_file:
+            state = json.load(state_file)
+
+        self._generation = state["generation"]
+        return state, self._iter_open_beacons(state["generation"])
+
+    def _iter_open_beacons(self, generation: int) -> typing.Iterator[OpenBeacon]:
+        """Reads the open beacons of a checkpoint
+
+        Parameters
+        ----------
+        generation : int
+            The generation of the checkpoint
+
+        Returns
+        -------
+        typing.Iterator[OpenBeacon]
+            the key, the vector, the bitmask and the readings counts of every open
+            beacon.
+        """
+
+        mask_offset = self.BEACON_KEY.size
+        row_offset = mask_offset + self._mask_size
+        readings_counts_offset = row_offset + self._row_size
+        record_size = readings_counts_offset + self._readings_counts_size
+        with open(self._get_open_beacons_file_path(generation), "rb") as open_file:
+            while True:
+                record = open_file.read(record_size)
+                if not record:
+                    return
+
+                yield (
+                    self.BEACON_KEY.unpack_from(record),
+                    array.array(
+                        self._vector_typecode,
+                        record[row_offset:readings_counts_offset],
+                    ),
+                    int.from_bytes(record[mask_offset:row_offset], "little"),
+                    array.array(
+                        self.READINGS_COUNTS_TYPECODE, record[readings_counts_offset:]
+                    )
+                    if self._readings_counts_size
+                    else None,
+                )
+
+    def _remove_open_beacons_files(
+        self, keep_generation: typing.Optional[int] = None
+    ) -> None:
+        """Removes the open beacons files of the checkpoints
+
+        Parameters
+        ----------
+        keep_generation : typing.Optional[int]
+            The generation whose file must not be removed
+        """
+
+        keep_file_path = (
+            None
+            if keep_generation is None
+            else self._get_open_beacons_file_path(keep_generation)
+        )
+        for open_beacons_file_path in glob.glob(
+            self._get_open_beacons_file_path("*")
+        ):
+            if open_beacons_file_path != keep_file_path:
+                os.remove(open_beacons_file_path)
+
+    def clear(self) -> None:
+        """Removes the checkpoint from the state directory"""
+
+        logging.debug("%s.clear()", self.__class__.__name__)
+        state_file_path = os.path.join(self._state_directory, self.STATE_FILE_NAME)
+        if os.path.isfile(state_file_path):
+            os.remove(state_file_path)
+
+        self._remove_open_beacons_files()
+        self._generation = 0
@@ -0,0 +1,354 @@
+"""Contains logic to stage in columnar HDF5 datasets the beacons readings
+
+Instead of a HDF5 group for every beacon, the readings are appended in batches to a few
+resizable, chunked and compressed datasets (one for every field of a reading). Every
+reading is staged with the index of the beacon vector it belongs to, so the readings of
+a beacon received after its vector was complete are aggregated in a new vector, as the
+other storage engines do. When the whole input file has been processed, the beacons
+vectors are built with a sort based group-by implemented with NumPy.
+
+This file can be imported as a module and contains the following classes:
+    * ColumnarHDF5Storage - provides columnar storage of the beacons readings in a HDF5
+    file
+"""
+
+import array
+import logging
+import typing
+
+import numpy as np
+
+from src import constants
+from src.hdf5_storage import HDF5Storage
+from src.models import BeaconKey
+from src.options import AggregationOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+
+class ColumnarHDF5Storage(HDF5Storage):
+    """A class used for the columnar storage of the beacons readings in a HDF5 file
+
+    Attributes
+    ----------
+    READINGS_GROUP_NAME : str
+        name of the HDF5 group that contains the readings datasets.
+
+    BATCH_SIZE : int
+        number of readings buffered in memory, before append them to the datasets. It's
+        also used as the chunk size of the datasets.
+
+    COLUMNS : typing.List[typing.Tuple[str, str]]
+        name and array typecode of every dataset used to store a readings field. The
+        timestamp is stored as the nanoseconds since the Unix epoch, the dbm_ant with
+        the type of the beacons vectors, and the vector as the index of the beacon
+        vector the reading belongs to, in the order the vectors were opened.
+    """
+
+    READINGS_GROUP_NAME = "readings"
+    BATCH_SIZE = 65536
+    COLUMNS = [
+        ("beacon_id", "q"),
+        ("timestamp", "q"),
+        ("antenna_slot", "b"),
+        ("dbm_ant", "d"),
+        ("vector", "q"),
+    ]
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        """
+
+        super().__init__(
+            input_json_file_path,
+            out_processor,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+
+        # The dbm_ant readings are stored with the type of the beacons vectors:
+        self._columns: typing.List[typing.Tuple[str, str]] = [
+            (
+                column_name,
+                self._vector_typecode if column_name == "dbm_ant" else typecode,
+            )
+            for column_name, typecode in self.COLUMNS
+        ]
+        self._hdf5_datasets: typing.Dict[str, typing.Any] = {}
+        self._batch: typing.Dict[str, array.array] = {}
+        self._reset_batch()
+        # The index and the bitmask of the received readings, of every beacon vector
+        # that is not complete yet:
+        self._open_vectors: typing.Dict[BeaconKey, typing.List[int]] = {}
+        self._vectors_count = 0
+
+    def _open_staging_storage(self) -> None:
+        """Creates the HDF5 file and the resizable datasets for the readings"""
+
+        super()._open_staging_storage()
+        hdf5_readings_group = self._hdf5_root_file.create_group(
+            self.READINGS_GROUP_NAME
+        )
+        for column_name, typecode in self._columns:
+            self._hdf5_datasets[column_name] = hdf5_readings_group.create_dataset(
+                column_name,
+                shape=(0,),
+                maxshape=(None,),
+                dtype=np.dtype(typecode),
+                chunks=(self.BATCH_SIZE,),
+                compression="lzf",
+            )
+
+        logging.debug("Readings datasets: %s", list(self._hdf5_datasets))
+
+    def _reset_batch(self) -> None:
+        """Creates empty in memory buffers for the next batch of readings"""
+
+        self._batch = {
+            column_name: array.array(typecode)
+            for column_name, typecode in self._columns
+        }
+
+    def _flush_batch(self) -> None:
+        """Appends the buffered batch of readings to the HDF5 datasets"""
+
+        batch_size = len(self._batch["beacon_id"])
+        if not batch_size:
+            return
+
+        logging.debug("Appending a batch of %s readings to the datasets", batch_size)
+        for column_name, typecode in self._columns:
+            hdf5_dataset = self._hdf5_datasets[column_name]
+            readings_count = hdf5_dataset.shape[0]
+            hdf5_dataset.resize((readings_count + batch_size,))
+            hdf5_dataset[readings_count:] = np.frombuffer(
+                self._batch[column_name], dtype=np.dtype(typecode)
+            )
+
+        self._reset_batch()
+
+    def _process_json_record(self, json_record: "JSONDocumentModel") -> None:
+        """Buffers a JSON document record, to be appended to the readings datasets
+
+        The reading is buffered with the index of the open vector of its beacon. When
+        the readings of all the expected antennas were received, the vector is closed,
+        and the next reading of the beacon opens a new vector. Readings of antennas
+        that are not expected are ignored.
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        slot = self._antenna_slots.get(json_record.ant_id)
+        if slot is None:
+            self._skip_unknown_antenna(json_record)
+            return
+
+        beacon_key = self._get_beacon_key(json_record)
+        if beacon_key is None:
+            return
+
+        self._batch["beacon_id"].append(beacon_key[0])
+        self._batch["timestamp"].append(beacon_key[1])
+        self._batch["antenna_slot"].append(slot)
+        self._batch["dbm_ant"].append(json_record.dbm_ant)
+        self._batch["vector"].append(self._get_open_vector_index(beacon_key, slot))
+        if len(self._batch["beacon_id"]) >= self.BATCH_SIZE:
+            self._flush_batch()
+
+    def _get_open_vector_index(self, beacon_key: BeaconKey, slot: int) -> int:
+        """Returns the index of the open vector of a beacon, for a reading of an antenna
+
+        The vector is opened if the beacon doesn't have one, and closed when the
+        reading is the last expected one.
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            Contains a value that identifies a beacon.
+        slot : int
+            The slot of the antenna of the reading in the beacon vector
+
+        Returns
+        -------
+        int
+            the index of the vector.
+        """
+
+        open_vector = self._open_vectors.get(beacon_key)
+        if open_vector is None:
+            open_vector = [self._vectors_count, 0]
+            self._open_vectors[beacon_key] = open_vector
+            self._vectors_count += 1
+            if self._stats is not None:
+                self._stats.update_peak("peak_open_beacons", len(self._open_vectors))
+
+        open_vector[1] |= 1 << slot
+        if open_vector[1] == self._full_mask:
+            del self._open_vectors[beacon_key]
+
+        return open_vector[0]
+
+    def _reduce_cells(
+        self, cells: np.ndarray, dbm_ants: np.ndarray, cells_count: int
+    ) -> np.ndarray:
+        """Combines the readings of every cell with the duplicates reduction
+
+        Parameters
+        ----------
+        cells : np.ndarray
+            The cell of every reading, as the index of its vector multiplied by the
+            number of expected antennas, plus the slot of its antenna. The readings of
+            every cell are in the input file order
+        dbm_ants : np.ndarray
+            The dbm_ant of every reading
+        cells_count : int
+            The number of cells
+
+        Returns
+        -------
+        np.ndarray
+            the reduced dbm_ant of every cell, with the type of the beacons vectors.
+            The cells without readings have the default dbm_ant value.
+        """
+
+        vector_dtype = np.dtype(self._vector_typecode)
+        duplicates_reduction = self._aggregation_options.duplicates_reduction
+        reduced = np.full(cells_count, self._default_dbm_ant_value, dtype=vector_dtype)
+        if duplicates_reduction == constants.MEAN_REDUCTION:
+            readings_counts = np.bincount(cells, minlength=cells_count)
+            sums = np.bincount(cells, weights=dbm_ants, minlength=cells_count)
+            present = readings_counts > 0
+            reduced[present] = sums[present] / readings_counts[present]
+        elif duplicates_reduction in (constants.MAX_REDUCTION, constants.MIN_REDUCTION):
+            present = np.zeros(cells_count, dtype=bool)
+            present[cells] = True
+            if duplicates_reduction == constants.MAX_REDUCTION:
+                extreme = np.full(cells_count, -np.inf)
+                np.maximum.at(extreme, cells, dbm_ants)
+            else:
+                extreme = np.full(cells_count, np.inf)
+                np.minimum.at(extreme, cells, dbm_ants)
+
+            reduced[present] = extreme[present]
+        elif duplicates_reduction == constants.FIRST_REDUCTION:
+            _, first_idx = np.unique(cells, return_index=True)
+            reduced[cells[first_idx]] = dbm_ants[first_idx]
+        else:
+            # The first occurrence in the reversed readings is the last one in the
+            # input file:
+            _, last_reversed_idx = np.unique(cells[::-1], return_index=True)
+            last_idx = len(cells) - 1 - last_reversed_idx
+            reduced[cells[last_idx]] = dbm_ants[last_idx]
+
+        return reduced
+
+    def persist_beacons_vectors_to_results_file(self) -> None:
+        """Builds the beacons vectors from the readings datasets.
+
+        The readings are sorted by BeaconId, timestamp and vector, and scattered in a
+        matrix with a row for every vector, and a column for every expected antenna.
+        When an antenna has more than one reading in a vector, they are combined by the
+        duplicates reduction. The beacons vectors will be persisted in the JSON results
+        file, sorted by BeaconId and timestamp, and the vectors of a beacon in the order
+        they were opened.
+        """
+
+        logging.debug(
+            "%s.persist_beacons_vectors_to_results_file()", self.__class__.__name__
+        )
+        self._flush_batch()
+        columns = {
+            column_name: hdf5_dataset[()]
+            for column_name, hdf5_dataset in self._hdf5_datasets.items()
+        }
+        if not len(columns["beacon_id"]):
+            return
+
+        # A stable sort keeps the readings of every vector in the input file order:
+        order = np.lexsort(
+            (columns["vector"], columns["timestamp"], columns["beacon_id"])
+        )
+        beacon_ids = columns["beacon_id"][order]
+        epochs_ns = columns["timestamp"][order]
+        vectors_indexes = columns["vector"][order]
+        new_group = np.empty(len(order), dtype=bool)
+        new_group[0] = True
+        new_group[1:] = vectors_indexes[1:] != vectors_indexes[:-1]
+        groups = np.cumsum(new_group) - 1
+        groups_starts = np.flatnonzero(new_group)
+        logging.debug("%s beacons vectors will be built", len(groups_starts))
+
+        antennas_count = len(self._expected_antenna_ids)
+        cells = groups * antennas_count + columns["antenna_slot"][order]
+        dbm_ants = columns["dbm_ant"][order]
+        vectors = self._reduce_cells(
+            cells, dbm_ants, len(groups_starts) * antennas_count
+        ).reshape((len(groups_starts), antennas_count))
+        readings_counts = np.bincount(
+            cells, minlength=len(groups_starts) * antennas_count
+        ).reshape(vectors.shape)
+        present = readings_counts > 0
+
+        for group, beacon_key in enumerate(
+            zip(beacon_ids[groups_starts].tolist(), epochs_ns[groups_starts].tolist())
+        ):
+            # Use the default value as it was supplied for the absent antennas, so the
+            # results are written exactly as they would be by the other storage
+            # engines:
+            dbm_ant_vector = [
+                dbm_ant if is_present else self._default_dbm_ant_value
+                for dbm_ant, is_present in zip(
+                    vectors[group].tolist(), present[group].tolist()
+                )
+            ]
+            results_record = {
+                "beacon": self._format_beacon_key(beacon_key),
+                "vector": dbm_ant_vector,
+            }
+            if self._count_vector:
+                results_record["counts"] = readings_counts[group].tolist()
+
+            self._output_processor.persist_record(results_record)
@@ -0,0 +1,471 @@
+"""Provides the reading of compressed input files, decompressed in the background
+
+The compression of the input file is detected by its magic bytes, so gzip, bz2 and xz
+files can be parsed without inflating them to disk first. The decompression runs in a
+background thread, connected to the reader of the file by a bounded queue, so it
+overlaps with the parsing, and the memory used by the decompressed chunks in flight is
+bounded.
+
+Gzip files can be made of many members, e.g. the ones written by `pigz` or `bgzip`, or
+concatenated by `cat`. The members of a gzip file are found by their header, and
+decompressed in parallel by a pool of threads (zlib releases the GIL while it inflates
+the data) in segments of whole members, that are returned in order. A header found
+inside the compressed data of a member is detected because the segments around it
+don't end exactly at the end of a member, or fail the CRC check, and then the rest of
+the file is decompressed sequentially.
+
+This file can be imported as a module and contains the following classes:
+    * DecompressedStream - a raw binary stream with the decompressed content of a file
+
+And the following functions:
+    * detect_compression(file_path) - detects the compression of a file by its magic
+    bytes
+    * open_input_file(file_path, compression, threads) - opens the input file in text
+    mode, decompressing it in the background when it's compressed
+"""
+
+import bz2
+import collections
+import concurrent.futures
+import gzip
+import io
+import logging
+import lzma
+import queue
+import threading
+import typing
+import zlib
+
+from src import constants
+from src.pipeline import POLL_INTERVAL
+from src.pipeline import put
+
+MAGIC_NUMBERS = (
+    (b"\x1f\x8b", constants.GZIP_COMPRESSION),
+    (b"BZh", constants.BZIP2_COMPRESSION),
+    (b"\xfd7zXZ\x00", constants.XZ_COMPRESSION),
+)
+
+OPENERS = {
+    constants.GZIP_COMPRESSION: gzip.open,
+    constants.BZIP2_COMPRESSION: bz2.open,
+    constants.XZ_COMPRESSION: lzma.open,
+}
+
+# The header of a gzip member compressed with deflate:
+GZIP_MEMBER_HEADER = b"\x1f\x8b\x08"
+# Decompresses a gzip member, checking its CRC and its size:
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+# Marks the end of the decompressed chunks:
+_END = object()
+
+
+def detect_compression(file_path: str) -> typing.Optional[str]:
+    """Detects the compression of a file by its magic bytes
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the file
+
+    Returns
+    -------
+    typing.Optional[str]
+        one of constants.COMPRESSIONS, or None if the file is not compressed.
+    """
+
+    with open(file_path, "rb") as input_file:
+        head = input_file.read(max(len(magic) for magic, _ in MAGIC_NUMBERS))
+
+    for magic, compression in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+
+    return None
+
+
+def open_input_file(
+    file_path: str, compression: typing.Optional[str] = None, threads: int = 1
+) -> typing.TextIO:
+    """Opens the input file in text mode
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the input file
+    compression : typing.Optional[str]
+        One of constants.COMPRESSIONS, or None if the file is not compressed
+    threads : int
+        Number of threads that decompress in parallel the members of a gzip file
+
+    Returns
+    -------
+    typing.TextIO
+        the input file, or its decompressed content, that is decompressed in the
+        background while it's read.
+    """
+
+    if compression is None:
+        return open(file_path, "r")
+
+    return io.TextIOWrapper(
+        io.BufferedReader(
+            DecompressedStream(file_path, compression, threads),
+            DecompressedStream.CHUNK_SIZE,
+        )
+    )
+
+
+class DecompressedStream(io.RawIOBase):
+    """A raw binary stream with the decompressed content of a file
+
+    The file is decompressed by a background thread, that is started when the stream
+    is created, and stopped when it's closed. An error while decompressing the file is
+    raised by the read that reaches it.
+
+    Attributes
+    ----------
+    CHUNK_SIZE : int
+        number of decompressed bytes read at once by the sequential decompression.
+
+    QUEUE_SIZE : int
+        max number of decompressed chunks waiting to be read.
+
+    SEGMENT_SIZE : int
+        approximate number of compressed bytes of the segments of members of a gzip
+        file, that are decompressed in parallel.
+
+    HEADER_CHECK_SIZE : int
+        number of compressed bytes after a candidate header of a gzip member, that are
+        decompressed to discard most of the false headers.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    QUEUE_SIZE = 8
+    SEGMENT_SIZE = 4 * 1024 * 1024
+    HEADER_CHECK_SIZE = 4096
+
+    def __init__(self, file_path: str, compression: str, threads: int = 1):
+        """
+        Parameters
+        ----------
+        file_path : str
+            The path of the compressed file
+        compression : str
+            One of constants.COMPRESSIONS
+        threads : int
+            Number of threads that decompress in parallel the members of a gzip file
+        """
+
+        super().__init__()
+        logging.debug(
+            "%s.__init__(file_path=%s, compression=%s, threads=%s)",
+            self.__class__.__name__,
+            file_path,
+            compression,
+            threads,
+        )
+        self._file_path: str = file_path
+        self._compression: str = compression
+        self._threads: int = threads
+        self._chunks_queue: queue.Queue = queue.Queue(self.QUEUE_SIZE)
+        self._stop: threading.Event = threading.Event()
+        self._error: typing.Optional[BaseException] = None
+        self._chunk: memoryview = memoryview(b"")
+        self._exhausted: bool = False
+        self._decompressor_thread: threading.Thread = threading.Thread(
+            target=self._run_decompressor, name="input-decompressor", daemon=True
+        )
+        self._decompressor_thread.start()
+
+    def readable(self) -> bool:
+        """The stream can be read"""
+
+        return True
+
+    def readinto(self, buffer: typing.Any) -> int:
+        """Copies the next decompressed bytes to the buffer
+
+        Parameters
+        ----------
+        buffer : typing.Any
+            A writable bytes-like object
+
+        Returns
+        -------
+        int
+            the number of bytes copied, 0 once the end of the content was reached.
+        """
+
+        while not self._chunk:
+            if self._exhausted:
+                return 0
+
+            try:
+                chunk = self._chunks_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if chunk is _END:
+                self._exhausted = True
+                if self._error is not None:
+                    raise self._error
+
+                return 0
+
+            self._chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self) -> None:
+        """Stops the background thread, and closes the stream"""
+
+        if not self.closed:
+            logging.debug("%s.close()", self.__class__.__name__)
+            self._stop.set()
+            self._decompressor_thread.join()
+
+        super().close()
+
+    def _run_decompressor(self) -> None:
+        """Puts the decompressed chunks in the queue, until the end of the file"""
+
+        try:
+            for chunk in self._iter_decompressed_chunks():
+                if not put(self._chunks_queue, chunk, self._stop):
+                    return
+        except BaseException as error:
+            logging.debug("The decompression of the input file failed: %r", error)
+            self._error = error
+
+        put(self._chunks_queue, _END, self._stop)
+
+    def _iter_decompressed_chunks(self) -> typing.Iterator[bytes]:
+        """Decompresses the file
+
+        Returns
+        -------
+        typing.Iterator[bytes]
+            the decompressed chunks, in order.
+        """
+
+        if self._compression == constants.GZIP_COMPRESSION and self._threads > 1:
+            yield from self._iter_parallel_gzip_chunks()
+            return
+
+        yield from self._iter_sequential_chunks(0)
+
+    def _iter_sequential_chunks(self, offset: int) -> typing.Iterator[bytes]:
+        """Decompresses the file sequentially, from a position
+
+        Parameters
+        ----------
+        offset : int
+            The position of the file where the decompression starts, at the beginning
+            of a gzip member, or 0
+
+        Returns
+        -------
+        typing.Iterator[bytes]
+            the decompressed chunks, in order.
+        """
+
+        with open(self._file_path, "rb") as compressed_file:
+            compressed_file.seek(offset)
+            with OPENERS[self._compression](compressed_file, "rb") as input_file:
+                while not self._stop.is_set():
+                    chunk = input_file.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        return
+
+                    yield chunk
+
+    def _iter_parallel_gzip_chunks(self) -> typing.Iterator[bytes]:
+        """Decompresses in parallel the segments of members of a gzip file
+
+        At most twice as many segments as threads are decompressed or waiting to be
+        read, so the memory stays bounded.
+
+        Returns
+        -------
+        typing.Iterator[bytes]
+            the decompressed chunks of the segments, in order.
+        """
+
+        segments = self._split_gzip_members()
+        if len(segments) == 1:
+            logging.debug("A single segment of gzip members was found")
+            yield from self._iter_sequential_chunks(0)
+            return
+
+        logging.debug(
+            "%s segments of gzip members will be decompressed by %s threads",
+            len(segments),
+            self._threads,
+        )
+        with concurrent.futures.ThreadPoolExecutor(
+            self._threads, thread_name_prefix="input-decompressor"
+        ) as executor:
+            pending = collections.deque()
+            next_segment_index = 0
+            while pending or next_segment_index < len(segments):
+                while (
+                    next_segment_index < len(segments)
+                    and len(pending) < 2 * self._threads
+                ):
+                    start, end = segments[next_segment_index]
+                    pending.append(
+                        (start, executor.submit(self._decompress_segment, start, end))
+                    )
+                    next_segment_index += 1
+
+                start, future = pending.popleft()
+                data = future.result()
+                if data is None:
+                    logging.debug(
+                        "The segment at the position %s doesn't end with a whole gzip "
+                        "member. The rest of the file will be decompressed "
+                        "sequentially",
+                        start,
+                    )
+                    for _, future in pending:
+                        future.cancel()
+
+                    yield from self._iter_sequential_chunks(start)
+                    return
+
+                # The queue holds views of the decompressed segment, so its chunks
+                # aren't copied:
+                data = memoryview(data)
+                for offset in range(0, len(data), self.CHUNK_SIZE):
+                    if self._stop.is_set():
+                        return
+
+                    yield data[offset : offset + self.CHUNK_SIZE]
+
+    def _split_gzip_members(self) -> typing.List[typing.Tuple[int, int]]:
+        """Splits the gzip file in segments of whole members
+
+        A boundary is searched every `SEGMENT_SIZE` bytes: it's the first header of a
+        gzip member after that position, whose first bytes can be decompressed.
+
+        Returns
+        -------
+        typing.List[typing.Tuple[int, int]]
+            the start and end positions of the segments.
+        """
+
+        boundaries = [0]
+        with open(self._file_path, "rb") as compressed_file:
+            file_size = compressed_file.seek(0, io.SEEK_END)
+            position = self.SEGMENT_SIZE
+            while position < file_size and not self._stop.is_set():
+                boundary = self._find_gzip_member(compressed_file, position)
+                if boundary is None:
+                    break
+
+                boundaries.append(boundary)
+                position = boundary + self.SEGMENT_SIZE
+
+        boundaries.append(file_size)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _find_gzip_member(
+        self, compressed_file: typing.BinaryIO, position: int
+    ) -> typing.Optional[int]:
+        """Finds the first header of a gzip member after a position
+
+        Parameters
+        ----------
+        compressed_file : typing.BinaryIO
+            The gzip file, opened in binary mode
+        position : int
+            The position where the search starts
+
+        Returns
+        -------
+        typing.Optional[int]
+            the position of the header, or None if there isn't any other member.
+        """
+
+        overlap = len(GZIP_MEMBER_HEADER) - 1
+        while True:
+            compressed_file.seek(position)
+            block = compressed_file.read(self.CHUNK_SIZE)
+            if len(block) < len(GZIP_MEMBER_HEADER):
+                return None
+
+            index = block.find(GZIP_MEMBER_HEADER)
+            while index != -1:
+                compressed_file.seek(position + index)
+                if self._is_gzip_member(compressed_file.read(self.HEADER_CHECK_SIZE)):
+                    return position + index
+
+                index = block.find(GZIP_MEMBER_HEADER, index + 1)
+
+            position += max(len(block) - overlap, 1)
+
+    @staticmethod
+    def _is_gzip_member(data: bytes) -> bool:
+        """Checks if the data can be the beginning of a gzip member
+
+        Parameters
+        ----------
+        data : bytes
+            The first bytes after a candidate header
+
+        Returns
+        -------
+        bool
+            True if they can be decompressed, or False otherwise.
+        """
+
+        try:
+            zlib.decompressobj(GZIP_WBITS).decompress(data)
+        except zlib.error:
+            return False
+
+        return True
+
+    def _decompress_segment(self, start: int, end: int) -> typing.Optional[bytes]:
+        """Decompresses a segment of whole gzip members
+
+        Parameters
+        ----------
+        start : int
+            The position of the header of the first member of the segment
+        end : int
+            The position after the end of the last member of the segment
+
+        Returns
+        -------
+        typing.Optional[bytes]
+            the decompressed content of the members, or None if the segment isn't
+            made of whole valid members.
+        """
+
+        if self._stop.is_set():
+            return b""
+
+        with open(self._file_path, "rb") as compressed_file:
+            compressed_file.seek(start)
+            data = compressed_file.read(end - start)
+
+        decompressed_members = []
+        while data:
+            decompressor = zlib.decompressobj(GZIP_WBITS)
+            try:
+                decompressed_members.append(decompressor.decompress(data))
+            except zlib.error:
+                return None
+
+            if not decompressor.eof:
+                return None
+
+            data = decompressor.unused_data
+
+        return b"".join(decompressed_members)
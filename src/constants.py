@@ -6,4 +6,88 @@ DEBUG_MESSAGE_FORMAT = "%(levelname)s|%(filename)s:%(lineno)s|%(asctime)s|%(mess
 DATE_FORMAT = "%H:%M:%S"
 DEFAULT_DBM_ANT_VALUE = -135
 ANTENNA_IDS = [201, 202, 203, 204, 205, 206]
+# The bitmask of the antennas received by a beacon must fit in the 64 bits attribute
+# of its HDF5 dataset:
+MAX_ANTENNAS_COUNT = 64
+DROP_UNKNOWN_ANTENNAS = "drop"
+COUNT_UNKNOWN_ANTENNAS = "count"
+SIDE_FILE_UNKNOWN_ANTENNAS = "side-file"
+UNKNOWN_ANTENNAS_POLICIES = [
+    DROP_UNKNOWN_ANTENNAS,
+    COUNT_UNKNOWN_ANTENNAS,
+    SIDE_FILE_UNKNOWN_ANTENNAS,
+]
+UNKNOWN_ANTENNAS_FILE_NAME = "unknown_antennas.ndjson"
 RESULTS_FILE_NAME = "results.json"
+NDJSON_RESULTS_FILE_NAME = "results.ndjson"
+HDF5_ENGINE = "hdf5"
+MEMORY_ENGINE = "memory"
+COLUMNAR_ENGINE = "columnar"
+PARTITIONED_ENGINE = "partitioned"
+LITE_ENGINE = "lite"
+ENGINES = [HDF5_ENGINE, MEMORY_ENGINE, COLUMNAR_ENGINE, PARTITIONED_ENGINE, LITE_ENGINE]
+# Input files smaller than this are aggregated by the 'lite' engine, unless an engine
+# is selected:
+DEFAULT_SMALL_INPUT_THRESHOLD_MB = 16
+DEFAULT_MEMORY_BUDGET_MB = 1024
+DEFAULT_PARTITIONS_COUNT = 64
+DEFAULT_WORKERS_COUNT = 1
+LINES_INPUT_FORMAT = "lines"
+STREAM_INPUT_FORMAT = "stream"
+INPUT_FORMATS = [LINES_INPUT_FORMAT, STREAM_INPUT_FORMAT]
+GZIP_COMPRESSION = "gzip"
+BZIP2_COMPRESSION = "bz2"
+XZ_COMPRESSION = "xz"
+COMPRESSIONS = [GZIP_COMPRESSION, BZIP2_COMPRESSION, XZ_COMPRESSION]
+# Number of threads that decompress in parallel the members of a gzip input file:
+DEFAULT_DECOMPRESSION_THREADS = 4
+FLOAT64_VECTOR_DTYPE = "float64"
+FLOAT32_VECTOR_DTYPE = "float32"
+VECTOR_DTYPES = [FLOAT64_VECTOR_DTYPE, FLOAT32_VECTOR_DTYPE]
+FIRST_REDUCTION = "first"
+LAST_REDUCTION = "last"
+MEAN_REDUCTION = "mean"
+MAX_REDUCTION = "max"
+MIN_REDUCTION = "min"
+REDUCTIONS = [
+    FIRST_REDUCTION,
+    LAST_REDUCTION,
+    MEAN_REDUCTION,
+    MAX_REDUCTION,
+    MIN_REDUCTION,
+]
+PRETTY_OUTPUT_FORMAT = "pretty"
+COMPACT_OUTPUT_FORMAT = "compact"
+NDJSON_OUTPUT_FORMAT = "ndjson"
+OUTPUT_FORMATS = [PRETTY_OUTPUT_FORMAT, COMPACT_OUTPUT_FORMAT, NDJSON_OUTPUT_FORMAT]
+SORT_BY_BEACON = "beacon"
+SORT_BY_TIME = "time"
+SORT_BY_BEACON_TIME = "beacon_time"
+SORT_KEYS = [SORT_BY_BEACON, SORT_BY_TIME, SORT_BY_BEACON_TIME]
+# Max number of records sorted in memory, before spill them to disk, with --sort-by:
+DEFAULT_SORT_RUN_SIZE = 100000
+SHARD_BY_BEACON = "beacon"
+SHARD_BY_HOUR = "hour"
+SHARD_BY_DAY = "day"
+SHARD_KEYS = [SHARD_BY_BEACON, SHARD_BY_HOUR, SHARD_BY_DAY]
+DEFAULT_SHARDS_COUNT = 8
+MANIFEST_FILE_NAME = "manifest.json"
+NPY_MATRIX_FORMAT = "npy"
+HDF5_MATRIX_FORMAT = "hdf5"
+MATRIX_FORMATS = [NPY_MATRIX_FORMAT, HDF5_MATRIX_FORMAT]
+NPY_VECTORS_FILE_NAME = "results_vectors.npy"
+NPY_BEACON_IDS_FILE_NAME = "results_beacon_ids.npy"
+NPY_TIMESTAMPS_FILE_NAME = "results_timestamps.npy"
+MATRIX_HEADER_FILE_NAME = "results_antennas.json"
+HDF5_RESULTS_FILE_NAME = "results.h5"
+
+# The profile of a run with --profile is dumped in this file of the output directory,
+# and its functions with the highest cumulative time are logged:
+PROFILE_FILE_NAME = "profile.pstats"
+PROFILE_TOP_FUNCTIONS = 25
+
+# Min number of seconds between two checkpoints of a run:
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+# Seconds between two polls of the input JSON file for new lines, with --follow:
+DEFAULT_FOLLOW_POLL_INTERVAL = 1.0
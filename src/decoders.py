@@ -0,0 +1,141 @@
+"""Provides a fast decoder of the lines of the input JSON file
+
+The decoder recognizes, with a single regular expression, the lines that contain a
+JSON document with the expected fields in the usual order, e.g.:
+{"BeaconId":208,"ant_id":201,"dbm_ant":-92.32518086711575,"timestamp":"2016-11-22T..."}
+
+It only accepts the values for which json + pydantic would produce exactly the same
+reading: integer literals for BeaconId and ant_id, number literals for dbm_ant, and
+strings without escape sequences for timestamp. Any other line must be parsed with the
+json + pydantic path, that coerces the values, or reports why the line is invalid.
+
+The same checks are available for an already decoded JSON document: it's accepted when
+it has just the expected fields, with values of exactly the expected types.
+
+This file can be imported as a module and contains the following functions:
+    * decode_line(line) - decodes a line into a BeaconReading
+    * decode_line_bytes(buffer, start, end) - decodes a line of a bytes-like object,
+    without copying it, into a BeaconReading
+    * decode_document(document) - converts a decoded JSON document into a BeaconReading
+"""
+
+import re
+import typing
+
+from src.models import BeaconReading
+
+_WHITESPACE = r"[ \t\n\r]*"
+_INTEGER = r"-?(?:0|[1-9][0-9]*)"
+_NUMBER = _INTEGER + r"(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?"
+_STRING = r'"([^"\\\x00-\x1f]*)"'
+
+
+def _member(name: str, value_pattern: str) -> str:
+    """Returns the pattern of a JSON object member, surrounded by whitespace"""
+
+    return (
+        f'{_WHITESPACE}"{name}"{_WHITESPACE}:{_WHITESPACE}{value_pattern}{_WHITESPACE}'
+    )
+
+
+LINE_PATTERN = re.compile(
+    r"\{"
+    + _member("BeaconId", f"({_INTEGER})")
+    + ","
+    + _member("ant_id", f"({_INTEGER})")
+    + ","
+    + _member("dbm_ant", f"({_NUMBER})")
+    + ","
+    + _member("timestamp", _STRING)
+    + r"\}"
+)
+LINE_BYTES_PATTERN = re.compile(LINE_PATTERN.pattern.encode("ascii"))
+
+
+def decode_line(line: str) -> typing.Optional[BeaconReading]:
+    """Decodes a line with a JSON document into a BeaconReading
+
+    Parameters
+    ----------
+    line : str
+        A string line that should contains a JSON document with a beacon data
+
+    Returns
+    -------
+    typing.Optional[BeaconReading]
+        the reading contained in the line, or None if the line can't be decoded by the
+        fast decoder.
+    """
+
+    match = LINE_PATTERN.fullmatch(line)
+    if match is None:
+        return None
+
+    beacon_id, ant_id, dbm_ant, timestamp = match.groups()
+    return BeaconReading(int(beacon_id), int(ant_id), float(dbm_ant), timestamp)
+
+
+def decode_line_bytes(
+    buffer: typing.Any, start: int, end: int
+) -> typing.Optional[BeaconReading]:
+    """Decodes a line of a bytes-like object into a BeaconReading
+
+    The line is matched in place, so only the bytes of the fields values are copied.
+
+    Parameters
+    ----------
+    buffer : typing.Any
+        A bytes-like object (e.g. bytes, mmap.mmap or memoryview) with the line
+    start : int
+        Offset of the first byte of the line in the buffer
+    end : int
+        Offset of the byte that follows the last one of the line in the buffer
+
+    Returns
+    -------
+    typing.Optional[BeaconReading]
+        the reading contained in the line, or None if the line can't be decoded by the
+        fast decoder.
+    """
+
+    match = LINE_BYTES_PATTERN.fullmatch(buffer, start, end)
+    if match is None:
+        return None
+
+    beacon_id, ant_id, dbm_ant, timestamp = match.groups()
+    return BeaconReading(
+        int(beacon_id), int(ant_id), float(dbm_ant), timestamp.decode("utf-8")
+    )
+
+
+def decode_document(document: typing.Any) -> typing.Optional[BeaconReading]:
+    """Converts an already decoded JSON document into a BeaconReading
+
+    Parameters
+    ----------
+    document : typing.Any
+        A JSON document decoded with json, that should contain a beacon data
+
+    Returns
+    -------
+    typing.Optional[BeaconReading]
+        the reading contained in the document, or None if it must be validated with
+        pydantic.
+    """
+
+    if type(document) is not dict or len(document) != 4:
+        return None
+
+    beacon_id = document.get("BeaconId")
+    ant_id = document.get("ant_id")
+    dbm_ant = document.get("dbm_ant")
+    timestamp = document.get("timestamp")
+    if (
+        type(beacon_id) is int
+        and type(ant_id) is int
+        and type(dbm_ant) in (float, int)
+        and type(timestamp) is str
+    ):
+        return BeaconReading(beacon_id, ant_id, float(dbm_ant), timestamp)
+
+    return None
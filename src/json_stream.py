@@ -0,0 +1,179 @@
+"""Provides an incremental reader of the JSON documents of a top level JSON array
+
+The input file is read in fixed size buffers, and every JSON document of the top level
+array is returned as soon as it's complete, no matter how the array is laid out in
+lines (one document per line, pretty printed, or minified in a single line). The whole
+array is never loaded in memory: only the current buffer, and at most one incomplete
+document of up to `MAX_DOCUMENT_SIZE` characters.
+
+This file can be imported as a module and contains the following classes:
+    * JSONArrayReader - returns the JSON documents of the top level array of a file
+"""
+
+import json
+import logging
+import typing
+
+
+class JSONArrayReader:
+    """Returns incrementally the JSON documents of the top level array of a file
+
+    A document that can't be decoded is reported with a warning and skipped, by
+    resuming after the next '}' character.
+
+    Attributes
+    ----------
+    BUFFER_SIZE : int
+        default number of characters read from the input file at once.
+
+    MAX_DOCUMENT_SIZE : int
+        max number of characters of a document. A longer document is considered
+        malformed.
+    """
+
+    BUFFER_SIZE = 1024 * 1024
+    MAX_DOCUMENT_SIZE = 1024 * 1024
+    WHITESPACE = " \t\n\r"
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, input_file: typing.TextIO, buffer_size: int = BUFFER_SIZE):
+        """
+        Parameters
+        ----------
+        input_file : typing.TextIO
+            The input file, opened in text mode
+        buffer_size : int
+            Number of characters read from the input file at once
+        """
+
+        self._input_file: typing.TextIO = input_file
+        self._buffer_size: int = buffer_size
+        self._text: str = ""
+        self._pos: int = 0
+        self._eof: bool = False
+        self.array_closed: bool = False
+        # Number of bytes of the text read from the input file, encoded in UTF-8:
+        self.bytes_read: int = 0
+
+    def _fill(self) -> bool:
+        """Appends a new block of the input file, dropping the already consumed text
+
+        Returns
+        -------
+        bool
+            False if the end of the input file was already reached.
+        """
+
+        if self._eof:
+            return False
+
+        block = self._input_file.read(self._buffer_size)
+        if not block:
+            self._eof = True
+            return False
+
+        self.bytes_read += (
+            len(block) if block.isascii() else len(block.encode("utf-8"))
+        )
+        self._text = self._text[self._pos :] + block
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self) -> typing.Optional[str]:
+        """Moves to the next character that is not whitespace
+
+        Returns
+        -------
+        typing.Optional[str]
+            the next character that is not whitespace, or None at the end of the file.
+        """
+
+        while True:
+            text = self._text
+            pos = self._pos
+            while pos < len(text) and text[pos] in self.WHITESPACE:
+                pos += 1
+
+            self._pos = pos
+            if pos < len(text):
+                return text[pos]
+
+            if not self._fill():
+                return None
+
+    def _decode_document(self, document_index: int) -> typing.Tuple[typing.Any, int]:
+        """Decodes the document that starts at the current position
+
+        Parameters
+        ----------
+        document_index : int
+            The base 1 index of the document in the array
+
+        Returns
+        -------
+        typing.Tuple[typing.Any, int]
+            the decoded document, or None if it's malformed, and the position where the
+            next document should be looked for. The position is -1 when a malformed
+            document can't be skipped.
+        """
+
+        while True:
+            try:
+                document, end = self._decoder.raw_decode(self._text, self._pos)
+                # A document that ends with the buffer could continue in the file
+                # (e.g. a number), try again with more text:
+                if end < len(self._text) or not self._fill():
+                    return document, end
+            except json.JSONDecodeError:
+                # The document can be incomplete, because the end of the buffer was
+                # reached. Try again with more text, unless it's already too long:
+                if (
+                    len(self._text) - self._pos > self.MAX_DOCUMENT_SIZE
+                    or not self._fill()
+                ):
+                    logging.warning(
+                        "JSON document #'%s' is malformed. It will be ignored",
+                        document_index,
+                    )
+                    end = self._text.find("}", self._pos)
+                    return None, end + 1 if end >= 0 else -1
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+        """Returns the JSON documents of the top level array
+
+        Returns
+        -------
+        typing.Iterator[typing.Tuple[int, typing.Any]]
+            the base 1 index of every document in the array, and the decoded document.
+        """
+
+        if self._skip_whitespace() != "[":
+            logging.warning("The input file doesn't contain a JSON array")
+            return
+
+        self._pos += 1
+        document_index = 0
+        while True:
+            char = self._skip_whitespace()
+            if char is None:
+                logging.warning("The JSON array of the input file is not closed")
+                return
+
+            if char == "]":
+                logging.debug("The end of the JSON array was found")
+                self.array_closed = True
+                return
+
+            if char == ",":
+                self._pos += 1
+                continue
+
+            document_index += 1
+            document, end = self._decode_document(document_index)
+            if end < 0:
+                return
+
+            self._pos = end
+            if document is not None:
+                yield document_index, document
@@ -0,0 +1,208 @@
+"""Provides the parsing of the lines of the input JSON file
+
+Every line of the input JSON file contains a JSON document with a beacon reading, and
+the array of JSON documents is opened and closed by the lines with the characters '['
+and ']'. A line is decoded with the fast decoder when it's enabled, and otherwise, or
+when the fast decoder doesn't recognize it, with json and pydantic, so the warning
+about an invalid line is as precise as possible.
+
+This file can be imported as a module and contains the following classes:
+    * LinesParser - parses the JSON documents from the lines of the input JSON file,
+    counting the parsed and the rejected ones
+"""
+
+import json
+import logging
+import os
+import typing
+
+from src import decoders
+from src import models
+from src.run_stats import RunStats
+from src.run_stats import measure
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+
+class LinesParser:
+    """Parses the JSON documents from the lines of the input JSON file
+
+    It only holds the decoder option and the counters of the parsed lines, so a parser
+    thread can use its own instance without sharing any state with the storage.
+    """
+
+    def __init__(
+        self, fast_decoder: bool = False, stats: typing.Optional[RunStats] = None
+    ):
+        """
+        Parameters
+        ----------
+        fast_decoder : bool
+            If the lines are decoded with the fast decoder of `src.decoders` first.
+        stats : typing.Optional[RunStats]
+            Collects the time spent validating the JSON documents. When None, it's
+            not collected.
+        """
+
+        self._fast_decoder: bool = fast_decoder
+        self._stats: typing.Optional[RunStats] = stats
+        self._records_parsed_count: int = 0
+        self._records_rejected_count: int = 0
+        self._closing_bracket_found: bool = False
+
+    def _iter_json_documents(
+        self, lines: typing.Iterable[str], line_index: int = 1
+    ) -> typing.Iterator["JSONDocumentModel"]:
+        """Parses the JSON documents from the lines of the input JSON file.
+
+        Parsing stops at the line with the character ']' that closes the array of JSON
+        documents.
+
+        Parameters
+        ----------
+        lines : typing.Iterable[str]
+            The lines of the input JSON file to parse
+        line_index : int
+            The number of the first line in the input JSON file
+
+        Returns
+        -------
+        typing.Iterator[JSONDocumentModel]
+            the valid JSON documents found in the lines.
+        """
+
+        for line in lines:
+            line = line.strip()
+            logging.debug("Line '%s''s content after strip spaces:", line_index)
+            logging.debug(line)
+
+            if not line or line == os.linesep:
+                logging.warning("Line '%s' is empty, it will be ignored", line_index)
+                line_index += 1
+                continue
+
+            if line in ("]", f"]{os.linesep}"):
+                logging.debug("The end of the file was found at line #'%s'", line_index)
+                self._closing_bracket_found = True
+                break
+
+            if line in ("[", f"[{os.linesep}"):
+                logging.debug(
+                    "The first line of the file was found at line #'%s'", line_index
+                )
+                line_index += 1
+                continue
+
+            try:
+                # Looking for the index of the character that close a JSON
+                # document definition:
+                open_brace_idx = line.index("{")
+                close_brace_idx = line.rindex("}")
+                if open_brace_idx != 0:
+                    logging.warning(
+                        "Line #'%s' is malformed. The open curly brace character "
+                        "'{' must be the first in the every line",
+                        line_index,
+                    )
+                    self._records_rejected_count += 1
+                    line_index += 1
+                    continue
+            except ValueError:
+                # Line is malformed:
+                logging.exception(
+                    "Line #'%s' is malformed. Every JSON document should be in "
+                    "its own line:",
+                    line_index,
+                )
+                self._records_rejected_count += 1
+                line_index += 1
+                continue
+
+            # Ignore any character(including the ',' character) that appears after
+            # the '}' character, at the end
+            # of the line:
+            line = line[: close_brace_idx + 1]
+            json_document: typing.Optional["JSONDocumentModel"] = None
+            if self._fast_decoder:
+                json_document = decoders.decode_line(line)
+
+            if json_document is None:
+                # Parse with json and validate with pydantic, so the warning about an
+                # invalid line is as precise as possible:
+                json_document = self.parse_text_line(line, line_index)
+
+            line_index += 1
+            if json_document is None:
+                # Line doesn't contains a valid JSON document:
+                self._records_rejected_count += 1
+                continue
+
+            self._records_parsed_count += 1
+            yield json_document
+
+    def _parse_lines_block(
+        self, lines_block: typing.Tuple[int, typing.List[str]]
+    ) -> typing.Tuple[typing.List["JSONDocumentModel"], bool]:
+        """Parses the JSON documents from a block of lines of the input JSON file.
+
+        Parameters
+        ----------
+        lines_block : typing.Tuple[int, typing.List[str]]
+            The number of the first line of the block, and its lines
+
+        Returns
+        -------
+        typing.Tuple[typing.List[JSONDocumentModel], bool]
+            the valid JSON documents found in the lines, and if the closing bracket of
+            the array of JSON documents was found.
+        """
+
+        line_index, lines = lines_block
+        json_documents = list(self._iter_json_documents(lines, line_index))
+        return json_documents, self._closing_bracket_found
+
+    def parse_text_line(
+        self, line: str, line_index: int
+    ) -> typing.Optional["JSONDocumentModel"]:
+        """Tries to parse from a string a beacon input record.
+
+        It will first try to load a JSON document from the string, and then initialize
+        a JSONDocumentModel with it.
+
+        Parameters
+        ----------
+        line : str
+            A string line that should contains a JSON document with a beacon data
+        line_index : int
+            Represents the base 0 index, of the string line in the input file
+
+        Returns
+        -------
+        typing.Optional[JSONDocumentModel]
+            If from the line could be loaded a JSON document and contains the expected
+            fields, will be returned a JSONDocumentModel instance with the data.
+            If not, None will be returned.
+        """
+
+        logging.debug("%s.parse_text_line(...)", self.__class__.__name__)
+        try:
+            # Deserialize a text line containing a JSON document, to a Python dict:
+            data = json.loads(line)
+            # Validate the JSON document structure, and use the model to access its
+            # content:
+            with measure(self._stats, "validation"):
+                return models.JSONDocumentModel(**data)
+        except json.JSONDecodeError:
+            logging.warning(
+                "JSON document in line #'%s' is malformed. It will be ignored",
+                line_index,
+            )
+            return None
+        except ValueError:
+            logging.warning(
+                "JSON document in line '%s' is invalid or malformed. It must contain "
+                "all/just the expected fields. It will be ignored",
+                line_index,
+            )
+            return None
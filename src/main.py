@@ -3,50 +3,350 @@
 This script allows the user to process an input JSON file, to create an output JSON
 file where every beacon is associated with his corresponding vector of dbm_ant values.
 
+When no engine is selected, the engine and its parameters are chosen by the execution
+planner (see `src.planner`), from a sample of the input and the host resources. The
+storage engines that depend on h5py and numpy are only imported when they're selected,
+so the runs of the other engines start faster.
+
 This file can also be imported as a module and contains the following functions:
+    * create_storage - creates the storage engine selected by the arguments
+    * log_profile - dumps a profile, and logs its most expensive functions
     * main - the main function of the script
 """
 
+import argparse
+import cProfile
+import dataclasses
+import io
 import logging
 import os
+import pstats
 import sys
+import typing
 
+from src import compressed_input
 from src import constants
-from src.hdf5_storage import HDF5Storage
+from src.base_storage import BaseStorage
+from src.matrix_writers import HDF5MatrixWriter
+from src.matrix_writers import NPYMatrixWriter
+from src.memory_storage import MemoryStorage
+from src.multi_file_storage import MultiFileStorage
+from src.options import AggregationOptions
+from src.options import CheckpointOptions
+from src.options import InputOptions
 from src.output_processor import OutputProcessor
+from src.parallel_storage import ParallelStorage
+from src.partitioned_storage import PartitionedStorage
+from src import planner
+from src.run_stats import RunStats
+from src.run_stats import measure
+from src.sharded_output_processor import ShardedOutputProcessor
+from src.sorted_output_processor import SortedOutputProcessor
 from src import utils
 
+MATRIX_WRITERS = {
+    constants.NPY_MATRIX_FORMAT: NPYMatrixWriter,
+    constants.HDF5_MATRIX_FORMAT: HDF5MatrixWriter,
+}
+
+
+def create_storage(
+    args: argparse.Namespace,
+    input_file_path: str,
+    output_processor: OutputProcessor,
+    stats: typing.Optional[RunStats] = None,
+) -> BaseStorage:
+    """Creates the storage engine selected by the command line's arguments
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        contains the user supplied command line arguments
+    input_file_path : str
+        The full file path of the input JSON file to process. With more than one
+        input JSON file in the arguments, they are all processed
+    output_processor : OutputProcessor
+        Handles the storage of the results records
+    stats : typing.Optional[RunStats]
+        Collects the timings and counters of the run. When None, they are not
+        collected.
+
+    Returns
+    -------
+    BaseStorage
+        the storage engine, not entered yet.
+    """
+
+    input_options = InputOptions(
+        fast_decoder=args.fast_decoder,
+        input_format=args.input_format,
+        memory_map=args.mmap,
+        pipelined=args.pipeline,
+        follow=args.follow,
+        follow_poll_interval=args.poll_interval,
+        follow_idle_timeout=args.idle_timeout,
+        compression=args.compression,
+        decompression_threads=args.decompression_threads,
+    )
+    aggregation_options = AggregationOptions(
+        vector_dtype=args.vector_dtype,
+        allowed_lateness=args.allowed_lateness,
+        duplicates_reduction=args.duplicates_reduction,
+        count_vector=args.count_vector,
+        unknown_antennas=args.unknown_antennas,
+        unknown_antennas_file_path=os.path.join(
+            args.output_directory, constants.UNKNOWN_ANTENNAS_FILE_NAME
+        ),
+    )
+    checkpoint_options = (
+        None
+        if args.checkpoint_dir is None
+        else CheckpointOptions(
+            args.checkpoint_dir, args.checkpoint_interval, args.resume
+        )
+    )
+    if len(args.input_file_paths) > 1:
+        storage = MultiFileStorage(
+            args.input_file_paths,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            args.memory_budget * 1024 * 1024,
+            args.spill_directory,
+            args.workers,
+            args.cache_dir,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+    elif args.engine == constants.MEMORY_ENGINE and args.workers > 1:
+        storage = ParallelStorage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            args.memory_budget * 1024 * 1024,
+            args.spill_directory,
+            args.workers,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+    elif args.engine == constants.MEMORY_ENGINE:
+        storage = MemoryStorage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            args.memory_budget * 1024 * 1024,
+            args.spill_directory,
+            input_options,
+            aggregation_options,
+            stats,
+            checkpoint_options,
+        )
+    elif args.engine == constants.LITE_ENGINE:
+        # The readings are decoded without pydantic, as long as the lines are in the
+        # usual form:
+        storage = MemoryStorage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            args.memory_budget * 1024 * 1024,
+            args.spill_directory,
+            dataclasses.replace(input_options, fast_decoder=True),
+            aggregation_options,
+            stats,
+        )
+    elif args.engine == constants.PARTITIONED_ENGINE:
+        storage = PartitionedStorage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            args.partitions,
+            args.spill_directory,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+    elif args.engine == constants.COLUMNAR_ENGINE:
+        from src.columnar_hdf5_storage import ColumnarHDF5Storage
+
+        storage = ColumnarHDF5Storage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+    else:
+        from src.hdf5_storage import HDF5Storage
+
+        storage = HDF5Storage(
+            input_file_path,
+            output_processor,
+            args.default_dbm_ant_value,
+            args.antenna_ids,
+            input_options,
+            aggregation_options,
+            stats,
+            checkpoint_options,
+        )
+
+    return storage
+
+
+def log_profile(profiler: cProfile.Profile, output_directory_path: str) -> None:
+    """Dumps a profile to the output directory, and logs its most expensive functions
+
+    Parameters
+    ----------
+    profiler : cProfile.Profile
+        The profiler of the run
+    output_directory_path : str
+        The directory where the profile is dumped
+    """
+
+    profile_file_path = os.path.join(output_directory_path, constants.PROFILE_FILE_NAME)
+    profiler.dump_stats(profile_file_path)
+    profile_stream = io.StringIO()
+    pstats.Stats(profiler, stream=profile_stream).sort_stats(
+        pstats.SortKey.CUMULATIVE
+    ).print_stats(constants.PROFILE_TOP_FUNCTIONS)
+    logging.info(
+        "The profile of the run was dumped to: '%s'%s%s",
+        profile_file_path,
+        os.linesep,
+        profile_stream.getvalue(),
+    )
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    """Program entrypoint
 
-def main() -> None:
-    """Program entrypoint"""
+    Parameters
+    ----------
+    argv : typing.Optional[typing.List[str]]
+        The command line's arguments. When None, the arguments of the process are
+        used.
+    """
     parser = utils.init_argparse()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     # Configure logger:
     utils.config_logger(args)
     logging.debug("main()")
-    input_file_path = utils.validate_input_file_path(args)
-    if not input_file_path:
+    input_file_paths = utils.validate_input_file_paths(args)
+    if not input_file_paths:
         sys.exit()
 
+    args.input_file_paths = input_file_paths
+    input_file_path = input_file_paths[0]
+
     output_directory_path = utils.validate_output_directory_path(args)
     if not output_directory_path:
         sys.exit()
 
-    output_file_path = os.path.join(output_directory_path, constants.RESULTS_FILE_NAME)
+    results_file_name = (
+        constants.NDJSON_RESULTS_FILE_NAME
+        if args.output_format == constants.NDJSON_OUTPUT_FORMAT
+        else constants.RESULTS_FILE_NAME
+    )
+    output_file_path = os.path.join(output_directory_path, results_file_name)
     logging.info(
         "The output JSON file will be saved in the following path: '%s'",
         output_file_path,
     )
 
-    output_processor = OutputProcessor(output_file_path)
-    with HDF5Storage(
-        input_file_path,
-        output_processor,
-        constants.DEFAULT_DBM_ANT_VALUE,
-        constants.ANTENNA_IDS,
-    ) as hdf5_storage:
-        hdf5_storage.parse_json_documents_from_file()
-        hdf5_storage.persist_beacons_vectors_to_results_file()
+    if not utils.validate_antenna_schema(args):
+        sys.exit()
+
+    planner.plan_execution(args)
+
+    if len(input_file_paths) > 1:
+        logging.info(
+            "The %s input JSON files will be aggregated in this order: %s",
+            len(input_file_paths),
+            input_file_paths,
+        )
+
+    # The compression of every one of many input files is detected by the worker
+    # process that reads it:
+    args.compression = (
+        None
+        if len(input_file_paths) > 1
+        else compressed_input.detect_compression(input_file_path)
+    )
+    if args.compression is not None:
+        logging.info(
+            "The input JSON file is compressed with %s, it will be decompressed while "
+            "it's parsed",
+            args.compression,
+        )
+
+    if not utils.validate_options(args):
+        sys.exit()
+
+    matrix_writers = [
+        MATRIX_WRITERS[matrix_format](
+            output_directory_path,
+            args.antenna_ids,
+            args.default_dbm_ant_value,
+            args.vector_dtype,
+        )
+        for matrix_format in dict.fromkeys(args.matrix_output)
+    ]
+    stats = RunStats() if args.stats else None
+    if args.shard_by is not None:
+        output_processor = ShardedOutputProcessor(
+            output_directory_path,
+            results_file_name,
+            args.shard_by,
+            args.shards,
+            args.output_format,
+            matrix_writers,
+            stats,
+        )
+    elif args.sort_by is None:
+        output_processor = OutputProcessor(
+            output_file_path, args.output_format, matrix_writers, args.pipeline, stats
+        )
+    else:
+        output_processor = SortedOutputProcessor(
+            output_file_path,
+            args.sort_by,
+            args.sort_run_size,
+            args.spill_directory,
+            args.output_format,
+            matrix_writers,
+            args.pipeline,
+            stats,
+        )
+
+    storage = create_storage(args, input_file_path, output_processor, stats)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        with measure(stats, "total"):
+            with storage as beacons_storage:
+                with measure(stats, "parse_input_file"):
+                    beacons_storage.parse_json_documents_from_file()
+
+                with measure(stats, "persist_at_end"):
+                    beacons_storage.persist_beacons_vectors_to_results_file()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            log_profile(profiler, output_directory_path)
+
+        if stats is not None:
+            stats.write(args.stats)
+            logging.info("The stats of the run were written to: '%s'", args.stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,370 @@
+"""Provides functionality to store the beacons vectors as binary matrices
+
+Besides the JSON results file, the beacons vectors can be stored as a contiguous
+matrix of floats, with a row for every beacon and a column for every expected antenna,
+together with two parallel arrays with the BeaconId and the timestamp (as nanoseconds
+since the Unix epoch) of every row. The consumers can then load them without parsing
+(e.g. with `numpy.load(..., mmap_mode="r")`).
+
+The NPY writer creates the following files in the output directory:
+    * results_vectors.npy - the matrix of dbm_ant readings
+    * results_beacon_ids.npy - the BeaconId of every row
+    * results_timestamps.npy - the nanoseconds since the Unix epoch of every row
+    * results_antennas.json - the order of the antennas in the columns of the matrix
+
+The HDF5 writer creates a `results.h5` file, with the datasets "vectors",
+"beacon_ids" and "timestamps", and the order of the antennas as attributes.
+
+This file can be imported as a module and contains the following classes:
+    * MatrixWriter - base class of the binary matrix writers
+    * NPYMatrixWriter - stores the beacons vectors as NPY files
+    * HDF5MatrixWriter - stores the beacons vectors in a HDF5 file. It imports h5py and
+    numpy when it's initialized, so they're not imported by the runs that don't use it
+"""
+
+import array
+import json
+import logging
+import os
+import struct
+import sys
+import typing
+
+from src import constants
+from src import timestamps
+
+
+class MatrixWriter:
+    """Base class for the storage of the beacons vectors as a binary matrix
+
+    The records are buffered in arrays, and written in batches by the subclasses,
+    that must implement `initialize()`, `_write_batch()` and `_finalize()`.
+
+    Attributes
+    ----------
+    BATCH_SIZE : int
+        number of records buffered in memory, before write them.
+    """
+
+    BATCH_SIZE = 65536
+
+    def __init__(
+        self,
+        output_directory_path: str,
+        expected_antenna_ids: typing.List[int],
+        default_dbm_ant_value: int,
+        vector_dtype: str = constants.FLOAT64_VECTOR_DTYPE,
+    ):
+        """
+        Parameters
+        ----------
+        output_directory_path : str
+            Directory where the files with the matrix will be created
+        expected_antenna_ids : typing.List[int]
+            The antennas ids, in the order of the columns of the matrix
+        default_dbm_ant_value : int
+            Value used as dbm_ant reading for the absent antennas of a beacon
+        vector_dtype : str
+            Either constants.FLOAT64_VECTOR_DTYPE or constants.FLOAT32_VECTOR_DTYPE.
+            The type of the values of the matrix.
+        """
+
+        logging.debug(
+            "%s.__init__(output_directory_path=%s, vector_dtype=%s)",
+            self.__class__.__name__,
+            output_directory_path,
+            vector_dtype,
+        )
+        self._output_directory_path: str = output_directory_path
+        self._expected_antenna_ids: typing.List[int] = expected_antenna_ids
+        self._default_dbm_ant_value: int = default_dbm_ant_value
+        self._vector_dtype: str = vector_dtype
+        self._vectors_typecode: str = (
+            "f" if vector_dtype == constants.FLOAT32_VECTOR_DTYPE else "d"
+        )
+        self._rows_count: int = 0
+        self._vectors: array.array = array.array(self._vectors_typecode)
+        self._beacon_ids: array.array = array.array("q")
+        self._timestamps: array.array = array.array("q")
+
+    def _build_header(self) -> typing.Dict[str, typing.Any]:
+        """Builds the description of the matrix
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            the order of the antennas in the columns of the matrix, and how to
+            interpret its values.
+        """
+
+        return {
+            "antenna_ids": self._expected_antenna_ids,
+            "default_dbm_ant_value": self._default_dbm_ant_value,
+            "vector_dtype": self._vector_dtype,
+            "timestamp_unit": "ns",
+            "rows_count": self._rows_count,
+        }
+
+    def initialize(self) -> None:
+        """Creates the files where the matrix will be written"""
+
+        raise NotImplementedError
+
+    def _write_batch(self) -> None:
+        """Writes the buffered rows to the files"""
+
+        raise NotImplementedError
+
+    def _finalize(self) -> None:
+        """Completes and closes the files, once all the rows were written"""
+
+        raise NotImplementedError
+
+    def persist_record(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> None:
+        """Appends the received record as a new row of the matrix
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+        """
+
+        # The timestamps of the records were formatted from their epoch nanoseconds,
+        # so they're already in the cache of the parsed timestamps:
+        beacon_id, timestamp = record["beacon"].split(", ", 1)
+        self._beacon_ids.append(int(beacon_id))
+        self._timestamps.append(timestamps.parse_timestamp(timestamp))
+        self._vectors.extend(record["vector"])
+        self._rows_count += 1
+        if len(self._beacon_ids) >= self.BATCH_SIZE:
+            self._write_batch()
+            self._vectors = array.array(self._vectors_typecode)
+            self._beacon_ids = array.array("q")
+            self._timestamps = array.array("q")
+
+    def close(self) -> None:
+        """Writes the remaining rows, and completes the files"""
+
+        logging.debug("%s.close()", self.__class__.__name__)
+        if self._beacon_ids:
+            self._write_batch()
+
+        self._finalize()
+        logging.info(
+            "The beacons vectors were also written as a %s x %s matrix by the %s",
+            self._rows_count,
+            len(self._expected_antenna_ids),
+            self.__class__.__name__,
+        )
+
+
+class NPYMatrixWriter(MatrixWriter):
+    """A class used for the storage of the beacons vectors as NPY files
+
+    The arrays are written to the files as they arrive, after a fixed size NPY header,
+    that is rewritten with the final shape of the arrays when the files are closed.
+
+    Attributes
+    ----------
+    NPY_MAGIC : bytes
+        the magic string and the version (1.0) of the NPY format.
+
+    NPY_HEADER_SIZE : int
+        size in bytes reserved for the NPY header of every file.
+    """
+
+    NPY_MAGIC = b"\x93NUMPY\x01\x00"
+    NPY_HEADER_SIZE = 128
+
+    def __init__(
+        self,
+        output_directory_path: str,
+        expected_antenna_ids: typing.List[int],
+        default_dbm_ant_value: int,
+        vector_dtype: str = constants.FLOAT64_VECTOR_DTYPE,
+    ):
+        """
+        Parameters
+        ----------
+        output_directory_path : str
+            Directory where the files with the matrix will be created
+        expected_antenna_ids : typing.List[int]
+            The antennas ids, in the order of the columns of the matrix
+        default_dbm_ant_value : int
+            Value used as dbm_ant reading for the absent antennas of a beacon
+        vector_dtype : str
+            Either constants.FLOAT64_VECTOR_DTYPE or constants.FLOAT32_VECTOR_DTYPE.
+            The type of the values of the matrix.
+        """
+
+        super().__init__(
+            output_directory_path,
+            expected_antenna_ids,
+            default_dbm_ant_value,
+            vector_dtype,
+        )
+        self._npy_files: typing.Dict[str, typing.BinaryIO] = {}
+
+    def _build_npy_header(self, typecode: str, shape: typing.Tuple[int, ...]) -> bytes:
+        """Builds the NPY header of a file
+
+        Parameters
+        ----------
+        typecode : str
+            The array typecode of the values of the file
+        shape : typing.Tuple[int, ...]
+            The shape of the array stored in the file
+
+        Returns
+        -------
+        bytes
+            the NPY header, padded to `NPY_HEADER_SIZE` bytes.
+        """
+
+        byte_order = "<" if sys.byteorder == "little" else ">"
+        kind = "i" if typecode == "q" else "f"
+        descr = f"{byte_order}{kind}{array.array(typecode).itemsize}"
+        header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape}, }}"
+        header_length = self.NPY_HEADER_SIZE - len(self.NPY_MAGIC) - 2
+        return (
+            self.NPY_MAGIC
+            + struct.pack("<H", header_length)
+            + header.ljust(header_length - 1).encode("latin1")
+            + b"\n"
+        )
+
+    def initialize(self) -> None:
+        """Creates the NPY files, with space reserved for their headers"""
+
+        logging.debug("%s.initialize()", self.__class__.__name__)
+        for file_name in (
+            constants.NPY_VECTORS_FILE_NAME,
+            constants.NPY_BEACON_IDS_FILE_NAME,
+            constants.NPY_TIMESTAMPS_FILE_NAME,
+        ):
+            npy_file = open(os.path.join(self._output_directory_path, file_name), "wb")
+            npy_file.write(b"\0" * self.NPY_HEADER_SIZE)
+            self._npy_files[file_name] = npy_file
+
+    def _write_batch(self) -> None:
+        """Appends the buffered rows to the NPY files"""
+
+        self._vectors.tofile(self._npy_files[constants.NPY_VECTORS_FILE_NAME])
+        self._beacon_ids.tofile(self._npy_files[constants.NPY_BEACON_IDS_FILE_NAME])
+        self._timestamps.tofile(self._npy_files[constants.NPY_TIMESTAMPS_FILE_NAME])
+
+    def _finalize(self) -> None:
+        """Writes the NPY headers with the final shapes, and the antennas order"""
+
+        for file_name, typecode, shape in (
+            (
+                constants.NPY_VECTORS_FILE_NAME,
+                self._vectors_typecode,
+                (self._rows_count, len(self._expected_antenna_ids)),
+            ),
+            (constants.NPY_BEACON_IDS_FILE_NAME, "q", (self._rows_count,)),
+            (constants.NPY_TIMESTAMPS_FILE_NAME, "q", (self._rows_count,)),
+        ):
+            npy_file = self._npy_files[file_name]
+            npy_file.seek(0)
+            npy_file.write(self._build_npy_header(typecode, shape))
+            npy_file.close()
+
+        header_file_path = os.path.join(
+            self._output_directory_path, constants.MATRIX_HEADER_FILE_NAME
+        )
+        with open(header_file_path, "w") as header_file:
+            json.dump(self._build_header(), header_file, indent=4)
+
+
+class HDF5MatrixWriter(MatrixWriter):
+    """A class used for the storage of the beacons vectors in a HDF5 file
+
+    The rows are appended in batches to resizable and chunked datasets.
+    """
+
+    def __init__(
+        self,
+        output_directory_path: str,
+        expected_antenna_ids: typing.List[int],
+        default_dbm_ant_value: int,
+        vector_dtype: str = constants.FLOAT64_VECTOR_DTYPE,
+    ):
+        """
+        Parameters
+        ----------
+        output_directory_path : str
+            Directory where the HDF5 file with the matrix will be created
+        expected_antenna_ids : typing.List[int]
+            The antennas ids, in the order of the columns of the matrix
+        default_dbm_ant_value : int
+            Value used as dbm_ant reading for the absent antennas of a beacon
+        vector_dtype : str
+            Either constants.FLOAT64_VECTOR_DTYPE or constants.FLOAT32_VECTOR_DTYPE.
+            The type of the values of the matrix.
+        """
+
+        super().__init__(
+            output_directory_path,
+            expected_antenna_ids,
+            default_dbm_ant_value,
+            vector_dtype,
+        )
+        self._hdf5_file = None
+        self._hdf5_datasets: typing.Dict[str, typing.Any] = {}
+
+    def initialize(self) -> None:
+        """Creates the HDF5 file and its resizable datasets"""
+
+        import h5py
+
+        logging.debug("%s.initialize()", self.__class__.__name__)
+        self._hdf5_file = h5py.File(
+            os.path.join(self._output_directory_path, constants.HDF5_RESULTS_FILE_NAME),
+            "w",
+        )
+        antennas_count = len(self._expected_antenna_ids)
+        for dataset_name, dtype, row_shape in (
+            ("vectors", self._vector_dtype, (antennas_count,)),
+            ("beacon_ids", "int64", ()),
+            ("timestamps", "int64", ()),
+        ):
+            self._hdf5_datasets[dataset_name] = self._hdf5_file.create_dataset(
+                dataset_name,
+                shape=(0, *row_shape),
+                maxshape=(None, *row_shape),
+                dtype=dtype,
+                chunks=(self.BATCH_SIZE, *row_shape),
+            )
+
+    def _write_batch(self) -> None:
+        """Appends the buffered rows to the HDF5 datasets"""
+
+        import numpy as np
+
+        batch_size = len(self._beacon_ids)
+        for dataset_name, values in (
+            (
+                "vectors",
+                np.frombuffer(self._vectors, dtype=self._vector_dtype).reshape(
+                    batch_size, len(self._expected_antenna_ids)
+                ),
+            ),
+            ("beacon_ids", np.frombuffer(self._beacon_ids, dtype=np.int64)),
+            ("timestamps", np.frombuffer(self._timestamps, dtype=np.int64)),
+        ):
+            hdf5_dataset = self._hdf5_datasets[dataset_name]
+            rows_count = hdf5_dataset.shape[0]
+            hdf5_dataset.resize(rows_count + batch_size, axis=0)
+            hdf5_dataset[rows_count:] = values
+
+    def _finalize(self) -> None:
+        """Stores the antennas order as attributes, and closes the HDF5 file"""
+
+        for attr_name, attr_value in self._build_header().items():
+            self._hdf5_file.attrs[attr_name] = attr_value
+
+        self._hdf5_file.close()
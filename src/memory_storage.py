@@ -0,0 +1,534 @@
+"""Contains logic to aggregate in memory the dbm_ant readings of every beacon
+
+Every beacon that is still waiting for the readings of some of its antennas (an open
+beacon vector) is kept in a compact in-process structure, partitioned by the hash of
+its beacon key. When the estimated size of the open beacon vectors exceeds the
+configured memory budget, the least recently used partitions are spilled to disk, and
+merged back when the whole input file has been processed, or as soon as a reading of one
+of their spilled beacons is received.
+
+This file can be imported as a module and contains the following classes:
+    * MemoryStorage - provides in memory storage and retrieval of the beacons data
+"""
+
+import array
+import logging
+import pickle
+import sys
+import tempfile
+import typing
+
+from src.base_storage import BaseStorage
+from src.checkpoint import OpenBeacon
+from src.models import BeaconKey
+from src.options import AggregationOptions
+from src.options import CheckpointOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+
+class MemoryStorage(BaseStorage):
+    """A class used for the storage and retrieval of the beacons data in memory
+
+    Every open beacon vector is stored as a list with three items: a preallocated
+    array of floats (float64, or float32 when configured) with a slot for every
+    expected antenna, an int used as a bitmask, that flags the slots for which a
+    dbm_ant reading was already received, and an array with the number of readings of
+    every slot, or None when they are not counted.
+
+    The keys of the beacons of every spilled partition are kept in memory, so a reading
+    of a spilled beacon merges its partition back in memory before it's aggregated.
+    Then the readings of a beacon are never split between a spilled vector and one in
+    memory, that would be persisted as two records.
+
+    Attributes
+    ----------
+    PARTITIONS_COUNT : int
+        number of partitions in which the open beacon vectors are distributed. A
+        partition is the unit that is spilled to disk.
+
+    SPILL_LOW_WATERMARK : float
+        fraction of the memory budget, below which the estimated size of the open
+        beacon vectors must be after spilling partitions to disk.
+
+    OPEN_VECTOR_OVERHEAD_BYTES : int
+        estimation of the bytes used by the beacon key, and by the dict entry, of
+        every open beacon vector.
+    """
+
+    PARTITIONS_COUNT = 64
+    SPILL_LOW_WATERMARK = 0.75
+    OPEN_VECTOR_OVERHEAD_BYTES = 160
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        memory_budget: int,
+        spill_directory: typing.Optional[str] = None,
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+        checkpoint_options: typing.Optional[CheckpointOptions] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        memory_budget : int
+            Max number of bytes, that the open beacon vectors can use before start to
+            spill partitions to disk.
+        spill_directory : typing.Optional[str]
+            Directory where the spilled partitions will be stored. When None, the
+            default temporal directory is used.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        checkpoint_options : typing.Optional[CheckpointOptions]
+            Options used to save checkpoints of the run, and to resume it. When None,
+            checkpoints are not saved.
+        """
+
+        super().__init__(
+            input_json_file_path,
+            out_processor,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            input_options,
+            aggregation_options,
+            stats,
+            checkpoint_options,
+        )
+        logging.debug(
+            "%s.__init__(memory_budget=%s, spill_directory=%s)",
+            self.__class__.__name__,
+            memory_budget,
+            spill_directory,
+        )
+
+        self._memory_budget: int = memory_budget
+        self._spill_directory: typing.Optional[str] = spill_directory
+
+        self._default_row: array.array = array.array(
+            self._vector_typecode, [default_dbm_ant_value] * len(expected_antenna_ids)
+        )
+        readings_counts = self._new_readings_counts()
+        self._open_vector_size: int = (
+            sys.getsizeof(self._default_row)
+            + sys.getsizeof([self._default_row, 0, readings_counts])
+            + (0 if readings_counts is None else sys.getsizeof(readings_counts))
+            + self.OPEN_VECTOR_OVERHEAD_BYTES
+        )
+
+        self._partitions: typing.List[typing.Dict[BeaconKey, list]] = [
+            {} for _ in range(self.PARTITIONS_COUNT)
+        ]
+        self._partitions_last_access: typing.List[int] = [0] * self.PARTITIONS_COUNT
+        self._spill_files: typing.List[typing.Optional[typing.BinaryIO]] = [
+            None
+        ] * self.PARTITIONS_COUNT
+        self._spilled_keys: typing.List[typing.Optional[typing.Set[BeaconKey]]] = [
+            None
+        ] * self.PARTITIONS_COUNT
+        self._open_vectors_count: int = 0
+        self._processed_records_count: int = 0
+
+    def _close_staging_storage(self) -> None:
+        """Closes the temporal files used for the spilled partitions"""
+
+        for spill_file in self._spill_files:
+            if spill_file is not None:
+                spill_file.close()
+
+    def _build_results_record(
+        self, beacon_key: BeaconKey, open_vector: list
+    ) -> typing.Dict[str, typing.Union[str, typing.List[float]]]:
+        """Builds a result record to be saved in the output JSON file.
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            Contains a value that identifies a beacon. It's formatted and associated
+            with the "beacon" key in a generated beacon record.
+        open_vector : list
+            The array of dbm_ant readings of the beacon, the bitmask of the slots for
+            which a reading was received, and the number of readings of every slot.
+
+        Returns
+        -------
+        typing.Dict[str, typing.Union[str, typing.List[float]]]
+            a dict with a beacon_key and its associated vector of dbm_ant readings,
+            and the vector of readings counts when it's enabled.
+        """
+
+        dbm_ant_row, sampled_antennas_mask, readings_counts = open_vector
+        dbm_ant_vector = self._build_dbm_ant_vector(dbm_ant_row, sampled_antennas_mask)
+        logging.debug("dbm_ant_vector=%s", dbm_ant_vector)
+        results_record = {
+            "beacon": self._format_beacon_key(beacon_key),
+            "vector": dbm_ant_vector,
+        }
+        if self._count_vector:
+            results_record["counts"] = readings_counts.tolist()
+
+        return results_record
+
+    def _process_json_record(self, json_record: "JSONDocumentModel") -> None:
+        """Process a JSON document record
+
+        Stores the dbm_ant reading in the slot of the beacon's open vector that
+        corresponds to the antenna, combined with the previous readings of the antenna
+        by the duplicates reduction. When the readings of all the expected antennas
+        were received, the vector is handed over to the output processor. Readings of
+        antennas that are not expected are ignored.
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        slot = self._antenna_slots.get(json_record.ant_id)
+        if slot is None:
+            self._skip_unknown_antenna(json_record)
+            return
+
+        beacon_key = self._get_beacon_key(json_record)
+        if beacon_key is None:
+            return
+
+        if self._allowed_lateness_ns is not None and not self._advance_watermark(
+            beacon_key
+        ):
+            return
+
+        self._add_reading(beacon_key, slot, json_record.dbm_ant)
+
+    def _add_reading(self, beacon_key: BeaconKey, slot: int, dbm_ant: float) -> None:
+        """Stores a dbm_ant reading in the open vector of a beacon
+
+        When the readings of all the expected antennas were received, the vector is
+        handed over to the output processor.
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            Contains a value that identifies a beacon.
+        slot : int
+            The slot of the antenna in the beacon vector
+        dbm_ant : float
+            The dbm_ant reading of the antenna
+        """
+
+        partition_index = self._get_partition_index(beacon_key)
+        partition = self._partitions[partition_index]
+        self._processed_records_count += 1
+        self._partitions_last_access[partition_index] = self._processed_records_count
+
+        open_vector = partition.get(beacon_key)
+        if open_vector is None:
+            open_vector = [self._default_row[:], 0, self._new_readings_counts()]
+            partition[beacon_key] = open_vector
+            self._open_vectors_count += 1
+            if self._allowed_lateness_ns is not None:
+                self._watch_open_beacon(beacon_key)
+
+            if self._stats is not None:
+                self._stats.update_peak("peak_open_beacons", self._open_vectors_count)
+
+        readings_counts = open_vector[2]
+        if readings_counts is None:
+            open_vector[0][slot] = dbm_ant
+        else:
+            readings_counts[slot] += 1
+            self._reduce_reading(open_vector[0], slot, dbm_ant, readings_counts[slot])
+
+        open_vector[1] |= 1 << slot
+        if open_vector[1] == self._full_mask:
+            # This is the last expected sampled antenna for this beacon in the
+            # corresponding timestamp, it's time to dump the corresponding record to
+            # the JSON results file:
+            self._output_processor.persist_record(
+                self._build_results_record(beacon_key, open_vector)
+            )
+            del partition[beacon_key]
+            self._open_vectors_count -= 1
+        elif self._open_vectors_count * self._open_vector_size > self._memory_budget:
+            self._spill_cold_partitions()
+
+    def _get_partition_index(self, beacon_key: BeaconKey) -> int:
+        """Gets the partition of a beacon, merging it back in memory if it was spilled
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            Contains a value that identifies a beacon.
+
+        Returns
+        -------
+        int
+            the index of the partition, whose open beacon vectors in memory include
+            the one of the beacon, if it's open.
+        """
+
+        partition_index = hash(beacon_key) % self.PARTITIONS_COUNT
+        spilled_keys = self._spilled_keys[partition_index]
+        if spilled_keys is not None and beacon_key in spilled_keys:
+            self._unspill_partition(partition_index)
+
+        return partition_index
+
+    def _iter_open_beacons(self) -> typing.Iterator[OpenBeacon]:
+        """Returns every open beacon vector, to save a checkpoint
+
+        The spilled partitions are read from disk, without modifying them.
+
+        Returns
+        -------
+        typing.Iterator[OpenBeacon]
+            the key, the vector, the bitmask and the readings counts of every open
+            beacon.
+        """
+
+        for partition_index in range(self.PARTITIONS_COUNT):
+            partition = (
+                self._partitions[partition_index]
+                if self._spill_files[partition_index] is None
+                else self._load_spilled_partition(partition_index)
+            )
+            for beacon_key, open_vector in partition.items():
+                yield (beacon_key, *open_vector)
+
+    def _restore_open_beacon(
+        self,
+        beacon_key: BeaconKey,
+        dbm_ant_row: typing.Sequence[float],
+        sampled_antennas_mask: int,
+        readings_counts: typing.Optional[typing.Sequence[int]],
+    ) -> None:
+        """Stores an open beacon vector of a checkpoint in its partition
+
+        Parameters
+        ----------
+        beacon_key : BeaconKey
+            The BeaconId and the nanoseconds since the Unix epoch of the beacon
+        dbm_ant_row : typing.Sequence[float]
+            The dbm_ant readings of the beacon, with a slot for every expected antenna
+        sampled_antennas_mask : int
+            The bitmask of the slots for which a dbm_ant reading was received
+        readings_counts : typing.Optional[typing.Sequence[int]]
+            The number of readings received for every slot, or None when they are not
+            counted
+        """
+
+        partition_index = hash(beacon_key) % self.PARTITIONS_COUNT
+        self._partitions[partition_index][beacon_key] = [
+            array.array(self._vector_typecode, dbm_ant_row),
+            sampled_antennas_mask,
+            None
+            if readings_counts is None
+            else array.array(self.READINGS_COUNTS_TYPECODE, readings_counts),
+        ]
+        self._open_vectors_count += 1
+        if self._allowed_lateness_ns is not None:
+            self._watch_open_beacon(beacon_key)
+
+        if self._open_vectors_count * self._open_vector_size > self._memory_budget:
+            self._spill_cold_partitions()
+
+    def _evict_open_beacons(self, beacon_keys: typing.List[BeaconKey]) -> int:
+        """Persists the open beacon vectors older than the watermark, and removes them
+
+        A spilled partition that has a beacon to evict is merged back in memory
+        first, so the readings of the beacon are never split between two records.
+
+        Parameters
+        ----------
+        beacon_keys : typing.List[BeaconKey]
+            The keys of the beacons to evict, sorted by timestamp and BeaconId. The
+            ones that are no longer open are skipped
+
+        Returns
+        -------
+        int
+            the number of evicted beacons.
+        """
+
+        evicted_count = 0
+        for beacon_key in beacon_keys:
+            partition_index = hash(beacon_key) % self.PARTITIONS_COUNT
+            if self._spill_files[partition_index] is not None:
+                self._unspill_partition(partition_index)
+
+            open_vector = self._partitions[partition_index].pop(beacon_key, None)
+            if open_vector is None:
+                continue
+
+            self._output_processor.persist_record(
+                self._build_results_record(beacon_key, open_vector)
+            )
+            self._open_vectors_count -= 1
+            evicted_count += 1
+
+        return evicted_count
+
+    def _unspill_partition(self, partition_index: int) -> None:
+        """Merges back in memory a spilled partition, and removes its spill file
+
+        Parameters
+        ----------
+        partition_index : int
+            Index of the partition to merge back
+        """
+
+        merged_partition = self._load_spilled_partition(partition_index)
+        self._open_vectors_count += len(merged_partition) - len(
+            self._partitions[partition_index]
+        )
+        self._partitions[partition_index] = merged_partition
+        self._spill_files[partition_index].close()
+        self._spill_files[partition_index] = None
+        self._spilled_keys[partition_index] = None
+
+    def _spill_cold_partitions(self) -> None:
+        """Spills to disk the least recently used partitions
+
+        Partitions are spilled until the estimated size of the open beacon vectors
+        that remain in memory, is below `SPILL_LOW_WATERMARK` of the memory budget.
+        """
+
+        low_watermark = self._memory_budget * self.SPILL_LOW_WATERMARK
+        while self._open_vectors_count * self._open_vector_size > low_watermark:
+            partition_index = min(
+                (idx for idx in range(self.PARTITIONS_COUNT) if self._partitions[idx]),
+                key=self._partitions_last_access.__getitem__,
+            )
+            partition = self._partitions[partition_index]
+            spill_file = self._spill_files[partition_index]
+            if spill_file is None:
+                spill_file = tempfile.TemporaryFile(dir=self._spill_directory)
+                self._spill_files[partition_index] = spill_file
+                self._spilled_keys[partition_index] = set()
+
+            logging.debug(
+                "Spilling to disk the partition #%s with %s open beacon vectors",
+                partition_index,
+                len(partition),
+            )
+            pickle.dump(
+                list(partition.items()), spill_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+            self._spilled_keys[partition_index].update(partition)
+            self._open_vectors_count -= len(partition)
+            partition.clear()
+
+    def _load_spilled_partition(
+        self, partition_index: int
+    ) -> typing.Dict[BeaconKey, list]:
+        """Loads a spilled partition, and merge it with its open beacon vectors
+
+        Parameters
+        ----------
+        partition_index : int
+            Index of the partition to load
+
+        Returns
+        -------
+        typing.Dict[BeaconKey, list]
+            the open beacon vectors of the partition, where the readings that were
+            received later are combined with the ones received before, by the
+            duplicates reduction.
+        """
+
+        merged_partition: typing.Dict[BeaconKey, list] = {}
+        batches = []
+        spill_file = self._spill_files[partition_index]
+        spill_file.seek(0)
+        while True:
+            try:
+                batches.append(pickle.load(spill_file))
+            except EOFError:
+                break
+
+        batches.append(self._partitions[partition_index].items())
+        for batch in batches:
+            for beacon_key, (row, mask, readings_counts) in batch:
+                merged_vector = merged_partition.get(beacon_key)
+                if merged_vector is None:
+                    merged_partition[beacon_key] = [row, mask, readings_counts]
+                    continue
+
+                if readings_counts is None:
+                    for slot in range(len(row)):
+                        if mask >> slot & 1:
+                            merged_vector[0][slot] = row[slot]
+                else:
+                    self._merge_aggregates(
+                        merged_vector[0], merged_vector[2], row, readings_counts
+                    )
+
+                merged_vector[1] |= mask
+
+        return merged_partition
+
+    def persist_beacons_vectors_to_results_file(self) -> None:
+        """Persist in the JSON results file the beacons vectors still in the storage
+
+        The open beacon vectors are persisted sorted by their BeaconId and timestamp.
+        When some partition was spilled to disk, they are sorted inside every
+        partition.
+        """
+
+        logging.debug(
+            "%s.persist_beacons_vectors_to_results_file()", self.__class__.__name__
+        )
+        if all(spill_file is None for spill_file in self._spill_files):
+            partitions = [
+                dict(
+                    item
+                    for partition in self._partitions
+                    for item in partition.items()
+                )
+            ]
+        else:
+            partitions = (
+                self._load_spilled_partition(idx)
+                if self._spill_files[idx] is not None
+                else self._partitions[idx]
+                for idx in range(self.PARTITIONS_COUNT)
+            )
+
+        for partition in partitions:
+            for beacon_key in sorted(partition):
+                self._output_processor.persist_record(
+                    self._build_results_record(beacon_key, partition[beacon_key])
+                )
+
+        for partition in self._partitions:
+            partition.clear()
+
+        self._open_vectors_count = 0
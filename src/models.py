@@ -3,32 +3,90 @@
 Will provide access to a dict key-value pairs using attributes of a class
 
 This file can be imported as a module and contains the following classes:
-    * JSONDocumentModel - provides validation and access to a dict key-value pairs
+    * JSONDocumentModel - provides validation and access to a dict key-value pairs.
+    It's defined the first time it's accessed, so pydantic is only imported by the
+    runs that validate a JSON document with it
+    * BeaconReading - lightweight container of an already validated beacon reading
+
+It also defines the following types:
+    * BeaconKey - the BeaconId and the nanoseconds since the Unix epoch of a beacon
 """
 
-from pydantic import BaseModel
-from pydantic import Field
+import typing
+
+BeaconKey = typing.Tuple[int, int]
 
 
-class JSONDocumentModel(BaseModel):
-    """Models the structure of a JSON document in the input JSON file.
+class BeaconReading(typing.NamedTuple):
+    """Contains an already validated beacon reading.
 
-    It also implicitly enforce validation
-    The expected dict format is the following:
-    {
-      "BeaconId": 113,
-      "ant_id": 202,
-      "dbm_ant": -58.97817436922068,
-      "timestamp": "2016-11-22T09:48:00.00Z"
-    }
+    It provides access to the same attributes than a JSONDocumentModel, without the
+    validation cost. It's used for readings loaded from a staging storage.
     """
 
-    beacon_id: int = Field(alias="BeaconId")
+    beacon_id: int
     ant_id: int
     dbm_ant: float
     timestamp: str
 
-    class Config:
-        """Prohibit the mutation of the model attributes"""
 
-        allow_mutation = False
+def _define_json_document_model() -> type:
+    """Imports pydantic, and defines the JSONDocumentModel with it
+
+    Returns
+    -------
+    type
+        the JSONDocumentModel class.
+    """
+
+    from pydantic import BaseModel
+    from pydantic import Field
+
+    class JSONDocumentModel(BaseModel):
+        """Models the structure of a JSON document in the input JSON file.
+
+        It also implicitly enforce validation
+        The expected dict format is the following:
+        {
+          "BeaconId": 113,
+          "ant_id": 202,
+          "dbm_ant": -58.97817436922068,
+          "timestamp": "2016-11-22T09:48:00.00Z"
+        }
+        """
+
+        beacon_id: int = Field(alias="BeaconId")
+        ant_id: int
+        dbm_ant: float
+        timestamp: str
+
+        class Config:
+            """Prohibit the mutation of the model attributes"""
+
+            allow_mutation = False
+
+    # The class is accessed as an attribute of this module, e.g. while unpickled:
+    JSONDocumentModel.__qualname__ = "JSONDocumentModel"
+    return JSONDocumentModel
+
+
+def __getattr__(name: str) -> typing.Any:
+    """Defines the JSONDocumentModel the first time it's accessed
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute of the module that was not found
+
+    Returns
+    -------
+    typing.Any
+        the JSONDocumentModel class, that is kept in the module afterwards.
+    """
+
+    if name != "JSONDocumentModel":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    json_document_model = _define_json_document_model()
+    globals()[name] = json_document_model
+    return json_document_model
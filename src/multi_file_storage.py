@@ -0,0 +1,401 @@
+"""Contains logic to aggregate the readings of many input JSON files
+
+A tracking campaign can be split in many files, e.g. one per hour, and the readings of
+a beacon can straddle two of them. Every input file is parsed and pre-aggregated in a
+process of a pool, into a compact partial aggregate: the partial vector and the
+bitmask of the received antennas of every beacon. The partial aggregates are then
+merged in memory, in the order of the input files, so a beacon whose readings are in
+several files yields a single vector, exactly as if the files were concatenated.
+
+The partial aggregate of every file can be cached in a directory. A file that has not
+changed since the previous run (same size and modification time), processed with the
+same options, is not read again, and its cached partial aggregate is merged instead.
+
+This file can be imported as a module and contains the following classes:
+    * FileAggregator - parses and pre-aggregates the readings of a whole input file
+    * MultiFileStorage - provides the aggregation of many input JSON files
+"""
+
+import concurrent.futures
+import hashlib
+import io
+import logging
+import os
+import pickle
+import typing
+
+from src import compressed_input
+from src.options import AggregationOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.parallel_storage import ByteRangeAggregate
+from src.parallel_storage import ByteRangeAggregator
+from src.parallel_storage import ParallelStorage
+from src.run_stats import RunStats
+from src.run_stats import measure
+
+
+class FileAggregator(ByteRangeAggregator):
+    """Parses and pre-aggregates the readings of a whole input file
+
+    The input file can be compressed, and then it's decompressed in the background
+    while it's parsed.
+    """
+
+    def aggregate_file(self) -> ByteRangeAggregate:
+        """Parses and pre-aggregates the readings of the input file
+
+        Returns
+        -------
+        ByteRangeAggregate
+            the partial beacons vectors, the beacons readings lists, the number of
+            parsed and of rejected JSON documents, if the line that closes the
+            array of JSON documents was found, and the number of readings of every
+            antenna that is not expected.
+        """
+
+        logging.debug(
+            "%s.aggregate_file(%s)", self.__class__.__name__, self._input_json_file_path
+        )
+        compression = compressed_input.detect_compression(self._input_json_file_path)
+        if compression is None:
+            return self.aggregate(0, os.path.getsize(self._input_json_file_path), 1)
+
+        with io.BufferedReader(
+            compressed_input.DecompressedStream(
+                self._input_json_file_path, compression
+            ),
+            compressed_input.DecompressedStream.CHUNK_SIZE,
+        ) as input_json_file:
+            for json_document in self._iter_json_documents(
+                self._iter_file_lines(input_json_file)
+            ):
+                self._process_json_record(json_document)
+
+        return (
+            self._partial_vectors,
+            self._readings_lists,
+            self._records_parsed_count,
+            self._records_rejected_count,
+            self._closing_bracket_found,
+            dict(self._unknown_antennas_counts),
+        )
+
+    def _iter_file_lines(
+        self, input_json_file: typing.BinaryIO
+    ) -> typing.Iterator[str]:
+        """Reads the lines of a file that can't be seeked
+
+        Parameters
+        ----------
+        input_json_file : typing.BinaryIO
+            The decompressed input file, opened in binary mode
+
+        Returns
+        -------
+        typing.Iterator[str]
+            the decoded lines. Before a line is returned, `self._line_offset` is set to
+            its byte offset in the decompressed content.
+        """
+
+        offset = 0
+        for line in input_json_file:
+            self._line_offset = offset
+            offset += len(line)
+            yield line.decode("utf-8")
+
+
+def _aggregate_input_file(
+    input_json_file_path: str,
+    default_dbm_ant_value: int,
+    expected_antenna_ids: typing.List[int],
+    input_options: InputOptions,
+    aggregation_options: AggregationOptions,
+    cache_file_path: typing.Optional[str],
+    cache_header: typing.Dict[str, typing.Any],
+) -> ByteRangeAggregate:
+    """Parses and pre-aggregates in a worker process, a whole input file
+
+    When a cache file is given, the partial aggregate is also saved to it, after a
+    header that identifies the input file and the options, so it can be reused by a
+    later run.
+    """
+
+    file_aggregate = FileAggregator(
+        input_json_file_path,
+        default_dbm_ant_value,
+        expected_antenna_ids,
+        input_options,
+        aggregation_options,
+    ).aggregate_file()
+    if cache_file_path is not None:
+        # Write to a temporal file first, so an interrupted run never leaves an
+        # incomplete cache file:
+        with open(f"{cache_file_path}.tmp", "wb") as cache_file:
+            pickle.dump(cache_header, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(file_aggregate, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(f"{cache_file_path}.tmp", cache_file_path)
+
+    return file_aggregate
+
+
+class MultiFileStorage(ParallelStorage):
+    """A class used for the aggregation of many input JSON files
+
+    The beacons vectors are aggregated in memory as done by the `MemoryStorage`, with
+    the partial aggregates of the input files, produced by the worker processes or
+    loaded from the cache.
+    """
+
+    def __init__(
+        self,
+        input_json_file_paths: typing.List[str],
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        memory_budget: int,
+        spill_directory: typing.Optional[str] = None,
+        workers_count: int = 1,
+        cache_directory: typing.Optional[str] = None,
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_paths : typing.List[str]
+            The full file paths of the input JSON files to process, in order
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input files, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            files, the corresponding readings for its dbm_ant value.
+        memory_budget : int
+            Max number of bytes, that the open beacon vectors can use before start to
+            spill partitions to disk.
+        spill_directory : typing.Optional[str]
+            Directory where the spilled partitions will be stored. When None, the
+            default temporal directory is used.
+        workers_count : int
+            Number of worker processes used to parse the input JSON files.
+        cache_directory : typing.Optional[str]
+            Directory where the partial aggregates of the input files are cached.
+            When None, they are not cached, and every input file is read.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON files. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        """
+
+        super().__init__(
+            input_json_file_paths[0],
+            out_processor,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            memory_budget,
+            spill_directory,
+            workers_count,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+        logging.debug(
+            "%s.__init__(input_json_file_paths=%s, cache_directory=%s)",
+            self.__class__.__name__,
+            input_json_file_paths,
+            cache_directory,
+        )
+        self._input_json_file_paths: typing.List[str] = input_json_file_paths
+        self._cache_directory: typing.Optional[str] = cache_directory
+        if cache_directory is not None:
+            os.makedirs(cache_directory, exist_ok=True)
+
+        self._cached_files_count: int = 0
+        self._read_bytes_count: int = 0
+
+    def _get_cache_header(
+        self, input_json_file_path: str
+    ) -> typing.Dict[str, typing.Any]:
+        """Gets what identifies the partial aggregate of an input file
+
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input file
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            the input file, with its size and modification time, and the options that
+            change its partial aggregate. A cached partial aggregate can only be
+            reused when they are the same.
+        """
+
+        file_stat = os.stat(input_json_file_path)
+        return {
+            "input_json_file_path": input_json_file_path,
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "expected_antenna_ids": list(self._expected_antenna_ids),
+            "vector_typecode": self._vector_typecode,
+            "fast_decoder": self._input_options.fast_decoder,
+            "unknown_antennas": self._aggregation_options.unknown_antennas,
+        }
+
+    def _get_cache_file_path(self, input_json_file_path: str) -> str:
+        """Gets the path of the cache file of an input file
+
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input file
+
+        Returns
+        -------
+        str
+            the path of the cache file, named after a hash of the input file path.
+        """
+
+        file_name = hashlib.sha1(input_json_file_path.encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_directory, f"{file_name}.aggregate")
+
+    def _load_cached_aggregate(
+        self, cache_file_path: str, cache_header: typing.Dict[str, typing.Any]
+    ) -> typing.Optional[ByteRangeAggregate]:
+        """Loads the cached partial aggregate of an input file, if it's still valid
+
+        Parameters
+        ----------
+        cache_file_path : str
+            The path of the cache file
+        cache_header : typing.Dict[str, typing.Any]
+            What identifies the partial aggregate of the input file in this run
+
+        Returns
+        -------
+        typing.Optional[ByteRangeAggregate]
+            the cached partial aggregate, or None if there isn't one, or the input
+            file or the options changed since it was cached.
+        """
+
+        try:
+            with open(cache_file_path, "rb") as cache_file:
+                if pickle.load(cache_file) != cache_header:
+                    return None
+
+                return pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError) as error:
+            logging.warning(
+                "The cache file '%s' can't be read, the input file will be read "
+                "again: %s",
+                cache_file_path,
+                error,
+            )
+            return None
+
+    def parse_json_documents_from_file(self) -> None:
+        """Parses the input JSON files with a pool of worker processes
+
+        The input files that didn't change since they were cached aren't read. The
+        partial aggregates are merged in the order of the input files.
+        """
+
+        logging.debug("%s.parse_json_documents_from_file()", self.__class__.__name__)
+        closed_files_count = 0
+        with concurrent.futures.ProcessPoolExecutor(self._workers_count) as executor:
+            file_aggregates = []
+            for input_json_file_path in self._input_json_file_paths:
+                cache_header = self._get_cache_header(input_json_file_path)
+                cache_file_path = None
+                if self._cache_directory is not None:
+                    cache_file_path = self._get_cache_file_path(input_json_file_path)
+                    file_aggregate = self._load_cached_aggregate(
+                        cache_file_path, cache_header
+                    )
+                    if file_aggregate is not None:
+                        logging.debug(
+                            "The input file '%s' didn't change, its cached partial "
+                            "aggregate will be used",
+                            input_json_file_path,
+                        )
+                        self._cached_files_count += 1
+                        file_aggregates.append(file_aggregate)
+                        continue
+
+                self._read_bytes_count += cache_header["size"]
+                file_aggregates.append(
+                    executor.submit(
+                        _aggregate_input_file,
+                        input_json_file_path,
+                        self._default_dbm_ant_value,
+                        self._expected_antenna_ids,
+                        self._input_options,
+                        self._aggregation_options,
+                        cache_file_path,
+                        cache_header,
+                    )
+                )
+
+            logging.info(
+                "%s input files will be read, and the cached partial aggregates of %s "
+                "input files will be reused",
+                len(self._input_json_file_paths) - self._cached_files_count,
+                self._cached_files_count,
+            )
+            for file_index, file_aggregate in enumerate(file_aggregates):
+                if isinstance(file_aggregate, concurrent.futures.Future):
+                    file_aggregate = file_aggregate.result()
+
+                # Release the partial aggregate once it's merged:
+                file_aggregates[file_index] = None
+                (
+                    partial_vectors,
+                    readings_lists,
+                    records_count,
+                    rejected_records_count,
+                    closed,
+                    unknown_antennas_counts,
+                ) = file_aggregate
+                with measure(self._stats, "merge"):
+                    self._merge_byte_range(partial_vectors, readings_lists)
+
+                self._records_parsed_count += records_count
+                self._records_rejected_count += rejected_records_count
+                self._unknown_antennas_counts.update(unknown_antennas_counts)
+                closed_files_count += closed
+
+        self._closing_bracket_found = closed_files_count == len(
+            self._input_json_file_paths
+        )
+        self._records_completed_early_count = (
+            self._output_processor.results_records_count
+        )
+        self._log_unknown_antennas()
+        logging.info(
+            "In total, there were processed %s JSON documents from %s input files",
+            self._records_parsed_count,
+            len(self._input_json_file_paths),
+        )
+
+    def _update_run_stats(self) -> None:
+        """Updates the counters of the run stats, once the results were written"""
+
+        super()._update_run_stats()
+        self._stats.set_counter("input_files", len(self._input_json_file_paths))
+        self._stats.set_counter("input_files_cached", self._cached_files_count)
+        # The input files whose cached partial aggregates were reused weren't read:
+        self._stats.set_counter("bytes_read", self._read_bytes_count)
@@ -0,0 +1,145 @@
+"""Contains the options that customize how the input JSON file is read, and how the
+beacons readings are aggregated
+
+This file can be imported as a module and contains the following classes:
+    * InputOptions - options used by the storage engines to read the input JSON file
+    * AggregationOptions - options used by the storage engines to aggregate the
+    beacons readings
+    * CheckpointOptions - options used by the storage engines to save checkpoints of
+    the run, and to resume it
+"""
+
+import dataclasses
+import typing
+
+from src import constants
+
+
+@dataclasses.dataclass(frozen=True)
+class InputOptions:
+    """Options used by the storage engines to read the input JSON file
+
+    Attributes
+    ----------
+    fast_decoder : bool
+        when True, every line is decoded first with a scanner for the fixed schema of
+        the JSON documents, and only the lines that it can't decode are parsed with
+        json and validated with pydantic.
+
+    input_format : str
+        either constants.LINES_INPUT_FORMAT, when the input file has a JSON document per
+        line, or constants.STREAM_INPUT_FORMAT, to read incrementally the top level JSON
+        array, no matter how it's laid out in lines.
+
+    memory_map : bool
+        when True, the input file is memory-mapped, and its lines are split and
+        decoded on the raw bytes. It requires constants.LINES_INPUT_FORMAT.
+
+    pipelined : bool
+        when True, the input file is read and parsed in background threads, while
+        the readings are aggregated. It requires constants.LINES_INPUT_FORMAT, and
+        can't be combined with memory_map.
+
+    follow : bool
+        when True, the input file is followed like `tail -f`: once its end is
+        reached, it's polled for new lines, until the character ']' that closes the
+        array of JSON documents is found, the idle timeout expires, or the run is
+        interrupted. It requires constants.LINES_INPUT_FORMAT.
+
+    follow_poll_interval : float
+        seconds between two polls of the input file for new lines, when following it.
+
+    follow_idle_timeout : typing.Optional[float]
+        seconds without new lines after which the input file stops being followed.
+        When None, it's followed until the closing bracket is found, or the run is
+        interrupted.
+
+    compression : typing.Optional[str]
+        one of constants.COMPRESSIONS, when the input file is compressed. It's
+        decompressed in a background thread while it's parsed. When None, the input
+        file is not compressed.
+
+    decompression_threads : int
+        number of threads that decompress in parallel the members of a gzip input
+        file.
+    """
+
+    fast_decoder: bool = False
+    input_format: str = constants.LINES_INPUT_FORMAT
+    memory_map: bool = False
+    pipelined: bool = False
+    follow: bool = False
+    follow_poll_interval: float = constants.DEFAULT_FOLLOW_POLL_INTERVAL
+    follow_idle_timeout: typing.Optional[float] = None
+    compression: typing.Optional[str] = None
+    decompression_threads: int = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class AggregationOptions:
+    """Options used by the storage engines to aggregate the beacons readings
+
+    Attributes
+    ----------
+    vector_dtype : str
+        either constants.FLOAT64_VECTOR_DTYPE or constants.FLOAT32_VECTOR_DTYPE. The
+        type of the dbm_ant readings stored in the beacons vectors. With float32 the
+        vectors use half of the memory, but the readings are rounded to single
+        precision.
+
+    allowed_lateness : typing.Optional[float]
+        seconds that a reading can be late, behind the max timestamp seen so far.
+        The beacons older than this event-time watermark are written with the default
+        value for their absent antennas, and removed from the staging storage, and the
+        readings older than it are ignored as late. When None, the beacons that are
+        not complete are kept until the end of the input JSON file.
+
+    duplicates_reduction : str
+        one of constants.REDUCTIONS. How the readings of the same antenna, for the
+        same beacon, are combined: the first or the last one is kept, their mean, or
+        their max or min. A beacon vector is complete once every expected antenna
+        has at least one reading.
+
+    count_vector : bool
+        when True, every results record also has a vector with the number of
+        readings received for every expected antenna.
+
+    unknown_antennas : str
+        one of constants.UNKNOWN_ANTENNAS_POLICIES. What is done with the readings of
+        antennas that are not expected: they are dropped, counted, or counted and
+        written to a side file.
+
+    unknown_antennas_file_path : typing.Optional[str]
+        path of the side file where the readings of antennas that are not expected are
+        written, as newline delimited JSON, with constants.SIDE_FILE_UNKNOWN_ANTENNAS.
+    """
+
+    vector_dtype: str = constants.FLOAT64_VECTOR_DTYPE
+    allowed_lateness: typing.Optional[float] = None
+    duplicates_reduction: str = constants.LAST_REDUCTION
+    count_vector: bool = False
+    unknown_antennas: str = constants.DROP_UNKNOWN_ANTENNAS
+    unknown_antennas_file_path: typing.Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class CheckpointOptions:
+    """Options used by the storage engines to save checkpoints of the run, and to
+    resume it
+
+    Attributes
+    ----------
+    state_directory : str
+        directory where the checkpoints are saved.
+
+    interval : float
+        min number of seconds between two checkpoints.
+
+    resume : bool
+        when True, the run continues from the last checkpoint saved in the state
+        directory, if there is one.
+    """
+
+    state_directory: str
+    interval: float = constants.DEFAULT_CHECKPOINT_INTERVAL
+    resume: bool = False
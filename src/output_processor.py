@@ -15,20 +15,65 @@ following:
     ]
 },
 
+When the count vector is enabled, every record also has a "counts" vector, with the
+number of readings received for every antenna.
+
+The records are buffered, and serialized and written to the file in batches. Besides
+the default pretty printed format, the records can be written in a compact format
+(a JSON array with a record per line), or as newline delimited JSON (NDJSON), without
+the enclosing array. The records can also be handed over to writers of binary
+matrices, see `src.matrix_writers`.
+
+The records are serialized with ujson when it's installed, and with the standard
+library otherwise.
+
+When pipelined, the batches are serialized and written by a writer thread, connected to
+the producer of the records by a bounded queue, so the producer only waits when the
+writer falls behind.
 
 This file can be imported as a module and contains the following classes:
     * OutputProcessor - provides storage of the beacons data in a JSON file
 """
 
+import json
 import logging
 import os
+import queue
+import threading
 import typing
-import ujson
+
+try:
+    import ujson
+except ImportError:
+    # The records are serialized with the standard library, that only differs in the
+    # notation of the exponents of some floats (e.g. 1e-07 instead of 1e-7):
+    ujson = None
+
+from src import constants
+from src.matrix_writers import MatrixWriter
+from src.pipeline import put
+from src.run_stats import RunStats
+from src.run_stats import measure
 
 
 class OutputProcessor:
     """A class used for the storage of the beacons data in a JSON file
 
+    Attributes
+    ----------
+    RECORDS_BATCH_SIZE : int
+        number of records buffered in memory, before serialize and write them to the
+        file.
+
+    WRITE_BUFFER_SIZE : int
+        size in bytes of the write buffer of the file.
+
+    PROGRESS_LOG_INTERVAL : int
+        number of written records between the summaries logged about the progress.
+
+    WRITER_QUEUE_SIZE : int
+        max number of batches waiting to be written by the writer thread.
+
     Methods:
     --------
     initialize()
@@ -37,39 +82,170 @@ class OutputProcessor:
         Appends to the file a text line with the character ']' and close the file
     persist_record(record)
         Appends to the file in a text line the received record
+    flush()
+        Writes the buffered records to the file
+    checkpoint()
+        Writes the buffered records, and gets the position of the file
+    resume(output_state)
+        Reopens the file of an interrupted run, at the position of a checkpoint
     """
 
-    def __init__(self, output_file_path: str):
+    RECORDS_BATCH_SIZE = 4096
+    WRITE_BUFFER_SIZE = 1024 * 1024
+    PROGRESS_LOG_INTERVAL = 100000
+    WRITER_QUEUE_SIZE = 8
+
+    def __init__(
+        self,
+        output_file_path: str,
+        output_format: str = constants.PRETTY_OUTPUT_FORMAT,
+        matrix_writers: typing.Optional[typing.List[MatrixWriter]] = None,
+        pipelined: bool = False,
+        stats: typing.Optional[RunStats] = None,
+    ):
         """
         Parameters
         ----------
         output_file_path : str
             Full file path where should be created the output JSON file for stores the
             beacons associated antennas readings.
+        output_format : str
+            Either constants.PRETTY_OUTPUT_FORMAT, constants.COMPACT_OUTPUT_FORMAT or
+            constants.NDJSON_OUTPUT_FORMAT.
+        matrix_writers : typing.Optional[typing.List[MatrixWriter]]
+            Writers that also store every record as a row of a binary matrix.
+        pipelined : bool
+            When True, the batches of records are serialized and written to the file
+            by a writer thread.
+        stats : typing.Optional[RunStats]
+            Collects the time spent serializing and writing the records, and the
+            number of bytes written. When None, they are not collected.
         """
 
         logging.debug(
-            "%s.__init__(output_file_path=%s)",
+            "%s.__init__(output_file_path=%s, output_format=%s)",
             self.__class__.__name__,
             output_file_path,
+            output_format,
         )
         self._output_file_path: str = output_file_path
+        self._output_format: str = output_format
+        self._matrix_writers: typing.List[MatrixWriter] = matrix_writers or []
         self._json_results_file = None
         self._results_records_count: int = 0
+        self._written_records_count: int = 0
+        self._records_batch: typing.List[
+            typing.Dict[str, typing.Union[str, typing.List[float]]]
+        ] = []
+        if output_format == constants.NDJSON_OUTPUT_FORMAT:
+            self._records_separator: str = os.linesep
+        else:
+            self._records_separator = f",{os.linesep}"
+
+        self._pipelined: bool = pipelined
+        self._batches_queue: queue.Queue = queue.Queue(self.WRITER_QUEUE_SIZE)
+        self._writer_thread: typing.Optional[threading.Thread] = None
+        self._writer_failed: threading.Event = threading.Event()
+        self._writer_error: typing.Optional[BaseException] = None
+        self._stats: typing.Optional[RunStats] = stats
+
+    @property
+    def results_records_count(self) -> int:
+        """The number of records received so far"""
+
+        return self._results_records_count
 
     def initialize(self) -> None:
         """Opens the file and appends to it a text line with the character '['"""
 
         logging.debug("%s.open()", self.__class__.__name__)
-        self._json_results_file = open(self._output_file_path, "w")
-        self._json_results_file.write(f"[{os.linesep}")
+        self._json_results_file = open(
+            self._output_file_path, "w", buffering=self.WRITE_BUFFER_SIZE
+        )
+        if self._output_format != constants.NDJSON_OUTPUT_FORMAT:
+            self._json_results_file.write(f"[{os.linesep}")
+
+        for matrix_writer in self._matrix_writers:
+            matrix_writer.initialize()
+
+        self._start_writer()
+
+    def checkpoint(self) -> typing.Dict[str, int]:
+        """Writes the buffered records to disk, and gets the position of the file
+
+        Returns
+        -------
+        typing.Dict[str, int]
+            the position of the file, and the number of written and received records,
+            to be restored by `resume()`.
+        """
+
+        logging.debug("%s.checkpoint()", self.__class__.__name__)
+        self._flush_records_batch()
+        # The writer thread writes the batches in flight before the position is read:
+        self._stop_writer()
+        self._json_results_file.flush()
+        os.fsync(self._json_results_file.fileno())
+        output_state = {
+            "position": self._json_results_file.tell(),
+            "written_records_count": self._written_records_count,
+            "results_records_count": self._results_records_count,
+        }
+        self._start_writer()
+        return output_state
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file, so they can be read before it's
+        closed"""
+
+        logging.debug("%s.flush()", self.__class__.__name__)
+        if self._json_results_file is None:
+            return
+
+        self._flush_records_batch()
+        self._json_results_file.flush()
+
+    def resume(self, output_state: typing.Dict[str, int]) -> None:
+        """Reopens the file of an interrupted run, at the position of a checkpoint
+
+        What was written after the checkpoint is truncated, so those records are not
+        duplicated when they are written again.
+
+        Parameters
+        ----------
+        output_state : typing.Dict[str, int]
+            The state returned by `checkpoint()`
+        """
+
+        logging.debug("%s.resume(%s)", self.__class__.__name__, output_state)
+        self._json_results_file = open(
+            self._output_file_path, "r+", buffering=self.WRITE_BUFFER_SIZE
+        )
+        self._json_results_file.seek(output_state["position"])
+        self._json_results_file.truncate()
+        self._written_records_count = output_state["written_records_count"]
+        self._results_records_count = output_state["results_records_count"]
+        self._start_writer()
 
     def close(self) -> None:
         """Appends to the file a text line with the character ']' and close the file"""
 
         logging.debug("%s.close()", self.__class__.__name__)
         if self._json_results_file is not None:
-            self._json_results_file.write(f"{os.linesep}]{os.linesep}")
+            try:
+                self._flush_records_batch()
+                self._stop_writer()
+            except BaseException:
+                self._json_results_file.close()
+                raise
+
+            if self._output_format != constants.NDJSON_OUTPUT_FORMAT:
+                self._json_results_file.write(f"{os.linesep}]{os.linesep}")
+
+            if self._stats is not None:
+                self._stats.set_counter("records_written", self._written_records_count)
+                self._stats.set_counter("bytes_written", self._json_results_file.tell())
+
             logging.info(
                 "In total, there were written '%s' records to the results document",
                 self._results_records_count,
@@ -80,11 +256,140 @@ class OutputProcessor:
                 self._output_file_path,
             )
             self._json_results_file.close()
+            for matrix_writer in self._matrix_writers:
+                matrix_writer.close()
+
+    def _serialize_record(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> str:
+        """Serializes a record in the output format
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+
+        Returns
+        -------
+        str
+            the record serialized as JSON.
+        """
+
+        if ujson is None:
+            if self._output_format == constants.PRETTY_OUTPUT_FORMAT:
+                return json.dumps(record, indent=4)
+
+            return json.dumps(record, separators=(",", ":"))
+
+        if self._output_format == constants.PRETTY_OUTPUT_FORMAT:
+            return ujson.dumps(record, indent=4)
+
+        return ujson.dumps(record)
+
+    def _flush_records_batch(self) -> None:
+        """Writes the buffered records, or hands them over to the writer thread"""
+
+        if not self._records_batch:
+            return
+
+        records_batch = self._records_batch
+        self._records_batch = []
+        if not self._pipelined:
+            self._write_records_batch(records_batch)
+            return
+
+        # Wait while the queue is full, so the records in flight are bounded:
+        if not put(self._batches_queue, records_batch, self._writer_failed):
+            raise self._writer_error
+
+    def _run_writer(self) -> None:
+        """Writes the batches of records of the queue, until it receives None"""
+
+        try:
+            while True:
+                records_batch = self._batches_queue.get()
+                if records_batch is None:
+                    break
+
+                self._write_records_batch(records_batch)
+        except BaseException as error:
+            self._writer_error = error
+            self._writer_failed.set()
+
+    def _start_writer(self) -> None:
+        """Starts the writer thread, when the processor is pipelined"""
+
+        if self._pipelined:
+            self._writer_thread = threading.Thread(
+                target=self._run_writer, name="pipeline-writer", daemon=True
+            )
+            self._writer_thread.start()
+
+    def _stop_writer(self) -> None:
+        """Waits for the writer thread to write the pending batches, and stops it"""
+
+        if self._writer_thread is None:
+            return
+
+        put(self._batches_queue, None, self._writer_failed)
+        self._writer_thread.join()
+        self._writer_thread = None
+        if self._writer_error is not None:
+            raise self._writer_error
+
+    def _write_records_batch(
+        self,
+        records_batch: typing.List[
+            typing.Dict[str, typing.Union[str, typing.List[float]]]
+        ],
+    ) -> None:
+        """Serializes a batch of records, and writes them to the file at once
+
+        Parameters
+        ----------
+        records_batch : typing.List[typing.Dict]
+            The records to write, in order
+        """
+
+        logging.debug(
+            "Writing a batch of %s records to the JSON Results file",
+            len(records_batch),
+        )
+        with measure(self._stats, "json_dump"):
+            serialized_batch = self._records_separator.join(
+                map(self._serialize_record, records_batch)
+            )
+
+        with measure(self._stats, "write"):
+            if self._output_format == constants.NDJSON_OUTPUT_FORMAT:
+                # Every record ends its line, so a reader of the file never sees a
+                # partial last line between two batches:
+                self._json_results_file.write(serialized_batch)
+                self._json_results_file.write(os.linesep)
+            else:
+                if self._written_records_count > 0:
+                    self._json_results_file.write(self._records_separator)
+
+                self._json_results_file.write(serialized_batch)
+
+        previous_written_records_count = self._written_records_count
+        self._written_records_count += len(records_batch)
+        if (
+            self._written_records_count // self.PROGRESS_LOG_INTERVAL
+            > previous_written_records_count // self.PROGRESS_LOG_INTERVAL
+        ):
+            logging.info(
+                "%s records were written to the JSON Results file",
+                self._written_records_count,
+            )
 
     def persist_record(
         self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
     ) -> None:
-        """Appends to the file in a text line the received record
+        """Appends the received record to the file
+
+        The record is buffered, and written to the file together with the next ones.
 
         Parameters
         ----------
@@ -105,13 +410,24 @@ class OutputProcessor:
               }
         """
 
-        logging.debug("%s.persist_record(record=%s)", self.__class__.__name__, record)
-        if self._results_records_count > 0:
-            self._json_results_file.write(f",{os.linesep}")
-
-        ujson.dump(record, self._json_results_file, indent=4)
         self._results_records_count += 1
-        logging.info(
-            "Record %s was successfully append to the JSON Results file.",
-            self._results_records_count,
-        )
+        self._buffer_record(record)
+
+    def _buffer_record(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> None:
+        """Buffers a record, and writes the batch once it's full
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+        """
+
+        self._records_batch.append(record)
+        for matrix_writer in self._matrix_writers:
+            matrix_writer.persist_record(record)
+
+        if len(self._records_batch) >= self.RECORDS_BATCH_SIZE:
+            self._flush_records_batch()
@@ -0,0 +1,539 @@
+"""Contains logic to parse the input JSON file with a pool of processes
+
+The input JSON file is cut in byte ranges aligned to the lines boundaries, and every
+range is parsed and pre-aggregated in a process of a pool. The partial beacons vectors
+of every range are then merged in memory, in the same order than the ranges appear in
+the input file, because the readings of a beacon can be in several ranges.
+
+The merge reproduces exactly the results of the single process `memory` engine: every
+beacon vector is persisted at the position of the reading that completes it, and the
+ones not complete at the end of the input file, are persisted sorted by BeaconId and
+timestamp.
+
+This file can be imported as a module and contains the following classes:
+    * ParallelStorage - provides parallel parsing of the input JSON file
+"""
+
+import array
+import concurrent.futures
+import logging
+import operator
+import os
+import typing
+
+from src.base_storage import BaseStorage
+from src.memory_storage import MemoryStorage
+from src.models import BeaconKey
+from src.options import AggregationOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+from src.run_stats import measure
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+# The partial beacons vectors and the beacons readings lists of a byte range, the
+# number of parsed and rejected JSON documents, if the array of JSON documents was
+# closed, and the number of readings of every antenna that is not expected:
+ByteRangeAggregate = typing.Tuple[
+    typing.Dict[BeaconKey, list],
+    typing.Dict[BeaconKey, list],
+    int,
+    int,
+    bool,
+    typing.Dict[int, int],
+]
+
+
+class ByteRangeAggregator(BaseStorage):
+    """Parses and pre-aggregates the readings of a byte range of the input JSON file
+
+    The readings of a beacon are kept as a partial vector: the array of dbm_ant
+    readings, the bitmask of the received slots, and for every slot, the byte offset of
+    the line of its reading. When an antenna has more than one reading for a beacon in
+    the range, the partial vector can't tell the order in which the readings must be
+    applied, so all the beacon readings of the range are kept as a list of (offset,
+    slot, dbm_ant) tuples instead.
+
+    Attributes
+    ----------
+    READ_BLOCK_SIZE : int
+        size in bytes of the blocks read when counting the lines of a byte range.
+    """
+
+    READ_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        """
+
+        super().__init__(
+            input_json_file_path,
+            None,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            input_options,
+            aggregation_options,
+        )
+        self._line_offset: int = 0
+        self._partial_vectors: typing.Dict[BeaconKey, list] = {}
+        self._readings_lists: typing.Dict[BeaconKey, list] = {}
+
+    def _iter_lines(
+        self, input_json_file: typing.BinaryIO, start: int, end: int
+    ) -> typing.Iterator[str]:
+        """Reads the lines that start in a byte range of the input JSON file
+
+        Parameters
+        ----------
+        input_json_file : typing.BinaryIO
+            The input JSON file, opened in binary mode
+        start : int
+            Byte offset of the first line of the range
+        end : int
+            Byte offset where the range ends
+
+        Returns
+        -------
+        typing.Iterator[str]
+            the decoded lines of the range. Before a line is returned,
+            `self._line_offset` is set to its byte offset.
+        """
+
+        input_json_file.seek(start)
+        offset = start
+        while offset < end:
+            line = input_json_file.readline()
+            if not line:
+                break
+
+            self._line_offset = offset
+            offset += len(line)
+            yield line.decode("utf-8")
+
+    def count_lines(self, start: int, end: int) -> int:
+        """Counts the lines of a byte range of the input JSON file
+
+        Parameters
+        ----------
+        start : int
+            Byte offset of the first line of the range
+        end : int
+            Byte offset where the range ends
+
+        Returns
+        -------
+        int
+            the number of new line characters in the range.
+        """
+
+        lines_count = 0
+        with open(self._input_json_file_path, "rb") as input_json_file:
+            input_json_file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = input_json_file.read(min(self.READ_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+
+                lines_count += block.count(b"\n")
+                remaining -= len(block)
+
+        return lines_count
+
+    def aggregate(self, start: int, end: int, line_index: int) -> ByteRangeAggregate:
+        """Parses and pre-aggregates the readings of a byte range
+
+        Parameters
+        ----------
+        start : int
+            Byte offset of the first line of the range
+        end : int
+            Byte offset where the range ends
+        line_index : int
+            The number of the first line of the range in the input JSON file
+
+        Returns
+        -------
+        ByteRangeAggregate
+            the partial beacons vectors, the beacons readings lists, the number of
+            parsed and of rejected JSON documents, if the line that closes the
+            array of JSON documents was found in the range, and the number of readings
+            of every antenna that is not expected.
+        """
+
+        logging.debug(
+            "%s.aggregate(start=%s, end=%s, line_index=%s)",
+            self.__class__.__name__,
+            start,
+            end,
+            line_index,
+        )
+        with open(self._input_json_file_path, "rb") as input_json_file:
+            for json_document in self._iter_json_documents(
+                self._iter_lines(input_json_file, start, end), line_index
+            ):
+                self._process_json_record(json_document)
+
+        return (
+            self._partial_vectors,
+            self._readings_lists,
+            self._records_parsed_count,
+            self._records_rejected_count,
+            self._closing_bracket_found,
+            dict(self._unknown_antennas_counts),
+        )
+
+    def _process_json_record(self, json_record: "JSONDocumentModel") -> None:
+        """Adds a reading to the partial vector, or to the readings list of its beacon
+
+        Readings of antennas that are not expected are ignored.
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        slot = self._antenna_slots.get(json_record.ant_id)
+        if slot is None:
+            self._skip_unknown_antenna(json_record)
+            return
+
+        beacon_key = self._get_beacon_key(json_record)
+        if beacon_key is None:
+            return
+
+        readings_list = self._readings_lists.get(beacon_key)
+        if readings_list is not None:
+            readings_list.append((self._line_offset, slot, json_record.dbm_ant))
+            return
+
+        partial_vector = self._partial_vectors.get(beacon_key)
+        if partial_vector is None:
+            partial_vector = [
+                array.array(
+                    self._vector_typecode, [0.0] * len(self._expected_antenna_ids)
+                ),
+                0,
+                array.array("q", [0] * len(self._expected_antenna_ids)),
+            ]
+            self._partial_vectors[beacon_key] = partial_vector
+
+        row, mask, offsets = partial_vector
+        if mask >> slot & 1:
+            # A second reading for the same antenna. Keep all the beacon readings, so
+            # they can be applied in order:
+            self._readings_lists[beacon_key] = _partial_vector_readings(
+                partial_vector
+            ) + [(self._line_offset, slot, json_record.dbm_ant)]
+            del self._partial_vectors[beacon_key]
+            return
+
+        row[slot] = json_record.dbm_ant
+        offsets[slot] = self._line_offset
+        partial_vector[1] = mask | 1 << slot
+
+
+def _partial_vector_readings(
+    partial_vector: list,
+) -> typing.List[typing.Tuple[int, int, float]]:
+    """Returns the readings of a partial vector, sorted by their byte offset
+
+    Parameters
+    ----------
+    partial_vector : list
+        The array of dbm_ant readings, the bitmask of the received slots, and the
+        array of byte offsets of the readings.
+
+    Returns
+    -------
+    typing.List[typing.Tuple[int, int, float]]
+        a list of (offset, slot, dbm_ant) tuples.
+    """
+
+    row, mask, offsets = partial_vector
+    return sorted(
+        (offsets[slot], slot, row[slot]) for slot in range(len(row)) if mask >> slot & 1
+    )
+
+
+def _count_byte_range_lines(
+    input_json_file_path: str, byte_range: typing.Tuple[int, int]
+) -> int:
+    """Counts in a worker process, the lines of a byte range of the input JSON file"""
+
+    return ByteRangeAggregator(input_json_file_path, 0, []).count_lines(*byte_range)
+
+
+def _aggregate_byte_range(
+    input_json_file_path: str,
+    default_dbm_ant_value: int,
+    expected_antenna_ids: typing.List[int],
+    input_options: InputOptions,
+    aggregation_options: AggregationOptions,
+    byte_range: typing.Tuple[int, int],
+    line_index: int,
+) -> ByteRangeAggregate:
+    """Parses and pre-aggregates in a worker process, a byte range of the input file"""
+
+    return ByteRangeAggregator(
+        input_json_file_path,
+        default_dbm_ant_value,
+        expected_antenna_ids,
+        input_options,
+        aggregation_options,
+    ).aggregate(*byte_range, line_index)
+
+
+class ParallelStorage(MemoryStorage):
+    """A class used for the parallel parsing of the input JSON file
+
+    The beacons vectors are aggregated in memory as done by the `MemoryStorage`, with
+    the partial vectors produced by the worker processes.
+
+    Attributes
+    ----------
+    RANGES_PER_WORKER : int
+        number of byte ranges per worker process, in which the input JSON file is
+        cut, for a better balance of the work between the processes.
+    """
+
+    RANGES_PER_WORKER = 4
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        memory_budget: int,
+        spill_directory: typing.Optional[str] = None,
+        workers_count: int = 1,
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        memory_budget : int
+            Max number of bytes, that the open beacon vectors can use before start to
+            spill partitions to disk.
+        spill_directory : typing.Optional[str]
+            Directory where the spilled partitions will be stored. When None, the
+            default temporal directory is used.
+        workers_count : int
+            Number of worker processes used to parse the input JSON file.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        """
+
+        super().__init__(
+            input_json_file_path,
+            out_processor,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            memory_budget,
+            spill_directory,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+        logging.debug(
+            "%s.__init__(workers_count=%s)", self.__class__.__name__, workers_count
+        )
+        self._workers_count: int = workers_count
+
+    def _split_in_byte_ranges(self) -> typing.List[typing.Tuple[int, int]]:
+        """Cuts the input JSON file in byte ranges aligned to the lines boundaries
+
+        Returns
+        -------
+        typing.List[typing.Tuple[int, int]]
+            the (start, end) byte offsets of every range.
+        """
+
+        file_size = os.path.getsize(self._input_json_file_path)
+        ranges_count = self._workers_count * self.RANGES_PER_WORKER
+        boundaries = [0]
+        with open(self._input_json_file_path, "rb") as input_json_file:
+            for range_index in range(1, ranges_count):
+                # Move the boundary to the beginning of the next line:
+                input_json_file.seek(
+                    max(file_size * range_index // ranges_count - 1, 0)
+                )
+                input_json_file.readline()
+                boundary = input_json_file.tell()
+                if boundaries[-1] < boundary < file_size:
+                    boundaries.append(boundary)
+
+        boundaries.append(file_size)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _merge_byte_range(
+        self,
+        partial_vectors: typing.Dict[BeaconKey, list],
+        readings_lists: typing.Dict[BeaconKey, list],
+    ) -> None:
+        """Merges the partial vectors of a byte range with the open beacon vectors
+
+        Parameters
+        ----------
+        partial_vectors : typing.Dict[BeaconKey, list]
+            The partial vectors of the beacons with at most one reading per antenna in
+            the range.
+        readings_lists : typing.Dict[BeaconKey, list]
+            The readings of the beacons with more than one reading for some antenna in
+            the range.
+        """
+
+        # Readings to apply to the open beacon vectors, and beacon vectors completed in
+        # the range. Both are applied in the order of their byte offset, so the
+        # beacons vectors are persisted in the same order than in a single process:
+        pending = []
+        for beacon_key, partial_vector in partial_vectors.items():
+            row, mask, offsets = partial_vector
+            # A spilled beacon is merged back in memory, so it's found open:
+            partition = self._partitions[self._get_partition_index(beacon_key)]
+            if beacon_key in partition:
+                pending.extend(
+                    (offset, beacon_key, slot, dbm_ant)
+                    for offset, slot, dbm_ant in _partial_vector_readings(
+                        partial_vector
+                    )
+                )
+            elif mask == self._full_mask:
+                pending.append(
+                    (
+                        max(offsets),
+                        beacon_key,
+                        None,
+                        [row, mask, self._new_readings_counts(mask)],
+                    )
+                )
+            else:
+                partition[beacon_key] = [row, mask, self._new_readings_counts(mask)]
+                self._open_vectors_count += 1
+
+        for beacon_key, readings_list in readings_lists.items():
+            pending.extend(
+                (offset, beacon_key, slot, dbm_ant)
+                for offset, slot, dbm_ant in readings_list
+            )
+
+        pending.sort(key=operator.itemgetter(0))
+        for _, beacon_key, slot, dbm_ant in pending:
+            if slot is None:
+                self._output_processor.persist_record(
+                    self._build_results_record(beacon_key, dbm_ant)
+                )
+            else:
+                self._add_reading(beacon_key, slot, dbm_ant)
+
+    def parse_json_documents_from_file(self) -> None:
+        """Parses the input JSON file with a pool of worker processes"""
+
+        logging.debug("%s.parse_json_documents_from_file()", self.__class__.__name__)
+        byte_ranges = self._split_in_byte_ranges()
+        logging.debug(
+            "The input JSON file was cut in %s byte ranges: %s",
+            len(byte_ranges),
+            byte_ranges,
+        )
+        with concurrent.futures.ProcessPoolExecutor(self._workers_count) as executor:
+            # Count the lines of every range first, so the warnings of the workers
+            # refer to the lines numbers in the input JSON file:
+            lines_indexes = [1]
+            for lines_count in executor.map(
+                _count_byte_range_lines,
+                [self._input_json_file_path] * len(byte_ranges),
+                byte_ranges,
+            ):
+                lines_indexes.append(lines_indexes[-1] + lines_count)
+
+            results = executor.map(
+                _aggregate_byte_range,
+                [self._input_json_file_path] * len(byte_ranges),
+                [self._default_dbm_ant_value] * len(byte_ranges),
+                [self._expected_antenna_ids] * len(byte_ranges),
+                [self._input_options] * len(byte_ranges),
+                [self._aggregation_options] * len(byte_ranges),
+                byte_ranges,
+                lines_indexes[:-1],
+            )
+            for (start, end), (
+                partial_vectors,
+                readings_lists,
+                records_count,
+                rejected_records_count,
+                closed,
+                unknown_antennas_counts,
+            ) in zip(byte_ranges, results):
+                with measure(self._stats, "merge"):
+                    self._merge_byte_range(partial_vectors, readings_lists)
+
+                self._bytes_read_count += end - start
+                self._records_parsed_count += records_count
+                self._records_rejected_count += rejected_records_count
+                self._unknown_antennas_counts.update(unknown_antennas_counts)
+                if closed:
+                    # The rest of the ranges are after the end of the array of JSON
+                    # documents, they must be ignored:
+                    self._closing_bracket_found = True
+                    break
+
+        self._records_completed_early_count = (
+            self._output_processor.results_records_count
+        )
+        self._log_unknown_antennas()
+        if self._closing_bracket_found:
+            logging.info(
+                "In total, there were processed %s JSON documents",
+                self._records_parsed_count,
+            )
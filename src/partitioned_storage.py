@@ -0,0 +1,202 @@
+"""Contains logic to aggregate the beacons readings of inputs far larger than the RAM
+
+The aggregation is done in two phases. In the first one, every reading is routed to one
+of N partition files on disk, by the hash of its BeaconId and timestamp. In the second
+one, every partition is aggregated fully in memory, and its beacons vectors are handed
+over to the output processor. All the readings of a beacon are in the same partition,
+so the peak memory is bounded by the largest partition, and not by the number of
+beacons that are not complete yet.
+
+This file can be imported as a module and contains the following classes:
+    * PartitionedStorage - provides hash partitioned storage of the beacons readings
+"""
+
+import logging
+import struct
+import sys
+import tempfile
+import typing
+
+from src.memory_storage import MemoryStorage
+from src.options import AggregationOptions
+from src.options import InputOptions
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+
+if typing.TYPE_CHECKING:
+    from src.models import JSONDocumentModel
+
+
+class PartitionedStorage(MemoryStorage):
+    """A class used for the hash partitioned storage of the beacons readings
+
+    Every reading is stored in its partition file with a compact, fixed size, binary
+    format described by `RECORD`.
+
+    Attributes
+    ----------
+    RECORD : struct.Struct
+        BeaconId, nanoseconds since the Unix epoch of the timestamp, slot of the
+        antenna in the beacon vector, and dbm_ant.
+
+    PARTITION_BUFFER_SIZE : int
+        size in bytes of the write buffer of every partition file.
+    """
+
+    RECORD = struct.Struct("<qqid")
+    PARTITION_BUFFER_SIZE = 256 * 1024
+
+    def __init__(
+        self,
+        input_json_file_path: str,
+        out_processor: OutputProcessor,
+        default_dbm_ant_value: int,
+        expected_antenna_ids: typing.List[int],
+        partitions_count: int,
+        spill_directory: typing.Optional[str] = None,
+        input_options: typing.Optional[InputOptions] = None,
+        aggregation_options: typing.Optional[AggregationOptions] = None,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        input_json_file_path : str
+            The full file path of the input JSON file to process
+        out_processor : OutputProcessor
+            Handles the storage of a record, that contains a beacon's associated
+            antennas dbm_values
+        default_dbm_ant_value : int
+            Default value to be used as dbm_ant reading associated to an antenna id,
+            when in the input file, was not found the corresponding dbm_ant for an
+            antenna of a beacon.
+        expected_antenna_ids : typing.List[int]
+            Contains the list of antennas ids, for which should be found in the input
+            file, the corresponding readings for its dbm_ant value.
+        partitions_count : int
+            Number of partition files in which the readings are distributed.
+        spill_directory : typing.Optional[str]
+            Directory where the partition files will be stored. When None, the default
+            temporal directory is used.
+        input_options : typing.Optional[InputOptions]
+            Options used to read the input JSON file. When None, the default options
+            are used.
+        aggregation_options : typing.Optional[AggregationOptions]
+            Options used to aggregate the beacons readings. When None, the default
+            options are used.
+        stats : typing.Optional[RunStats]
+            Collects the timings and counters of the run. When None, they are not
+            collected.
+        """
+
+        # A partition is always aggregated fully in memory, so it's never spilled:
+        super().__init__(
+            input_json_file_path,
+            out_processor,
+            default_dbm_ant_value,
+            expected_antenna_ids,
+            sys.maxsize,
+            spill_directory,
+            input_options,
+            aggregation_options,
+            stats,
+        )
+        logging.debug(
+            "%s.__init__(partitions_count=%s)",
+            self.__class__.__name__,
+            partitions_count,
+        )
+
+        self._partitions_count: int = partitions_count
+        self._partition_files: typing.List[typing.BinaryIO] = []
+
+    def _open_staging_storage(self) -> None:
+        """Creates the temporal partition files"""
+
+        super()._open_staging_storage()
+        self._partition_files = [
+            tempfile.TemporaryFile(
+                dir=self._spill_directory, buffering=self.PARTITION_BUFFER_SIZE
+            )
+            for _ in range(self._partitions_count)
+        ]
+
+    def _close_staging_storage(self) -> None:
+        """Closes the temporal partition files"""
+
+        super()._close_staging_storage()
+        for partition_file in self._partition_files:
+            partition_file.close()
+
+    def _process_json_record(self, json_record: "JSONDocumentModel") -> None:
+        """Appends the reading to the partition file that correspond to its beacon
+
+        Readings of antennas that are not expected are ignored.
+
+        Parameters
+        ----------
+        json_record : JSONDocumentModel
+            Reference to a model object with a record's data, parsed from the input
+            file.
+        """
+
+        slot = self._antenna_slots.get(json_record.ant_id)
+        if slot is None:
+            self._skip_unknown_antenna(json_record)
+            return
+
+        beacon_key = self._get_beacon_key(json_record)
+        if beacon_key is None:
+            return
+
+        partition_index = hash(beacon_key) % self._partitions_count
+        self._partition_files[partition_index].write(
+            self.RECORD.pack(*beacon_key, slot, json_record.dbm_ant)
+        )
+
+    def _iter_partition_readings(
+        self, partition_file: typing.BinaryIO
+    ) -> typing.Iterator[typing.Tuple[int, int, int, float]]:
+        """Decodes the readings stored in a partition file
+
+        Parameters
+        ----------
+        partition_file : typing.BinaryIO
+            The partition file to decode
+
+        Returns
+        -------
+        typing.Iterator[typing.Tuple[int, int, int, float]]
+            the BeaconId, epoch nanoseconds, antenna slot and dbm_ant of the readings
+            of the partition, in the same order than in the input file.
+        """
+
+        partition_file.seek(0)
+        return self.RECORD.iter_unpack(partition_file.read())
+
+    def persist_beacons_vectors_to_results_file(self) -> None:
+        """Aggregates every partition, and persist its beacons vectors
+
+        Every partition is aggregated in memory one at a time. The beacons vectors are
+        persisted as soon as they are complete, and the ones still not complete at the
+        end of the partition, are persisted sorted by their beacon key.
+        """
+
+        logging.debug(
+            "%s.persist_beacons_vectors_to_results_file()", self.__class__.__name__
+        )
+        for partition_index, partition_file in enumerate(self._partition_files):
+            partition_file.flush()
+            logging.debug(
+                "Aggregating the partition #%s with %s bytes",
+                partition_index,
+                partition_file.tell(),
+            )
+            for beacon_id, epoch_ns, slot, dbm_ant in self._iter_partition_readings(
+                partition_file
+            ):
+                self._add_reading((beacon_id, epoch_ns), slot, dbm_ant)
+
+            super().persist_beacons_vectors_to_results_file()
+            # The partition is not needed any more, release its disk space:
+            partition_file.truncate(0)
@@ -0,0 +1,225 @@
+"""Provides the execution of the reading and parsing of the input file in a pipeline
+
+The input file is read in blocks by a reader thread, and every block is parsed by a
+parser thread, while the calling thread consumes the parsed documents. The stages are
+connected by bounded queues, so a fast stage waits for the slower ones (backpressure),
+and the memory used by the blocks in flight is bounded.
+
+An error in any stage aborts the whole pipeline, and it's raised in the thread that
+consumes the parsed documents.
+
+This file can be imported as a module and contains the following classes:
+    * Pipeline - reads and parses the blocks of the input file in background threads
+
+And the following functions:
+    * put(bounded_queue, item, *stop_events) - puts an item in a bounded queue,
+    waiting while it's full, unless some of the stop events is set
+"""
+
+import logging
+import queue
+import threading
+import types
+import typing
+
+POLL_INTERVAL = 0.1
+
+# Marks the end of the items of a queue:
+_END = object()
+
+
+def put(bounded_queue: queue.Queue, item: typing.Any, *stop_events) -> bool:
+    """Puts an item in a bounded queue, waiting while it's full
+
+    Parameters
+    ----------
+    bounded_queue : queue.Queue
+        The queue where the item will be put
+    item : typing.Any
+        The item to put in the queue
+    stop_events : threading.Event
+        Events that, when set, stop the waiting
+
+    Returns
+    -------
+    bool
+        True if the item was put in the queue, or False if some of the stop events
+        was set before.
+    """
+
+    while not any(stop_event.is_set() for stop_event in stop_events):
+        try:
+            bounded_queue.put(item, timeout=POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+class Pipeline:
+    """Reads and parses the blocks of the input file in background threads
+
+    It must be used as a context manager, that starts the threads on enter, and stops
+    them on exit. Iterating over it returns the parsed items, in the same order than
+    their blocks were read.
+
+    Attributes
+    ----------
+    QUEUE_SIZE : int
+        max number of blocks, and of lists of parsed items, waiting in the queues.
+    """
+
+    QUEUE_SIZE = 8
+
+    def __init__(
+        self,
+        blocks: typing.Iterator[typing.Any],
+        parse_block: typing.Callable[[typing.Any], typing.Tuple[typing.List, bool]],
+    ):
+        """
+        Parameters
+        ----------
+        blocks : typing.Iterator[typing.Any]
+            Returns the blocks of the input file. It's consumed by the reader thread
+        parse_block : typing.Callable[[typing.Any], typing.Tuple[typing.List, bool]]
+            Parses a block, and returns the parsed items, and if the end of the input
+            was found, so the next blocks must not be parsed. It's called by the parser
+            thread
+        """
+
+        self._blocks: typing.Iterator[typing.Any] = blocks
+        self._parse_block: typing.Callable = parse_block
+        self._blocks_queue: queue.Queue = queue.Queue(self.QUEUE_SIZE)
+        self._parsed_items_queue: queue.Queue = queue.Queue(self.QUEUE_SIZE)
+        self._stop_reading: threading.Event = threading.Event()
+        self._abort: threading.Event = threading.Event()
+        self._errors: typing.List[BaseException] = []
+        self._threads: typing.List[threading.Thread] = [
+            threading.Thread(
+                target=self._run_stage, args=(stage,), name=name, daemon=True
+            )
+            for name, stage in (
+                ("pipeline-reader", self._read_blocks),
+                ("pipeline-parser", self._parse_blocks),
+            )
+        ]
+
+    def __enter__(self) -> "Pipeline":
+        """Starts the threads of the pipeline
+
+        Returns
+        -------
+        Pipeline:
+            the pipeline being used as a context manager
+        """
+
+        logging.debug("%s.__enter__()", self.__class__.__name__)
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_val: typing.Optional[BaseException],
+        exc_tb: typing.Optional[types.TracebackType],
+    ) -> typing.Optional[bool]:
+        """Stops the threads of the pipeline, and waits for them to finish
+
+        Parameters
+        ----------
+        exc_type : typing.Optional[typing.Type[BaseException]]
+            Type of the exception that caused the context to be exited
+        exc_val : typing.Optional[BaseException]
+            The exception that caused the context to be exited
+        exc_tb : typing.Optional[types.TracebackType]
+            Traceback related to the call stack associated to the exception
+
+        Returns
+        -------
+        typing.Optional[bool]:
+            False, so an exception is never suppressed.
+        """
+
+        logging.debug("%s.__exit__(exc_type=%s)", self.__class__.__name__, exc_type)
+        self._abort.set()
+        for thread in self._threads:
+            thread.join()
+
+        return False
+
+    def _run_stage(self, stage: typing.Callable[[], None]) -> None:
+        """Runs a stage of the pipeline, aborting the pipeline if it fails
+
+        Parameters
+        ----------
+        stage : typing.Callable[[], None]
+            The function that implements the stage
+        """
+
+        try:
+            stage()
+        except BaseException as error:
+            logging.debug("The pipeline is aborted by an error: %r", error)
+            self._errors.append(error)
+            self._abort.set()
+
+    def _read_blocks(self) -> None:
+        """Puts the blocks of the input file in the blocks queue"""
+
+        for block in self._blocks:
+            if not put(self._blocks_queue, block, self._stop_reading, self._abort):
+                return
+
+        put(self._blocks_queue, _END, self._stop_reading, self._abort)
+
+    def _parse_blocks(self) -> None:
+        """Parses the blocks of the blocks queue, and puts the parsed items in order"""
+
+        while not self._abort.is_set():
+            try:
+                block = self._blocks_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if block is _END:
+                break
+
+            parsed_items, end_found = self._parse_block(block)
+            if not put(self._parsed_items_queue, parsed_items, self._abort):
+                return
+
+            if end_found:
+                # The remaining blocks don't need to be read:
+                self._stop_reading.set()
+                break
+
+        put(self._parsed_items_queue, _END, self._abort)
+
+    def __iter__(self) -> typing.Iterator[typing.Any]:
+        """Returns the parsed items, as they're available
+
+        Returns
+        -------
+        typing.Iterator[typing.Any]
+            the parsed items, in the same order than their blocks were read.
+        """
+
+        while True:
+            try:
+                parsed_items = self._parsed_items_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self._errors:
+                    raise self._errors[0]
+
+                continue
+
+            if parsed_items is _END:
+                break
+
+            yield from parsed_items
+
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,546 @@
+"""Provides the planning of a run, from a sample of the input and the host resources
+
+When no engine is selected, the storage engine of a run, and its parameters, are chosen
+from a sample of the input JSON files and the resources of the host:
+    * the size of the input, and the average length of its lines, give the number of
+    readings. The size of a compressed input file is estimated from its compressed size
+    * the beacon vectors that are not complete yet along a prefix of the first input
+    JSON file, give the peak of the open beacon vectors, and so the memory needed to
+    keep them open. The vectors that never complete stay open until the end of the
+    input, so their growth along the prefix is extrapolated to the whole input
+    * the layout of the JSON documents in the prefix gives the input format: the
+    'stream' one when they aren't one per line, e.g. in a minified or a pretty printed
+    array
+    * the memory and the CPUs available to the process, give the memory budget and the
+    number of worker processes
+
+A small input is aggregated by the lite engine. Otherwise, when the open beacon
+vectors fit in the memory budget, the readings are aggregated in memory, by a pool of
+worker processes when the input is large enough to split it in byte ranges. When they
+don't fit, the readings are staged on disk in partitions by the partitioned engine.
+The options that only some engines support (e.g. --follow or --checkpoint-dir) narrow
+the choice, and the parameters given in the command line's arguments are kept.
+
+The partitioned engine is the only candidate that stages the readings on disk: it
+appends every reading once to a partition file, and aggregates one partition at a time
+in memory, so its memory is bounded by the number of partitions. The HDF5 engines are
+never chosen: the hdf5 engine looks up and updates a HDF5 dataset for every reading,
+which is orders of magnitude slower, and the columnar one loads all the readings in
+memory to sort them at the end, so its memory isn't bounded when the beacons don't fit
+in the memory budget. Both also need h5py and numpy, that may not be installed. They can
+still be selected with --engine.
+
+This file can be imported as a module and contains the following classes:
+    * InputSample - the estimated size and contents of the input JSON files
+    * ExecutionPlan - the storage engine of a run, and its parameters
+
+And the following functions:
+    * sample_input(file_paths, sample_size) - samples the input JSON files
+    * get_available_memory() - gets the memory available to the process
+    * get_available_cpus() - gets the number of CPUs available to the process
+    * create_plan(args, sample, available_memory, cpus_count) - chooses the storage
+    engine of a run, and its parameters
+    * plan_execution(args) - plans the run, and applies the plan to the arguments
+"""
+
+import argparse
+import array
+import dataclasses
+import logging
+import math
+import os
+import re
+import sys
+import typing
+
+from src import compressed_input
+from src import constants
+from src.memory_storage import MemoryStorage
+
+MEGABYTE = 1024 * 1024
+# Bytes read from the beginning of the first input JSON file:
+SAMPLE_SIZE = MEGABYTE
+# Assumed ratio between the decompressed and the compressed size of an input file:
+COMPRESSION_RATIO = 8
+# Fraction of the available memory used as the memory budget:
+MEMORY_BUDGET_FRACTION = 0.5
+# Min size of the input that is worth to be parsed by every worker process:
+MIN_BYTES_PER_WORKER = 64 * MEGABYTE
+# Partitions used for every memory budget of open beacon vectors, so every partition
+# fits in the memory budget even when the beacons are distributed unevenly:
+PARTITIONS_PER_BUDGET = 2
+
+# A JSON document of a reading, and its fields, in any order:
+DOCUMENT_PATTERN = re.compile(rb"{[^{}]*}")
+BEACON_ID_PATTERN = re.compile(rb'"BeaconId"[ \t\r\n]*:[ \t\r\n]*(-?[0-9]+)')
+ANT_ID_PATTERN = re.compile(rb'"ant_id"[ \t\r\n]*:[ \t\r\n]*(-?[0-9]+)')
+TIMESTAMP_PATTERN = re.compile(rb'"timestamp"[ \t\r\n]*:[ \t\r\n]*"([^"]*)"')
+
+
+@dataclasses.dataclass(frozen=True)
+class InputSample:
+    """The estimated size and contents of the input JSON files
+
+    Attributes
+    ----------
+    input_bytes : int
+        estimated size of the input JSON files, once decompressed.
+
+    compressed : bool
+        True when any input JSON file is compressed.
+
+    sample_bytes : int
+        size of the prefix of the first input JSON file that was sampled.
+
+    average_line_bytes : float
+        average length of the lines of the sample.
+
+    sample_readings : int
+        number of readings found in the sample.
+
+    sample_beacons : int
+        number of distinct beacon keys found in the sample.
+
+    sample_open_beacons : int
+        number of beacon vectors that are not complete yet at the end of the sample.
+
+    open_beacons_growth : float
+        growth of the beacon vectors that are not complete yet, for every reading of
+        the second half of the sample.
+
+    line_delimited : bool
+        True when every JSON document of the sample is in its own line.
+    """
+
+    input_bytes: int
+    compressed: bool
+    sample_bytes: int
+    average_line_bytes: float
+    sample_readings: int
+    sample_beacons: int
+    sample_open_beacons: int
+    open_beacons_growth: float
+    line_delimited: bool
+
+    @property
+    def estimated_readings(self) -> int:
+        """Estimated number of readings of the input JSON files"""
+
+        if not self.sample_readings:
+            return 0
+
+        return round(self.input_bytes * self.sample_readings / self.sample_bytes)
+
+    @property
+    def estimated_beacons(self) -> int:
+        """Estimated number of distinct beacon keys of the input JSON files"""
+
+        if not self.sample_readings:
+            return 0
+
+        return round(
+            self.estimated_readings * self.sample_beacons / self.sample_readings
+        )
+
+    @property
+    def estimated_peak_open_beacons(self) -> int:
+        """Estimated peak of the beacon vectors that are not complete yet
+
+        The growth of the open beacon vectors along the second half of the sample is
+        extrapolated to the readings after the sample, up to the estimated number of
+        beacon keys.
+        """
+
+        remaining_readings = max(0, self.estimated_readings - self.sample_readings)
+        peak_open_beacons = round(
+            self.sample_open_beacons
+            + max(0.0, self.open_beacons_growth) * remaining_readings
+        )
+        return min(
+            peak_open_beacons, max(self.estimated_beacons, self.sample_open_beacons)
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class ExecutionPlan:
+    """The storage engine of a run, and its parameters
+
+    Attributes
+    ----------
+    engine : str
+        one of constants.ENGINES.
+
+    workers_count : int
+        number of worker processes that parse the input JSON files.
+
+    input_format : str
+        one of constants.INPUT_FORMATS.
+
+    memory_budget_mb : int
+        max memory used for the beacons that are not complete yet, in megabytes.
+
+    partitions_count : int
+        number of partition files of the partitioned engine.
+
+    reason : str
+        why the engine was chosen.
+    """
+
+    engine: str
+    input_format: str
+    workers_count: int
+    memory_budget_mb: int
+    partitions_count: int
+    reason: str
+
+
+def sample_input(
+    file_paths: typing.List[str],
+    antenna_ids: typing.List[int],
+    sample_size: int = SAMPLE_SIZE,
+) -> InputSample:
+    """Samples the input JSON files
+
+    The readings of the sample are aggregated as the storage engines do, tracking only
+    the antennas received by every open beacon vector, to count the beacon vectors
+    that are not complete yet.
+
+    Parameters
+    ----------
+    file_paths : typing.List[str]
+        The input JSON files. Only a prefix of the first one is read
+    antenna_ids : typing.List[int]
+        The expected antennas ids
+    sample_size : int
+        Max number of bytes read from the first input JSON file
+
+    Returns
+    -------
+    InputSample
+        the estimated size and contents of the input JSON files.
+    """
+
+    compressions = [
+        compressed_input.detect_compression(file_path) for file_path in file_paths
+    ]
+    input_bytes = sum(
+        os.path.getsize(file_path) * (1 if compression is None else COMPRESSION_RATIO)
+        for file_path, compression in zip(file_paths, compressions)
+    )
+    compression = compressions[0]
+    if compression is None:
+        with open(file_paths[0], "rb") as input_file:
+            sample = input_file.read(sample_size)
+    else:
+        with compressed_input.open_input_file(file_paths[0], compression) as input_file:
+            sample = input_file.read(sample_size).encode("utf-8")
+
+    readings = []
+    line_delimited = True
+    previous_document_end = None
+    for match in DOCUMENT_PATTERN.finditer(sample):
+        document = match.group()
+        if b"\n" in document or (
+            previous_document_end is not None
+            and b"\n" not in sample[previous_document_end : match.start()]
+        ):
+            line_delimited = False
+
+        previous_document_end = match.end()
+        beacon_id = BEACON_ID_PATTERN.search(document)
+        ant_id = ANT_ID_PATTERN.search(document)
+        timestamp = TIMESTAMP_PATTERN.search(document)
+        if beacon_id is not None and ant_id is not None and timestamp is not None:
+            readings.append(
+                ((beacon_id.group(1), timestamp.group(1)), int(ant_id.group(1)))
+            )
+
+    antennas_count = len(antenna_ids)
+    half_open_beacons = 0
+    open_beacons: typing.Dict[typing.Tuple[bytes, bytes], typing.Set[int]] = {}
+    for reading_index, (beacon_key, ant_id) in enumerate(readings):
+        if reading_index == len(readings) // 2:
+            half_open_beacons = len(open_beacons)
+
+        if ant_id not in antenna_ids:
+            continue
+
+        received_antennas = open_beacons.setdefault(beacon_key, set())
+        received_antennas.add(ant_id)
+        if len(received_antennas) == antennas_count:
+            del open_beacons[beacon_key]
+
+    second_half_readings = len(readings) - len(readings) // 2
+    return InputSample(
+        input_bytes=input_bytes,
+        compressed=any(compression is not None for compression in compressions),
+        sample_bytes=len(sample),
+        average_line_bytes=len(sample) / (sample.count(b"\n") or 1),
+        sample_readings=len(readings),
+        sample_beacons=len({beacon_key for beacon_key, _ in readings}),
+        sample_open_beacons=len(open_beacons),
+        open_beacons_growth=(
+            (len(open_beacons) - half_open_beacons) / second_half_readings
+            if second_half_readings
+            else 0.0
+        ),
+        line_delimited=line_delimited,
+    )
+
+
+def get_available_memory() -> typing.Optional[int]:
+    """Gets the memory available to the process
+
+    The memory available in the host is limited by the memory limit of the cgroup of
+    the process, e.g. the one of a container.
+
+    Returns
+    -------
+    typing.Optional[int]
+        the available memory in bytes, or None if it can't be found.
+    """
+
+    available_memory = None
+    try:
+        with open("/proc/meminfo") as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith("MemAvailable:"):
+                    available_memory = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError):
+        try:
+            available_memory = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf(
+                "SC_PAGE_SIZE"
+            )
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    try:
+        with open("/sys/fs/cgroup/memory.max") as memory_max_file:
+            memory_max = memory_max_file.read().strip()
+    except OSError:
+        memory_max = "max"
+
+    if memory_max.isdigit():
+        available_memory = min(available_memory or sys.maxsize, int(memory_max))
+
+    return available_memory
+
+
+def get_available_cpus() -> int:
+    """Gets the number of CPUs available to the process
+
+    Returns
+    -------
+    int
+        the number of CPUs that the process can run on.
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def create_plan(
+    args: argparse.Namespace,
+    sample: typing.Optional[InputSample],
+    available_memory: typing.Optional[int],
+    cpus_count: int,
+) -> ExecutionPlan:
+    """Chooses the storage engine of a run, and its parameters
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        contains the user supplied command line arguments
+    sample : typing.Optional[InputSample]
+        The sample of the input JSON files. It's only required when no engine is
+        selected
+    available_memory : typing.Optional[int]
+        The memory available to the process in bytes, or None if it's unknown
+    cpus_count : int
+        The number of CPUs available to the process
+
+    Returns
+    -------
+    ExecutionPlan
+        the storage engine, and its parameters. The parameters in the arguments are
+        kept.
+    """
+
+    if args.engine is not None:
+        return ExecutionPlan(
+            args.engine,
+            args.input_format,
+            args.workers or constants.DEFAULT_WORKERS_COUNT,
+            args.memory_budget or constants.DEFAULT_MEMORY_BUDGET_MB,
+            args.partitions or constants.DEFAULT_PARTITIONS_COUNT,
+            "selected with --engine",
+        )
+
+    memory_budget_mb = args.memory_budget
+    if memory_budget_mb is None:
+        memory_budget_mb = (
+            constants.DEFAULT_MEMORY_BUDGET_MB
+            if available_memory is None
+            else max(1, int(available_memory * MEMORY_BUDGET_FRACTION) // MEGABYTE)
+        )
+
+    # The lines input format can't parse JSON documents that aren't in their own line:
+    input_format = (
+        args.input_format if sample.line_delimited else constants.STREAM_INPUT_FORMAT
+    )
+    # Estimate the memory used by the beacon vectors at the peak of the open ones:
+    open_vector_bytes = (
+        MemoryStorage.OPEN_VECTOR_OVERHEAD_BYTES
+        + sys.getsizeof(array.array("d", bytes(8 * len(args.antenna_ids))))
+        + sys.getsizeof([None, 0, None])
+    )
+    open_vectors_bytes = sample.estimated_peak_open_beacons * open_vector_bytes
+    memory_budget = memory_budget_mb * MEGABYTE
+    # The options supported by the hdf5 and memory engines only, with one worker
+    # process:
+    streaming = (
+        args.follow
+        or args.allowed_lateness is not None
+        or args.checkpoint_dir is not None
+    )
+    multiple_files = len(args.input_file_paths) > 1
+    parallelizable = (
+        not streaming
+        and not sample.compressed
+        and not multiple_files
+        and input_format == constants.LINES_INPUT_FORMAT
+        and not args.mmap
+        and not args.pipeline
+        and args.unknown_antennas != constants.SIDE_FILE_UNKNOWN_ANTENNAS
+    )
+
+    def plan(engine: str, workers_count: int, reason: str) -> ExecutionPlan:
+        """Creates a plan, keeping the parameters in the arguments"""
+
+        return ExecutionPlan(
+            engine,
+            input_format,
+            args.workers or workers_count,
+            memory_budget_mb,
+            args.partitions or constants.DEFAULT_PARTITIONS_COUNT,
+            reason,
+        )
+
+    if args.workers is not None and args.workers > 1:
+        return plan(
+            constants.MEMORY_ENGINE, args.workers, "parallel, selected with --workers"
+        )
+
+    if multiple_files:
+        return plan(
+            constants.MEMORY_ENGINE,
+            min(cpus_count, len(args.input_file_paths)),
+            "in-memory, one task per input JSON file",
+        )
+
+    if streaming:
+        return plan(
+            constants.MEMORY_ENGINE,
+            1,
+            "in-memory, with one worker process for --follow, --allowed-lateness or "
+            "the checkpoints",
+        )
+
+    if sample.input_bytes < args.small_input_threshold * MEGABYTE:
+        return plan(constants.LITE_ENGINE, 1, "small input")
+
+    if open_vectors_bytes > memory_budget:
+        partitions_count = max(
+            constants.DEFAULT_PARTITIONS_COUNT,
+            math.ceil(open_vectors_bytes * PARTITIONS_PER_BUDGET / memory_budget),
+        )
+        return ExecutionPlan(
+            constants.PARTITIONED_ENGINE,
+            input_format,
+            1,
+            memory_budget_mb,
+            args.partitions or partitions_count,
+            "staged on disk, the beacons don't fit in the memory budget",
+        )
+
+    workers_count = (
+        max(1, min(cpus_count, sample.input_bytes // MIN_BYTES_PER_WORKER))
+        if parallelizable
+        else 1
+    )
+    if workers_count > 1:
+        return plan(
+            constants.MEMORY_ENGINE,
+            workers_count,
+            "parallel, the beacons fit in the memory budget",
+        )
+
+    return plan(
+        constants.MEMORY_ENGINE, 1, "in-memory, the beacons fit in the memory budget"
+    )
+
+
+def plan_execution(args: argparse.Namespace) -> ExecutionPlan:
+    """Plans the run, and applies the plan to the arguments
+
+    The input JSON files are only sampled when no engine is selected. The engine, the
+    input format, the number of worker processes, the memory budget and the number of
+    partitions of the plan are set in the arguments.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        contains the user supplied command line arguments
+
+    Returns
+    -------
+    ExecutionPlan
+        the plan of the run.
+    """
+
+    sample = None
+    available_memory = None
+    cpus_count = 1
+    if args.engine is None:
+        sample = sample_input(args.input_file_paths, args.antenna_ids)
+        available_memory = get_available_memory()
+        cpus_count = get_available_cpus()
+        logging.info(
+            "The input has ~%s MB, ~%s readings in lines of ~%s bytes, ~%s beacons, "
+            "and a peak of ~%s beacons that are not complete yet. There are %s MB of "
+            "memory and %s CPUs available",
+            sample.input_bytes // MEGABYTE,
+            sample.estimated_readings,
+            round(sample.average_line_bytes),
+            sample.estimated_beacons,
+            sample.estimated_peak_open_beacons,
+            "unknown" if available_memory is None else available_memory // MEGABYTE,
+            cpus_count,
+        )
+
+    execution_plan = create_plan(args, sample, available_memory, cpus_count)
+    if execution_plan.input_format != args.input_format:
+        logging.info(
+            "The JSON documents of the input aren't in their own lines, the '%s' input "
+            "format will be used",
+            execution_plan.input_format,
+        )
+
+    logging.info(
+        "Execution plan: the '%s' engine, with %s worker processes, a memory budget "
+        "of %s MB, and %s partitions (%s)",
+        execution_plan.engine,
+        execution_plan.workers_count,
+        execution_plan.memory_budget_mb,
+        execution_plan.partitions_count,
+        execution_plan.reason,
+    )
+    args.engine = execution_plan.engine
+    args.input_format = execution_plan.input_format
+    args.workers = execution_plan.workers_count
+    args.memory_budget = execution_plan.memory_budget_mb
+    args.partitions = execution_plan.partitions_count
+    return execution_plan
@@ -0,0 +1,252 @@
+"""Provides the reductions used to combine the duplicated readings of an antenna
+
+When a beacon receives more than one dbm_ant reading from the same antenna at the same
+timestamp, the readings are combined in the slot of the antenna, as they arrive, with
+one of the following reductions:
+
+    * first - the first reading is kept
+    * last - every reading overwrites the previous one
+    * mean - the running mean of the readings, updated with Welford's method
+    * max - the max reading is kept
+    * min - the min reading is kept
+
+Only the reduced value and the number of readings of every slot are kept, so the memory
+used by a beacon doesn't depend on how many readings it receives. The partial
+aggregates of the same beacon, e.g. a spilled one and the one still in memory, can be
+merged with the same reductions.
+
+This file can be imported as a module and contains the following functions:
+    * reduce_first, reduce_last, reduce_mean, reduce_max, reduce_min - combine a
+    reading in the slot of a vector
+
+And the following dicts:
+    * READING_REDUCERS - the reduce function of every reduction
+    * AGGREGATE_MERGERS - the function that merges two partial aggregates, for every
+    reduction
+"""
+
+import typing
+
+from src import constants
+
+ReadingReducer = typing.Callable[[typing.MutableSequence[float], int, float, int], None]
+AggregateMerger = typing.Callable[
+    [
+        typing.MutableSequence[float],
+        typing.MutableSequence[int],
+        typing.Sequence[float],
+        typing.Sequence[int],
+    ],
+    None,
+]
+
+
+def reduce_first(
+    dbm_ant_row: typing.MutableSequence[float], slot: int, dbm_ant: float, count: int
+) -> None:
+    """Keeps the first reading of a slot
+
+    Parameters
+    ----------
+    dbm_ant_row : typing.MutableSequence[float]
+        The dbm_ant readings of the beacon, with a slot for every expected antenna
+    slot : int
+        The slot of the antenna in the beacon vector
+    dbm_ant : float
+        The new dbm_ant reading of the antenna
+    count : int
+        The number of readings of the slot, including the new one
+    """
+
+    if count == 1:
+        dbm_ant_row[slot] = dbm_ant
+
+
+def reduce_last(
+    dbm_ant_row: typing.MutableSequence[float], slot: int, dbm_ant: float, count: int
+) -> None:
+    """Keeps the last reading of a slot
+
+    Parameters
+    ----------
+    dbm_ant_row : typing.MutableSequence[float]
+        The dbm_ant readings of the beacon, with a slot for every expected antenna
+    slot : int
+        The slot of the antenna in the beacon vector
+    dbm_ant : float
+        The new dbm_ant reading of the antenna
+    count : int
+        The number of readings of the slot, including the new one
+    """
+
+    dbm_ant_row[slot] = dbm_ant
+
+
+def reduce_mean(
+    dbm_ant_row: typing.MutableSequence[float], slot: int, dbm_ant: float, count: int
+) -> None:
+    """Updates the running mean of the readings of a slot, with Welford's method
+
+    Parameters
+    ----------
+    dbm_ant_row : typing.MutableSequence[float]
+        The dbm_ant readings of the beacon, with a slot for every expected antenna
+    slot : int
+        The slot of the antenna in the beacon vector
+    dbm_ant : float
+        The new dbm_ant reading of the antenna
+    count : int
+        The number of readings of the slot, including the new one
+    """
+
+    if count == 1:
+        # The slot has the default value, that is not part of the mean:
+        dbm_ant_row[slot] = dbm_ant
+    else:
+        dbm_ant_row[slot] += (dbm_ant - dbm_ant_row[slot]) / count
+
+
+def reduce_max(
+    dbm_ant_row: typing.MutableSequence[float], slot: int, dbm_ant: float, count: int
+) -> None:
+    """Keeps the max reading of a slot
+
+    Parameters
+    ----------
+    dbm_ant_row : typing.MutableSequence[float]
+        The dbm_ant readings of the beacon, with a slot for every expected antenna
+    slot : int
+        The slot of the antenna in the beacon vector
+    dbm_ant : float
+        The new dbm_ant reading of the antenna
+    count : int
+        The number of readings of the slot, including the new one
+    """
+
+    if count == 1 or dbm_ant > dbm_ant_row[slot]:
+        dbm_ant_row[slot] = dbm_ant
+
+
+def reduce_min(
+    dbm_ant_row: typing.MutableSequence[float], slot: int, dbm_ant: float, count: int
+) -> None:
+    """Keeps the min reading of a slot
+
+    Parameters
+    ----------
+    dbm_ant_row : typing.MutableSequence[float]
+        The dbm_ant readings of the beacon, with a slot for every expected antenna
+    slot : int
+        The slot of the antenna in the beacon vector
+    dbm_ant : float
+        The new dbm_ant reading of the antenna
+    count : int
+        The number of readings of the slot, including the new one
+    """
+
+    if count == 1 or dbm_ant < dbm_ant_row[slot]:
+        dbm_ant_row[slot] = dbm_ant
+
+
+def _merge_first(
+    dbm_ant_row: typing.MutableSequence[float],
+    readings_counts: typing.MutableSequence[int],
+    later_dbm_ant_row: typing.Sequence[float],
+    later_readings_counts: typing.Sequence[int],
+) -> None:
+    """Merges a later partial aggregate, keeping the first reading of every slot"""
+
+    for slot, later_count in enumerate(later_readings_counts):
+        if later_count and not readings_counts[slot]:
+            dbm_ant_row[slot] = later_dbm_ant_row[slot]
+
+        readings_counts[slot] += later_count
+
+
+def _merge_last(
+    dbm_ant_row: typing.MutableSequence[float],
+    readings_counts: typing.MutableSequence[int],
+    later_dbm_ant_row: typing.Sequence[float],
+    later_readings_counts: typing.Sequence[int],
+) -> None:
+    """Merges a later partial aggregate, keeping the last reading of every slot"""
+
+    for slot, later_count in enumerate(later_readings_counts):
+        if later_count:
+            dbm_ant_row[slot] = later_dbm_ant_row[slot]
+
+        readings_counts[slot] += later_count
+
+
+def _merge_mean(
+    dbm_ant_row: typing.MutableSequence[float],
+    readings_counts: typing.MutableSequence[int],
+    later_dbm_ant_row: typing.Sequence[float],
+    later_readings_counts: typing.Sequence[int],
+) -> None:
+    """Merges a later partial aggregate, combining the means of every slot"""
+
+    for slot, later_count in enumerate(later_readings_counts):
+        if not later_count:
+            continue
+
+        count = readings_counts[slot] + later_count
+        if readings_counts[slot]:
+            dbm_ant_row[slot] += (
+                (later_dbm_ant_row[slot] - dbm_ant_row[slot]) * later_count / count
+            )
+        else:
+            dbm_ant_row[slot] = later_dbm_ant_row[slot]
+
+        readings_counts[slot] = count
+
+
+def _merge_max(
+    dbm_ant_row: typing.MutableSequence[float],
+    readings_counts: typing.MutableSequence[int],
+    later_dbm_ant_row: typing.Sequence[float],
+    later_readings_counts: typing.Sequence[int],
+) -> None:
+    """Merges a later partial aggregate, keeping the max reading of every slot"""
+
+    for slot, later_count in enumerate(later_readings_counts):
+        if later_count and (
+            not readings_counts[slot] or later_dbm_ant_row[slot] > dbm_ant_row[slot]
+        ):
+            dbm_ant_row[slot] = later_dbm_ant_row[slot]
+
+        readings_counts[slot] += later_count
+
+
+def _merge_min(
+    dbm_ant_row: typing.MutableSequence[float],
+    readings_counts: typing.MutableSequence[int],
+    later_dbm_ant_row: typing.Sequence[float],
+    later_readings_counts: typing.Sequence[int],
+) -> None:
+    """Merges a later partial aggregate, keeping the min reading of every slot"""
+
+    for slot, later_count in enumerate(later_readings_counts):
+        if later_count and (
+            not readings_counts[slot] or later_dbm_ant_row[slot] < dbm_ant_row[slot]
+        ):
+            dbm_ant_row[slot] = later_dbm_ant_row[slot]
+
+        readings_counts[slot] += later_count
+
+
+READING_REDUCERS: typing.Dict[str, ReadingReducer] = {
+    constants.FIRST_REDUCTION: reduce_first,
+    constants.LAST_REDUCTION: reduce_last,
+    constants.MEAN_REDUCTION: reduce_mean,
+    constants.MAX_REDUCTION: reduce_max,
+    constants.MIN_REDUCTION: reduce_min,
+}
+
+AGGREGATE_MERGERS: typing.Dict[str, AggregateMerger] = {
+    constants.FIRST_REDUCTION: _merge_first,
+    constants.LAST_REDUCTION: _merge_last,
+    constants.MEAN_REDUCTION: _merge_mean,
+    constants.MAX_REDUCTION: _merge_max,
+    constants.MIN_REDUCTION: _merge_min,
+}
@@ -0,0 +1,189 @@
+"""Collects the timings and counters of a run
+
+The time spent in every stage of a run is accumulated, together with counters of the
+processed records, and can be written as a JSON report. The stages can be nested, e.g.
+the time of "hdf5_lookup" is also part of the time of "aggregate".
+
+When no RunStats is used, the instrumented code only checks that it's None, so the
+instrumentation has a negligible overhead when it's disabled.
+
+This file can be imported as a module and contains the following classes:
+    * RunStats - accumulates the timings and counters of a run
+
+And the following functions:
+    * measure(stats, stage) - returns a context manager that measures a stage, or does
+    nothing when stats is None
+"""
+
+import collections
+import contextlib
+import json
+import time
+import types
+import typing
+
+# Reused when the stats are disabled:
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class _StageTimer:
+    """Context manager that adds the time spent inside it to a stage"""
+
+    __slots__ = ("_timings", "_stage", "_start")
+
+    def __init__(self, timings: typing.Dict[str, float], stage: str):
+        self._timings: typing.Dict[str, float] = timings
+        self._stage: str = stage
+        self._start: float = 0.0
+
+    def __enter__(self) -> "_StageTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_val: typing.Optional[BaseException],
+        exc_tb: typing.Optional[types.TracebackType],
+    ) -> typing.Optional[bool]:
+        self._timings[self._stage] += time.perf_counter() - self._start
+        return False
+
+
+class RunStats:
+    """Accumulates the timings and counters of a run
+
+    Attributes
+    ----------
+    timings : typing.Dict[str, float]
+        cumulative seconds spent in every stage
+    counters : typing.Dict[str, int]
+        counters of the run, like the number of records parsed or rejected
+    """
+
+    def __init__(self):
+        self.timings: typing.Dict[str, float] = collections.defaultdict(float)
+        self.counters: typing.Dict[str, int] = collections.defaultdict(int)
+
+    def measure(self, stage: str) -> _StageTimer:
+        """Returns a context manager that adds the time spent inside it to a stage
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage
+
+        Returns
+        -------
+        _StageTimer
+            the context manager.
+        """
+
+        return _StageTimer(self.timings, stage)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Adds time to a stage
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage
+        seconds : float
+            The time spent in the stage
+        """
+
+        self.timings[stage] += seconds
+
+    def increment(self, counter: str, count: int = 1) -> None:
+        """Increments a counter
+
+        Parameters
+        ----------
+        counter : str
+            The name of the counter
+        count : int
+            The increment
+        """
+
+        self.counters[counter] += count
+
+    def set_counter(self, counter: str, value: int) -> None:
+        """Sets the value of a counter
+
+        Parameters
+        ----------
+        counter : str
+            The name of the counter
+        value : int
+            The value of the counter
+        """
+
+        self.counters[counter] = value
+
+    def update_peak(self, counter: str, value: int) -> None:
+        """Keeps in a counter the max value seen
+
+        Parameters
+        ----------
+        counter : str
+            The name of the counter
+        value : int
+            The current value
+        """
+
+        if value > self.counters[counter]:
+            self.counters[counter] = value
+
+    def as_dict(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Returns the timings and counters as a dict
+
+        Returns
+        -------
+        typing.Dict[str, typing.Dict[str, typing.Any]]
+            the timings, in seconds, and the counters, sorted by name.
+        """
+
+        return {
+            "timings_s": {
+                stage: round(seconds, 6)
+                for stage, seconds in sorted(self.timings.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write(self, stats_file_path: str) -> None:
+        """Writes the timings and counters to a JSON file
+
+        Parameters
+        ----------
+        stats_file_path : str
+            The path of the JSON file
+        """
+
+        with open(stats_file_path, "w") as stats_file:
+            json.dump(self.as_dict(), stats_file, indent=4)
+
+
+def measure(
+    stats: typing.Optional[RunStats], stage: str
+) -> typing.ContextManager[typing.Any]:
+    """Returns a context manager that measures a stage, when the stats are enabled
+
+    Parameters
+    ----------
+    stats : typing.Optional[RunStats]
+        The stats of the run, or None when they are disabled
+    stage : str
+        The name of the stage
+
+    Returns
+    -------
+    typing.ContextManager[typing.Any]
+        a context manager that adds the time spent inside it to the stage, or that does
+        nothing when `stats` is None.
+    """
+
+    if stats is None:
+        return _NULL_TIMER
+
+    return stats.measure(stage)
@@ -0,0 +1,350 @@
+"""Provides the storage of the beacons records in many JSON files, partitioned by a key
+
+A single results file has to be written by one writer, and read by one reader. Here
+the records are written to many shards, partitioned by the hash of their BeaconId, or
+by the hour or the day of their timestamp. Every shard is written by its own
+`OutputProcessor`, with its own buffer and writer thread, and it's a valid file in the
+selected output format, so the shards can be read in parallel by downstream jobs.
+
+The shards partitioned by time are open while they receive records: when a new one is
+opened and too many are open, the least recently used one is closed, and it's reopened
+at the position where it was closed if it receives a record later. So a run over a long
+campaign keeps a bounded number of writer threads and open files.
+
+Once all the shards are written, a manifest lists them, with the number of records
+and the range of BeaconIds and of timestamps of every shard. Example:
+{
+    "format": "ndjson",
+    "shard_by": "hour",
+    "records": 1234,
+    "shards": [
+        {
+            "file": "results-2016-11-22T09.ndjson",
+            "records": 1234,
+            "beacon_ids": [100, 399],
+            "timestamps": ["2016-11-22T09:00:00.000Z", "2016-11-22T09:59:00.000Z"]
+        }
+    ]
+}
+
+This file can be imported as a module and contains the following classes:
+    * ShardedOutputProcessor - provides storage of the beacons data in many JSON files
+"""
+
+import collections
+import json
+import logging
+import os
+import typing
+
+from src import constants
+from src import timestamps
+from src.matrix_writers import MatrixWriter
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+
+NANOSECONDS_PER_HOUR = 3600 * timestamps.NANOSECONDS_PER_SECOND
+NANOSECONDS_PER_DAY = timestamps.SECONDS_PER_DAY * timestamps.NANOSECONDS_PER_SECOND
+
+
+class ShardedOutputProcessor(OutputProcessor):
+    """A class used for the storage of the beacons data in many JSON files
+
+    The shards partitioned by the hash of the BeaconId are created when the processor
+    is initialized, and the ones partitioned by time, when their first record is
+    received.
+
+    Attributes
+    ----------
+    MAX_OPEN_TIME_SHARDS : int
+        max number of shards partitioned by time that are open at once.
+    """
+
+    MAX_OPEN_TIME_SHARDS = 16
+
+    def __init__(
+        self,
+        output_directory_path: str,
+        results_file_name: str,
+        shard_by: str,
+        shards_count: int = constants.DEFAULT_SHARDS_COUNT,
+        output_format: str = constants.PRETTY_OUTPUT_FORMAT,
+        matrix_writers: typing.Optional[typing.List[MatrixWriter]] = None,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        output_directory_path : str
+            The directory where the shards, and the manifest, are created.
+        results_file_name : str
+            The name of the results file, that the names of the shards are derived
+            from, e.g. "results-00003-of-00008.json" or "results-2016-11-22T09.json".
+        shard_by : str
+            One of constants.SHARD_KEYS: the records are partitioned by the hash of
+            their BeaconId, or by the hour or the day of their timestamp.
+        shards_count : int
+            Number of shards partitioned by the hash of the BeaconId.
+        output_format : str
+            Either constants.PRETTY_OUTPUT_FORMAT, constants.COMPACT_OUTPUT_FORMAT or
+            constants.NDJSON_OUTPUT_FORMAT. Every shard is written in this format.
+        matrix_writers : typing.Optional[typing.List[MatrixWriter]]
+            Writers that also store every record as a row of a binary matrix.
+        stats : typing.Optional[RunStats]
+            Collects the time spent serializing and writing the records, and the
+            number of bytes written. When None, they are not collected.
+        """
+
+        super().__init__(
+            os.path.join(output_directory_path, constants.MANIFEST_FILE_NAME),
+            output_format,
+            matrix_writers,
+            False,
+            stats,
+        )
+        logging.debug(
+            "%s.__init__(shard_by=%s, shards_count=%s)",
+            self.__class__.__name__,
+            shard_by,
+            shards_count,
+        )
+        self._output_directory_path: str = output_directory_path
+        self._results_file_name, self._results_file_extension = os.path.splitext(
+            results_file_name
+        )
+        self._shard_by: str = shard_by
+        self._shards_count: int = shards_count
+        # The open shards, from the least to the most recently used:
+        self._shards: typing.OrderedDict[
+            typing.Any, OutputProcessor
+        ] = collections.OrderedDict()
+        # The state of every closed shard, to reopen it where it was closed:
+        self._closed_shards: typing.Dict[typing.Any, typing.Dict[str, int]] = {}
+        # The number of records, and the min and max BeaconId and epoch nanoseconds,
+        # of every shard:
+        self._shards_ranges: typing.Dict[typing.Any, typing.List[int]] = {}
+        self._initialized: bool = False
+
+    def initialize(self) -> None:
+        """Creates the shards partitioned by the hash of the BeaconId"""
+
+        logging.debug("%s.initialize()", self.__class__.__name__)
+        self._initialized = True
+        for matrix_writer in self._matrix_writers:
+            matrix_writer.initialize()
+
+        if self._shard_by == constants.SHARD_BY_BEACON:
+            for shard_index in range(self._shards_count):
+                self._open_shard(shard_index)
+
+    def checkpoint(self) -> typing.Dict[str, int]:
+        """The sharded results don't support checkpoints"""
+
+        raise ValueError("The sharded results don't support checkpoints")
+
+    def resume(self, output_state: typing.Dict[str, int]) -> None:
+        """The sharded results don't support checkpoints"""
+
+        raise ValueError("The sharded results can't be resumed from a checkpoint")
+
+    def flush(self) -> None:
+        """Writes the buffered records of every shard to its file"""
+
+        logging.debug("%s.flush()", self.__class__.__name__)
+        for shard in self._shards.values():
+            shard.flush()
+
+    def close(self) -> None:
+        """Closes every shard, and writes the manifest"""
+
+        logging.debug("%s.close()", self.__class__.__name__)
+        if not self._initialized:
+            return
+
+        self._initialized = False
+        close_error: typing.Optional[BaseException] = None
+        for shard in self._shards.values():
+            try:
+                shard.close()
+            except BaseException as error:
+                logging.exception("Error:")
+                close_error = close_error or error
+
+        for matrix_writer in self._matrix_writers:
+            matrix_writer.close()
+
+        if close_error is not None:
+            raise close_error
+
+        self._write_manifest()
+
+    def persist_record(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> None:
+        """Appends the received record to its shard
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+        """
+
+        self._results_records_count += 1
+        # The timestamps of the records were formatted from their epoch nanoseconds,
+        # so they're already in the cache of the parsed timestamps:
+        beacon_id, timestamp = record["beacon"].split(", ", 1)
+        beacon_id = int(beacon_id)
+        epoch_ns = timestamps.parse_timestamp(timestamp)
+        if self._shard_by == constants.SHARD_BY_BEACON:
+            shard_key = beacon_id % self._shards_count
+        elif self._shard_by == constants.SHARD_BY_HOUR:
+            shard_key = epoch_ns // NANOSECONDS_PER_HOUR * NANOSECONDS_PER_HOUR
+        else:
+            shard_key = epoch_ns // NANOSECONDS_PER_DAY * NANOSECONDS_PER_DAY
+
+        shard = self._shards.get(shard_key)
+        if shard is None:
+            shard = self._open_shard(shard_key)
+        elif self._shard_by != constants.SHARD_BY_BEACON:
+            self._shards.move_to_end(shard_key)
+
+        shard.persist_record(record)
+        shard_ranges = self._shards_ranges[shard_key]
+        if shard_ranges[0] == 0:
+            shard_ranges[1:] = [beacon_id, beacon_id, epoch_ns, epoch_ns]
+        else:
+            shard_ranges[1] = min(shard_ranges[1], beacon_id)
+            shard_ranges[2] = max(shard_ranges[2], beacon_id)
+            shard_ranges[3] = min(shard_ranges[3], epoch_ns)
+            shard_ranges[4] = max(shard_ranges[4], epoch_ns)
+
+        shard_ranges[0] += 1
+        for matrix_writer in self._matrix_writers:
+            matrix_writer.persist_record(record)
+
+    def _get_shard_file_name(self, shard_key: int) -> str:
+        """Gets the name of the file of a shard
+
+        Parameters
+        ----------
+        shard_key : int
+            The index of a shard partitioned by the hash of the BeaconId, or the epoch
+            nanoseconds of the start of the hour or the day of a shard partitioned by
+            time
+
+        Returns
+        -------
+        str
+            the name of the file.
+        """
+
+        if self._shard_by == constants.SHARD_BY_BEACON:
+            suffix = f"{shard_key:05d}-of-{self._shards_count:05d}"
+        elif self._shard_by == constants.SHARD_BY_HOUR:
+            suffix = timestamps.format_timestamp(shard_key)[:13]
+        else:
+            suffix = timestamps.format_timestamp(shard_key)[:10]
+
+        return f"{self._results_file_name}-{suffix}{self._results_file_extension}"
+
+    def _open_shard(self, shard_key: int) -> OutputProcessor:
+        """Creates the file of a shard, with its own writer thread
+
+        A shard that was closed is reopened at the position where it was closed. When
+        too many shards partitioned by time are open, the least recently used one is
+        closed first.
+
+        Parameters
+        ----------
+        shard_key : int
+            The index of a shard partitioned by the hash of the BeaconId, or the epoch
+            nanoseconds of the start of the hour or the day of a shard partitioned by
+            time
+
+        Returns
+        -------
+        OutputProcessor
+            the processor that writes the shard.
+        """
+
+        if (
+            self._shard_by != constants.SHARD_BY_BEACON
+            and len(self._shards) >= self.MAX_OPEN_TIME_SHARDS
+        ):
+            cold_shard_key, cold_shard = self._shards.popitem(last=False)
+            logging.debug("Closing the least recently used shard: %s", cold_shard_key)
+            self._closed_shards[cold_shard_key] = cold_shard.checkpoint()
+            cold_shard.close()
+
+        shard = OutputProcessor(
+            os.path.join(
+                self._output_directory_path, self._get_shard_file_name(shard_key)
+            ),
+            self._output_format,
+            pipelined=True,
+            stats=self._stats,
+        )
+        shard_state = self._closed_shards.pop(shard_key, None)
+        if shard_state is None:
+            shard.initialize()
+            self._shards_ranges[shard_key] = [0, 0, 0, 0, 0]
+        else:
+            shard.resume(shard_state)
+
+        self._shards[shard_key] = shard
+        return shard
+
+    def _write_manifest(self) -> None:
+        """Writes the manifest, with the records and the keys ranges of every shard"""
+
+        shards = []
+        for shard_key in sorted(self._shards_ranges):
+            records_count, min_id, max_id, min_epoch_ns, max_epoch_ns = (
+                self._shards_ranges[shard_key]
+            )
+            shard = {
+                "file": self._get_shard_file_name(shard_key),
+                "records": records_count,
+                "beacon_ids": None,
+                "timestamps": None,
+            }
+            if records_count:
+                shard["beacon_ids"] = [min_id, max_id]
+                shard["timestamps"] = [
+                    timestamps.format_timestamp(min_epoch_ns),
+                    timestamps.format_timestamp(max_epoch_ns),
+                ]
+
+            shards.append(shard)
+
+        manifest = {
+            "format": self._output_format,
+            "shard_by": self._shard_by,
+            "records": self._results_records_count,
+            "shards": shards,
+        }
+        with open(self._output_file_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+            manifest_file.write(os.linesep)
+
+        if self._stats is not None:
+            self._stats.set_counter("records_written", self._results_records_count)
+            self._stats.set_counter(
+                "bytes_written",
+                sum(
+                    os.path.getsize(
+                        os.path.join(self._output_directory_path, shard["file"])
+                    )
+                    for shard in shards
+                ),
+            )
+            self._stats.set_counter("shards", len(shards))
+
+        logging.info(
+            "In total, there were written '%s' records to %s shards, listed in the "
+            "manifest: '%s'",
+            self._results_records_count,
+            len(shards),
+            self._output_file_path,
+        )
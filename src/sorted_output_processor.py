@@ -0,0 +1,250 @@
+"""Provides the storage of the beacons records in a JSON file, sorted by their key
+
+The storage engines hand over the records as the beacons are completed, so the results
+file is not sorted. Here the records are sorted with an external merge sort, so the
+memory stays bounded no matter how many records are written:
+    * the records are buffered in a run, of at most a configured number of records
+    * a full run is sorted in memory, and spilled to a temporal file
+    * once all the records were received, the sorted runs are read back in chunks and
+    merged with a heap, and the merged records are written by the `OutputProcessor`
+
+The records can be sorted by BeaconId, by timestamp, or by BeaconId and timestamp. The
+records with the same sort key keep the order in which they were received.
+
+This file can be imported as a module and contains the following classes:
+    * SortedOutputProcessor - provides storage of the beacons data in a JSON file,
+    sorted by their BeaconId and/or timestamp
+"""
+
+import heapq
+import logging
+import pickle
+import tempfile
+import typing
+
+from src import constants
+from src import timestamps
+from src.matrix_writers import MatrixWriter
+from src.output_processor import OutputProcessor
+from src.run_stats import RunStats
+from src.run_stats import measure
+
+# A results record, and the key used to sort it:
+SortKey = typing.Tuple[int, ...]
+SortItem = typing.Tuple[SortKey, typing.Dict[str, typing.Any]]
+
+
+class SortedOutputProcessor(OutputProcessor):
+    """A class used for the storage of the beacons data in a JSON file, sorted
+
+    Attributes
+    ----------
+    RUN_CHUNK_SIZE : int
+        number of records of a sorted run that are pickled together, and read back
+        at once while merging the runs.
+    """
+
+    RUN_CHUNK_SIZE = 1024
+
+    def __init__(
+        self,
+        output_file_path: str,
+        sort_by: str,
+        run_size: int = constants.DEFAULT_SORT_RUN_SIZE,
+        spill_directory: typing.Optional[str] = None,
+        output_format: str = constants.PRETTY_OUTPUT_FORMAT,
+        matrix_writers: typing.Optional[typing.List[MatrixWriter]] = None,
+        pipelined: bool = False,
+        stats: typing.Optional[RunStats] = None,
+    ):
+        """
+        Parameters
+        ----------
+        output_file_path : str
+            Full file path where should be created the output JSON file for stores the
+            beacons associated antennas readings.
+        sort_by : str
+            One of constants.SORT_KEYS: the records are sorted by BeaconId, by
+            timestamp, or by BeaconId and timestamp.
+        run_size : int
+            Max number of records kept in memory, before sort them and spill them to
+            a temporal file.
+        spill_directory : typing.Optional[str]
+            Directory where the sorted runs are stored. When None, the system's
+            temporal directory is used.
+        output_format : str
+            Either constants.PRETTY_OUTPUT_FORMAT, constants.COMPACT_OUTPUT_FORMAT or
+            constants.NDJSON_OUTPUT_FORMAT.
+        matrix_writers : typing.Optional[typing.List[MatrixWriter]]
+            Writers that also store every record as a row of a binary matrix.
+        pipelined : bool
+            When True, the batches of records are serialized and written to the file
+            by a writer thread.
+        stats : typing.Optional[RunStats]
+            Collects the time spent sorting, merging and writing the records. When
+            None, they are not collected.
+        """
+
+        super().__init__(
+            output_file_path, output_format, matrix_writers, pipelined, stats
+        )
+        logging.debug(
+            "%s.__init__(sort_by=%s, run_size=%s, spill_directory=%s)",
+            self.__class__.__name__,
+            sort_by,
+            run_size,
+            spill_directory,
+        )
+        self._sort_by: str = sort_by
+        self._run_size: int = run_size
+        self._spill_directory: typing.Optional[str] = spill_directory
+        self._run: typing.List[SortItem] = []
+        self._run_files: typing.List[typing.BinaryIO] = []
+
+    def persist_record(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> None:
+        """Buffers the received record in the current run
+
+        The record is written to the file once all the records were received, in
+        the order of its sort key.
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+        """
+
+        self._results_records_count += 1
+        self._run.append((self._get_sort_key(record), record))
+        if len(self._run) >= self._run_size:
+            self._spill_run()
+
+    def close(self) -> None:
+        """Merges the sorted runs into the file, and closes it"""
+
+        logging.debug("%s.close()", self.__class__.__name__)
+        try:
+            if self._json_results_file is not None:
+                self._merge_runs()
+        finally:
+            for run_file in self._run_files:
+                run_file.close()
+
+            self._run_files = []
+            super().close()
+
+    def _get_sort_key(
+        self, record: typing.Dict[str, typing.Union[str, typing.List[float]]]
+    ) -> SortKey:
+        """Gets the key used to sort a record
+
+        Parameters
+        ----------
+        record : typing.Dict[str, typing.Union[str, typing.List[float]]]
+            Contains for a combination of 'BeaconId' and 'timestamp', the list of
+            associated 'dbm_ant'.
+
+        Returns
+        -------
+        SortKey
+            the BeaconId, the epoch nanoseconds of the timestamp, or both, as selected
+            by the sort order.
+        """
+
+        # The timestamps of the records were formatted from their epoch nanoseconds,
+        # so they're already in the cache of the parsed timestamps:
+        beacon_id, timestamp = record["beacon"].split(", ", 1)
+        if self._sort_by == constants.SORT_BY_BEACON:
+            return (int(beacon_id),)
+
+        epoch_ns = timestamps.parse_timestamp(timestamp)
+        if self._sort_by == constants.SORT_BY_TIME:
+            return (epoch_ns,)
+
+        return int(beacon_id), epoch_ns
+
+    def _spill_run(self) -> None:
+        """Sorts the current run, and writes it to a temporal file in chunks"""
+
+        with measure(self._stats, "sort_runs"):
+            # The sort is stable, so the records with the same key keep the order in
+            # which they were received:
+            self._run.sort(key=lambda sort_item: sort_item[0])
+            run_file = tempfile.TemporaryFile(dir=self._spill_directory)
+            self._run_files.append(run_file)
+            for start in range(0, len(self._run), self.RUN_CHUNK_SIZE):
+                pickle.dump(
+                    self._run[start : start + self.RUN_CHUNK_SIZE],
+                    run_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+        logging.debug(
+            "Spilled to disk the sorted run #%s with %s records",
+            len(self._run_files),
+            len(self._run),
+        )
+        self._run = []
+
+    def _read_run(self, run_file: typing.BinaryIO) -> typing.Iterator[SortItem]:
+        """Reads back a sorted run, a chunk at a time
+
+        Parameters
+        ----------
+        run_file : typing.BinaryIO
+            The temporal file of the run
+
+        Yields
+        ------
+        SortItem
+            the sort key and the record, in order.
+        """
+
+        run_file.seek(0)
+        while True:
+            try:
+                chunk = pickle.load(run_file)
+            except EOFError:
+                return
+
+            yield from chunk
+
+    def _merge_runs(self) -> None:
+        """Writes the records of all the runs to the file, in the order of their keys
+
+        When all the records fit in a single run, it's sorted in memory and written
+        without touching the disk. Otherwise, the last run is spilled too, and the
+        runs are merged with a heap, holding a chunk of every run in memory.
+        """
+
+        if self._run_files and self._run:
+            self._spill_run()
+
+        if self._run_files:
+            sorted_runs = [self._read_run(run_file) for run_file in self._run_files]
+        else:
+            with measure(self._stats, "sort_runs"):
+                self._run.sort(key=lambda sort_item: sort_item[0])
+
+            sorted_runs = [iter(self._run)]
+
+        if self._stats is not None:
+            self._stats.set_counter("sorted_runs_spilled", len(self._run_files))
+
+        logging.info(
+            "Writing the %s records sorted by '%s', merging %s sorted runs",
+            self._results_records_count,
+            self._sort_by,
+            len(sorted_runs),
+        )
+        # heapq.merge() breaks the ties by the order of the runs, so the merge is
+        # stable too:
+        with measure(self._stats, "merge_runs"):
+            for _, record in heapq.merge(
+                *sorted_runs, key=lambda sort_item: sort_item[0]
+            ):
+                self._buffer_record(record)
+
+        self._run = []
@@ -0,0 +1,118 @@
+"""Provides the conversion of the ISO-8601 timestamps of the readings into integers
+
+A beacon is identified by its BeaconId and the instant of its timestamp, and not by the
+timestamp string, so "2016-11-22T09:47:00.00Z" and "2016-11-22T09:47:00.000Z" identify
+the same beacon. The instants are represented as the number of nanoseconds since the
+Unix epoch, in UTC. The timestamps without a UTC offset are considered in UTC.
+
+The input files repeat the same timestamp strings over and over, so the results of the
+conversions are cached: every distinct timestamp string is parsed only once, and all
+the beacons with the same instant share the same int and the same display string.
+
+This file can be imported as a module and contains the following functions:
+    * parse_timestamp(timestamp) - converts an ISO-8601 timestamp into epoch nanoseconds
+    * format_timestamp(epoch_ns) - formats epoch nanoseconds as an ISO-8601 timestamp
+"""
+
+import datetime
+import functools
+import re
+import typing
+
+CACHE_SIZE = 64 * 1024
+NANOSECONDS_PER_SECOND = 1000000000
+SECONDS_PER_DAY = 24 * 60 * 60
+
+TIMESTAMP_PATTERN = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?"
+    r"(?:(Z)|([+-])(\d{2}):?(\d{2}))?"
+)
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_timestamp(timestamp: str) -> typing.Optional[int]:
+    """Converts an ISO-8601 timestamp into the nanoseconds since the Unix epoch
+
+    Parameters
+    ----------
+    timestamp : str
+        A timestamp like "2016-11-22T09:47:00.000Z". The fraction of second, and the
+        UTC offset, are optional.
+
+    Returns
+    -------
+    typing.Optional[int]
+        the nanoseconds since the Unix epoch, or None if the timestamp is not a valid
+        ISO-8601 timestamp.
+    """
+
+    match = TIMESTAMP_PATTERN.fullmatch(timestamp)
+    if match is None:
+        return None
+
+    (
+        year,
+        month,
+        day,
+        hour,
+        minute,
+        second,
+        fraction,
+        _,
+        offset_sign,
+        offset_hours,
+        offset_minutes,
+    ) = match.groups()
+    try:
+        days = datetime.date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        return None
+
+    hour, minute, second = int(hour), int(minute), int(second)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+
+    seconds = (days - _EPOCH_ORDINAL) * SECONDS_PER_DAY + hour * 3600 + minute * 60
+    seconds += second
+    if offset_sign is not None:
+        offset = int(offset_hours) * 3600 + int(offset_minutes) * 60
+        seconds += -offset if offset_sign == "+" else offset
+
+    nanoseconds = int(fraction.ljust(9, "0")) if fraction else 0
+    return seconds * NANOSECONDS_PER_SECOND + nanoseconds
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def format_timestamp(epoch_ns: int) -> str:
+    """Formats the nanoseconds since the Unix epoch as an ISO-8601 timestamp in UTC
+
+    The fraction of second has millisecond precision, unless the instant requires
+    more digits.
+
+    Parameters
+    ----------
+    epoch_ns : int
+        The nanoseconds since the Unix epoch
+
+    Returns
+    -------
+    str
+        a timestamp like "2016-11-22T09:47:00.000Z".
+    """
+
+    seconds, nanoseconds = divmod(epoch_ns, NANOSECONDS_PER_SECOND)
+    instant = _EPOCH + datetime.timedelta(seconds=seconds)
+    if nanoseconds % 1000000 == 0:
+        fraction = f"{nanoseconds // 1000000:03d}"
+    elif nanoseconds % 1000 == 0:
+        fraction = f"{nanoseconds // 1000:06d}"
+    else:
+        fraction = f"{nanoseconds:09d}"
+
+    return (
+        f"{instant.year:04d}-{instant.month:02d}-{instant.day:02d}T"
+        f"{instant.hour:02d}:{instant.minute:02d}:{instant.second:02d}.{fraction}Z"
+    )
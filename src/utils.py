@@ -7,13 +7,20 @@ This file can be imported as a module and contains the following functions:
     * init_argparse() - initialize an ArgParser with the allowed arguments, and
     description message
     * config_logger(args_namespace) - Configures the global logger
-    * validate_input_file_path(args) - verifies that the input file path is valid, and
-    that the user has read permission on it
+    * validate_input_file_paths(args) - expands the glob patterns of the input files,
+    and verifies that the input file paths are valid, and that the user has read
+    permission on them
     * validate_output_directory_path(args) - verifies that the output directory is
     valid, and that the user has write permission to it
+    * validate_antenna_schema(args) - resolves the expected antennas, the default
+    dbm_ant value and the policy for unknown antennas, from the command line or from a
+    configuration file, and verifies them
+    * validate_options(args) - verifies that the selected options can be combined
 """
 
 import argparse
+import glob
+import json
 import logging
 import os
 import typing
@@ -38,10 +45,333 @@ def init_argparse() -> argparse.ArgumentParser:
     parser.add_argument("-v", "--verbose", action="store_true", help="be verbose")
 
     parser.add_argument(
-        "input_file_path",
+        "--fast-decoder",
+        action="store_true",
+        help="decode the lines with a scanner for the fixed schema of the JSON "
+        "documents, and use json and pydantic only for the lines it can't decode",
+    )
+
+    parser.add_argument(
+        "--input-format",
+        choices=constants.INPUT_FORMATS,
+        default=constants.LINES_INPUT_FORMAT,
+        help="'lines' when the input JSON file has a JSON document per line, or "
+        "'stream' to read incrementally its top level JSON array, no matter how it's "
+        "laid out in lines. Without --engine, 'stream' is used when the execution "
+        "planner finds JSON documents that aren't in their own lines "
+        "(default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="memory-map the input JSON file, and split and decode its lines on the "
+        "raw bytes. Requires the 'lines' input format",
+    )
+
+    parser.add_argument(
+        "--decompression-threads",
+        metavar="N",
+        type=int,
+        default=constants.DEFAULT_DECOMPRESSION_THREADS,
+        help="number of threads that decompress in parallel the members of a gzip "
+        "input JSON file. The gzip, bz2 and xz input files are detected by their "
+        "magic bytes, and decompressed while they're parsed (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="read and parse the input JSON file, and serialize and write the "
+        "results, in background threads connected by bounded queues, while the "
+        "readings are aggregated. Requires the 'lines' input format",
+    )
+
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="keep reading the lines appended to the input JSON file, like "
+        "'tail -f', writing every beacon vector as soon as it's complete, until the "
+        "closing ']' is found, --idle-timeout expires, or Ctrl+C is pressed. "
+        f"Supported by the '{constants.HDF5_ENGINE}' and '{constants.MEMORY_ENGINE}' "
+        "engines, with the 'lines' input format",
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        metavar="SECONDS",
+        type=float,
+        default=constants.DEFAULT_FOLLOW_POLL_INTERVAL,
+        help="seconds between two polls of the input JSON file for new lines, with "
+        "--follow (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--idle-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=None,
+        help="stop following the input JSON file when no lines were appended to it "
+        "in SECONDS (default: follow it until it's closed or Ctrl+C is pressed)",
+    )
+
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=constants.ENGINES,
+        default=None,
+        help="the storage engine used to aggregate the beacons readings. The "
+        f"'{constants.LITE_ENGINE}' engine aggregates in memory with the fast "
+        "decoder, and only imports the standard library while the lines can be "
+        "decoded by it (default: chosen by the execution planner, from a sample of "
+        "the input and the available memory and CPUs)",
+    )
+
+    parser.add_argument(
+        "--small-input-threshold",
+        metavar="MEGABYTES",
+        type=float,
+        default=constants.DEFAULT_SMALL_INPUT_THRESHOLD_MB,
+        help="size of the input JSON file below which the execution planner selects "
+        f"the '{constants.LITE_ENGINE}' engine (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--memory-budget",
+        metavar="MEGABYTES",
+        type=int,
+        default=None,
+        help="max memory used by the 'memory' engine for the beacons that are not "
+        "complete yet, before spill them to disk (default: half the available "
+        "memory when chosen by the execution planner, "
+        f"{constants.DEFAULT_MEMORY_BUDGET_MB} with --engine)",
+    )
+
+    parser.add_argument(
+        "--spill-directory",
+        metavar="SPILL_DIRECTORY",
+        type=str,
+        default=None,
+        help="the directory where the 'memory' engine spills the beacons to disk, "
+        "and where the 'partitioned' engine stores its partition files (default: the "
+        "system's temporal directory)",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        metavar="N",
+        type=int,
+        default=None,
+        help="number of worker processes used by the 'memory' engine to parse the "
+        "input JSON file (default: chosen by the execution planner from the size of "
+        f"the input and the available CPUs, {constants.DEFAULT_WORKERS_COUNT} with "
+        "--engine)",
+    )
+
+    parser.add_argument(
+        "--partitions",
+        metavar="PARTITIONS",
+        type=int,
+        default=None,
+        help="number of partition files used by the 'partitioned' engine "
+        "(default: chosen by the execution planner so every partition fits in the "
+        f"memory budget, at least {constants.DEFAULT_PARTITIONS_COUNT})",
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=constants.OUTPUT_FORMATS,
+        default=constants.PRETTY_OUTPUT_FORMAT,
+        help="format of the output file: 'pretty' for an indented JSON array, "
+        "'compact' for a JSON array with a record per line, or 'ndjson' for a record "
+        "per line, without the enclosing array (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--sort-by",
+        choices=constants.SORT_KEYS,
+        default=None,
+        help="write the results sorted by BeaconId, by timestamp, or by BeaconId and "
+        "timestamp, with an external merge sort of runs spilled to disk (default: in "
+        "the order in which the beacons are completed)",
+    )
+
+    parser.add_argument(
+        "--sort-run-size",
+        metavar="RECORDS",
+        type=int,
+        default=constants.DEFAULT_SORT_RUN_SIZE,
+        help="max number of records sorted in memory with --sort-by, before spill "
+        "them to disk as a sorted run. The runs are stored in --spill-directory "
+        "(default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--shard-by",
+        choices=constants.SHARD_KEYS,
+        default=None,
+        help="write the results to many files, partitioned by the hash of the "
+        "BeaconId in --shards files, or by the hour or the day of the timestamp, every "
+        f"one written by its own thread, and listed in '{constants.MANIFEST_FILE_NAME}'"
+        " with its records count and keys ranges (default: a single results file)",
+    )
+
+    parser.add_argument(
+        "--shards",
+        metavar="N",
+        type=int,
+        default=constants.DEFAULT_SHARDS_COUNT,
+        help="number of files of the results sharded by BeaconId "
+        "(default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--matrix-output",
+        action="append",
+        choices=constants.MATRIX_FORMATS,
+        default=[],
+        help="also write the beacons vectors as a binary matrix: 'npy' for NPY files "
+        "with the vectors, the beacons ids and the timestamps, or 'hdf5' for a "
+        "'results.h5' file. It can be used more than once",
+    )
+
+    parser.add_argument(
+        "--vector-dtype",
+        choices=constants.VECTOR_DTYPES,
+        default=constants.FLOAT64_VECTOR_DTYPE,
+        help="type of the dbm_ant readings stored in the beacons vectors. float32 "
+        "halves the memory of the vectors, but rounds the readings to single "
+        "precision (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--config",
+        metavar="FILE",
+        help="JSON configuration file with the antennas schema: 'antenna_ids', "
+        "'default_dbm_ant_value' and 'unknown_antennas'. The options of the command "
+        "line take precedence over it",
+    )
+
+    parser.add_argument(
+        "--antenna-ids",
+        metavar="IDS",
+        type=_parse_antenna_ids,
+        default=None,
+        help="comma separated ids of the expected antennas, in the order of the slots "
+        f"of the beacons vectors, at most {constants.MAX_ANTENNAS_COUNT} (default: "
+        f"{','.join(map(str, constants.ANTENNA_IDS))})",
+    )
+
+    parser.add_argument(
+        "--default-dbm-ant",
+        metavar="VALUE",
+        dest="default_dbm_ant_value",
+        type=_parse_number,
+        default=None,
+        help="dbm_ant value written for the antennas without readings (default: "
+        f"{constants.DEFAULT_DBM_ANT_VALUE})",
+    )
+
+    parser.add_argument(
+        "--unknown-antennas",
+        choices=constants.UNKNOWN_ANTENNAS_POLICIES,
+        default=None,
+        help="what is done with the readings of antennas that are not expected: "
+        "'drop' them, 'count' them, or count them and write them to "
+        f"'{constants.UNKNOWN_ANTENNAS_FILE_NAME}' in the output directory with "
+        "'side-file' (default: drop)",
+    )
+
+    parser.add_argument(
+        "--duplicates",
+        dest="duplicates_reduction",
+        choices=constants.REDUCTIONS,
+        default=constants.LAST_REDUCTION,
+        help="how the readings of the same antenna, for the same beacon, are "
+        "combined: keep the first or the last one, their mean, or their max or min. "
+        "A beacon vector is complete once every antenna has at least one reading "
+        "(default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--count-vector",
+        action="store_true",
+        help="also write, in every results record, a 'counts' vector with the number "
+        "of readings received for every antenna",
+    )
+
+    parser.add_argument(
+        "--allowed-lateness",
+        metavar="SECONDS",
+        type=float,
+        default=None,
+        help="seconds that a reading can be late, behind the max timestamp seen so "
+        "far. The beacons older than this watermark are written with the default "
+        "value for their absent antennas and removed from the staging storage, and "
+        "the later readings of them are counted and ignored. Supported by the "
+        f"'{constants.HDF5_ENGINE}' and '{constants.MEMORY_ENGINE}' engines "
+        "(default: keep every beacon until the end of the input JSON file)",
+    )
+
+    parser.add_argument(
+        "--checkpoint-dir",
+        metavar="DIR",
+        help="save periodically to DIR a checkpoint with the position in the input "
+        "JSON file, the beacons that are not complete yet, and the position in the "
+        "results file, so an interrupted run can be resumed with --resume. "
+        f"Supported by the '{constants.HDF5_ENGINE}' and '{constants.MEMORY_ENGINE}' "
+        "engines",
+    )
+
+    parser.add_argument(
+        "--checkpoint-interval",
+        metavar="SECONDS",
+        type=float,
+        default=constants.DEFAULT_CHECKPOINT_INTERVAL,
+        help="min number of seconds between two checkpoints (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from the last checkpoint saved in the "
+        "directory of --checkpoint-dir",
+    )
+
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="write to FILE a JSON report with the time spent in every stage of the "
+        "run, and counters of the processed records and bytes",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="run with cProfile, log the functions with the highest cumulative time, "
+        f"and dump the profile to '{constants.PROFILE_FILE_NAME}' in the output "
+        "directory",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="with more than one input JSON file, cache in DIR the partial aggregate "
+        "of every file, so the files that didn't change since the previous run are "
+        "not read again",
+    )
+
+    parser.add_argument(
+        "input_file_paths",
         metavar="INPUT_FILE_PATH",
         type=str,
-        help="the path to the input JSON file",
+        nargs="+",
+        help="the path to the input JSON file. More than one path, or glob patterns "
+        "like 'logs/*.json', can be given, and then the files are aggregated by the "
+        f"'{constants.MEMORY_ENGINE}' engine in the given order, as if they were "
+        "concatenated",
     )
 
     parser.add_argument(
@@ -55,6 +385,53 @@ def init_argparse() -> argparse.ArgumentParser:
     return parser
 
 
+def _parse_antenna_ids(value: str) -> typing.List[int]:
+    """Parses the comma separated ids of the expected antennas
+
+    Parameters
+    ----------
+    value : str
+        The value of the command line's argument
+
+    Returns
+    -------
+    typing.List[int]
+        the antennas ids.
+    """
+
+    try:
+        return [int(ant_id) for ant_id in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"'{value}' must be a comma separated list of integers"
+        )
+
+
+def _parse_number(value: str) -> typing.Union[int, float]:
+    """Parses a number, keeping it as an int when it has no decimals
+
+    Parameters
+    ----------
+    value : str
+        The value of the command line's argument
+
+    Returns
+    -------
+    typing.Union[int, float]
+        the number.
+    """
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' must be a number")
+
+
 def config_logger(args_namespace: argparse.Namespace) -> None:
     """Configures the global logger
 
@@ -76,24 +453,67 @@ def config_logger(args_namespace: argparse.Namespace) -> None:
     logging.info("The logger was successfully configured")
 
 
-def validate_input_file_path(args: argparse.Namespace) -> typing.Optional[str]:
-    """Verifies if the input file path is valid.
+def validate_input_file_paths(
+    args: argparse.Namespace,
+) -> typing.Optional[typing.List[str]]:
+    """Verifies if the input file paths are valid.
 
-    Also will verify if user has read permission on it
+    The glob patterns are expanded, in alphabetical order. Also will verify if user
+    has read permission on every input file
 
     Parameters
     ----------
     args : argparse.Namespace
         Reference to an object that have the user provided command line arguments
 
+    Returns
+    -------
+    typing.Optional[typing.List[str]]
+        The absolut file paths of the input files supplied by the user, without
+        duplicates, or None if some of them is not valid
+    """
+
+    logging.debug("validate_input_file_paths(args=%s)", args)
+    input_file_paths = []
+    for input_file_path in args.input_file_paths:
+        # A pattern that the shell didn't expand, e.g. because it was quoted:
+        if glob.escape(input_file_path) != input_file_path:
+            matched_file_paths = sorted(glob.glob(input_file_path))
+            if not matched_file_paths:
+                logging.error("No file matches the pattern '%s'!!!", input_file_path)
+                return None
+
+            input_file_paths.extend(matched_file_paths)
+        else:
+            input_file_paths.append(input_file_path)
+
+    valid_file_paths = []
+    for input_file_path in input_file_paths:
+        input_file_path = _validate_input_file_path(input_file_path)
+        if not input_file_path:
+            return None
+
+        valid_file_paths.append(input_file_path)
+
+    return list(dict.fromkeys(valid_file_paths))
+
+
+def _validate_input_file_path(input_file_path: str) -> typing.Optional[str]:
+    """Verifies if an input file path is valid.
+
+    Also will verify if user has read permission on it
+
+    Parameters
+    ----------
+    input_file_path : str
+        An input file path supplied by the user
+
     Returns
     -------
     str
         The absolut file path of the input file path supplied by the user
     """
 
-    logging.debug("validate_input_file_path(args=%s)", args)
-    input_file_path = args.input_file_path
     if not os.path.exists(input_file_path):
         logging.error("Specified file '%s' doesn't exist!!!", input_file_path)
         return None
@@ -151,3 +571,280 @@ def validate_output_directory_path(args: argparse.Namespace) -> typing.Optional[
         return None
 
     return output_directory_path
+
+
+def validate_antenna_schema(args: argparse.Namespace) -> bool:
+    """Resolves and verifies the antennas schema
+
+    The expected antennas, the default dbm_ant value and the policy for unknown
+    antennas are taken from the command line, then from the configuration file, and
+    then from the defaults in `src.constants`. The resolved values are set in `args`.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Reference to an object that have the user provided command line arguments
+
+    Returns
+    -------
+    bool
+        True if the antennas schema is valid, or False otherwise.
+    """
+
+    logging.debug("validate_antenna_schema(args=%s)", args)
+    config = {}
+    if getattr(args, "config", None):
+        try:
+            with open(args.config) as config_file:
+                config = json.load(config_file)
+        except (OSError, ValueError) as error:
+            logging.error(
+                "Unable to load the configuration file '%s': %s", args.config, error
+            )
+            return False
+
+        if not isinstance(config, dict):
+            logging.error("The configuration file must contain a JSON object")
+            return False
+
+        unknown_keys = set(config) - {
+            "antenna_ids",
+            "default_dbm_ant_value",
+            "unknown_antennas",
+        }
+        if unknown_keys:
+            logging.error(
+                "Unknown keys in the configuration file: %s", sorted(unknown_keys)
+            )
+            return False
+
+    if getattr(args, "antenna_ids", None) is None:
+        args.antenna_ids = config.get("antenna_ids", constants.ANTENNA_IDS)
+
+    if getattr(args, "default_dbm_ant_value", None) is None:
+        args.default_dbm_ant_value = config.get(
+            "default_dbm_ant_value", constants.DEFAULT_DBM_ANT_VALUE
+        )
+
+    if getattr(args, "unknown_antennas", None) is None:
+        args.unknown_antennas = config.get(
+            "unknown_antennas", constants.DROP_UNKNOWN_ANTENNAS
+        )
+
+    antenna_ids = args.antenna_ids
+    if (
+        not isinstance(antenna_ids, list)
+        or not antenna_ids
+        or not all(
+            isinstance(ant_id, int) and not isinstance(ant_id, bool)
+            for ant_id in antenna_ids
+        )
+    ):
+        logging.error("The antennas ids must be a non empty list of integers")
+        return False
+
+    if len(set(antenna_ids)) != len(antenna_ids):
+        logging.error("The antennas ids must be unique: %s", antenna_ids)
+        return False
+
+    if len(antenna_ids) > constants.MAX_ANTENNAS_COUNT:
+        logging.error(
+            "At most %s antennas are supported, but %s were configured",
+            constants.MAX_ANTENNAS_COUNT,
+            len(antenna_ids),
+        )
+        return False
+
+    if not isinstance(args.default_dbm_ant_value, (int, float)) or isinstance(
+        args.default_dbm_ant_value, bool
+    ):
+        logging.error(
+            "The default dbm_ant value must be a number: %s",
+            args.default_dbm_ant_value,
+        )
+        return False
+
+    if args.unknown_antennas not in constants.UNKNOWN_ANTENNAS_POLICIES:
+        logging.error(
+            "The policy for unknown antennas must be one of %s: %s",
+            constants.UNKNOWN_ANTENNAS_POLICIES,
+            args.unknown_antennas,
+        )
+        return False
+
+    logging.debug(
+        "Antennas schema: antenna_ids=%s, default_dbm_ant_value=%s, "
+        "unknown_antennas=%s",
+        antenna_ids,
+        args.default_dbm_ant_value,
+        args.unknown_antennas,
+    )
+    return True
+
+
+def validate_options(args: argparse.Namespace) -> bool:
+    """Verifies that the selected options can be combined
+
+    The engine and its parameters must be already chosen, and `args.compression` set
+    to the compression detected in the input JSON file, or None.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Reference to an object that have the user provided command line arguments
+
+    Returns
+    -------
+    bool
+        True if the options can be combined, or False if some of them can't.
+    """
+
+    logging.debug("validate_options(args=%s)", args)
+    if len(args.input_file_paths) > 1 and (
+        args.engine != constants.MEMORY_ENGINE
+        or args.input_format != constants.LINES_INPUT_FORMAT
+        or args.mmap
+        or args.pipeline
+        or args.follow
+        or args.allowed_lateness is not None
+        or args.checkpoint_dir is not None
+    ):
+        logging.error(
+            "More than one input JSON file is supported by the '%s' engine, with "
+            "the '%s' input format, and can't be combined with a memory-mapped "
+            "input file, the pipelined parsing, --follow, --allowed-lateness, or "
+            "the checkpoints",
+            constants.MEMORY_ENGINE,
+            constants.LINES_INPUT_FORMAT,
+        )
+        return False
+
+    if args.compression is not None and (
+        args.workers > 1
+        or args.mmap
+        or args.follow
+        or args.checkpoint_dir is not None
+        or args.decompression_threads < 1
+    ):
+        logging.error(
+            "A compressed input JSON file can't be parsed with more than one "
+            "worker process, memory-mapped, followed, or checkpointed, and it "
+            "requires at least one decompression thread"
+        )
+        return False
+
+    if args.unknown_antennas == constants.SIDE_FILE_UNKNOWN_ANTENNAS and (
+        args.workers > 1 or len(args.input_file_paths) > 1
+    ):
+        logging.error(
+            "The readings of antennas that are not expected can't be written to a "
+            "side file with more than one worker process, or input JSON file"
+        )
+        return False
+
+    if args.workers > 1 and args.engine != constants.MEMORY_ENGINE:
+        logging.error(
+            "Parsing with more than one worker process is only supported by the '%s' "
+            "engine",
+            constants.MEMORY_ENGINE,
+        )
+        return False
+
+    if args.input_format != constants.LINES_INPUT_FORMAT and (
+        args.workers > 1 or args.mmap
+    ):
+        logging.error(
+            "Parsing with more than one worker process, or a memory-mapped input "
+            "file, requires the '%s' input format",
+            constants.LINES_INPUT_FORMAT,
+        )
+        return False
+
+    if args.pipeline and (
+        args.input_format != constants.LINES_INPUT_FORMAT
+        or args.workers > 1
+        or args.mmap
+    ):
+        logging.error(
+            "The pipelined parsing requires the '%s' input format, and can't be "
+            "combined with more than one worker process, or a memory-mapped input file",
+            constants.LINES_INPUT_FORMAT,
+        )
+        return False
+
+    if args.follow and (
+        args.engine not in (constants.HDF5_ENGINE, constants.MEMORY_ENGINE)
+        or args.workers > 1
+        or args.input_format != constants.LINES_INPUT_FORMAT
+        or args.mmap
+        or args.pipeline
+    ):
+        logging.error(
+            "Following the input JSON file is supported by the '%s' and '%s' "
+            "engines, with the '%s' input format, and can't be combined with more "
+            "than one worker process, a memory-mapped input file, or the pipelined "
+            "parsing",
+            constants.HDF5_ENGINE,
+            constants.MEMORY_ENGINE,
+            constants.LINES_INPUT_FORMAT,
+        )
+        return False
+
+    if args.allowed_lateness is not None and (
+        args.allowed_lateness < 0
+        or args.engine not in (constants.HDF5_ENGINE, constants.MEMORY_ENGINE)
+        or args.workers > 1
+    ):
+        logging.error(
+            "The allowed lateness can't be negative, and it's supported by the '%s' "
+            "and '%s' engines, with one worker process",
+            constants.HDF5_ENGINE,
+            constants.MEMORY_ENGINE,
+        )
+        return False
+
+    if args.resume and args.checkpoint_dir is None:
+        logging.error("Resuming a run requires --checkpoint-dir")
+        return False
+
+    if args.checkpoint_dir is not None and (
+        args.engine not in (constants.HDF5_ENGINE, constants.MEMORY_ENGINE)
+        or args.workers > 1
+        or args.input_format != constants.LINES_INPUT_FORMAT
+        or args.mmap
+        or args.pipeline
+        or args.matrix_output
+    ):
+        logging.error(
+            "The checkpoints are supported by the '%s' and '%s' engines, with the "
+            "'%s' input format, and can't be combined with more than one worker "
+            "process, a memory-mapped input file, the pipelined parsing, or matrix "
+            "outputs",
+            constants.HDF5_ENGINE,
+            constants.MEMORY_ENGINE,
+            constants.LINES_INPUT_FORMAT,
+        )
+        return False
+
+    if args.sort_by is not None and (
+        args.sort_run_size < 1 or args.follow or args.checkpoint_dir is not None
+    ):
+        logging.error(
+            "The sort run size must be at least 1, and the sorted results can't be "
+            "combined with --follow or the checkpoints, since they're only written "
+            "once all the beacons were completed"
+        )
+        return False
+
+    if args.shard_by is not None and (
+        args.shards < 1
+        or args.sort_by is not None
+        or args.checkpoint_dir is not None
+    ):
+        logging.error(
+            "The number of shards must be at least 1, and the sharded results can't "
+            "be combined with --sort-by or the checkpoints"
+        )
+        return False
+
+    return True
@@ -0,0 +1,20 @@
+"""Tests of the extraction of the beacons vectors
+
+This package contains the following modules:
+    * conftest - fixtures to generate input JSON files, and to run the extraction
+    * test_checkpoint - resumes an interrupted run from its last checkpoint
+    * test_decoders - compares the fast decoder with json and pydantic
+    * test_engines - compares the results of every storage engine
+    * test_input_files - tests the compressed input JSON files, and the runs with many
+    input JSON files
+    * test_lines_parser - tests the parsing of the lines of the input JSON file, and its
+    counters
+    * test_memory_storage - tests that spilling partitions to disk doesn't change the
+    results of the memory engine
+    * test_options - tests the verification of the options that can't be combined
+    * test_planner - tests the sampling of the input, and the execution plans
+    * test_sharded_output - tests the results sharded by time, when more shards receive
+    records than can be open
+    * test_timestamps - tests the conversion of the timestamps into epoch nanoseconds,
+    and back
+"""
@@ -0,0 +1,107 @@
+"""Fixtures to generate input JSON files, and to run the extraction
+
+The extraction runs `bin/extract_beacons_vectors.py` in a new process, as it's run by
+the users, so every run configures its own logger and imports only the modules it
+needs.
+
+This file contains the following functions:
+    * sort_records - sorts results records, to compare the ones of different runs
+
+and the following fixtures:
+    * generated_input - writes a synthetic input JSON file, with the generator of the
+    benchmarks
+    * run_extraction - runs the extraction, and returns the results records
+"""
+
+import json
+import os
+import subprocess
+import sys
+import typing
+
+import pytest
+
+from benchmarks.generate_input import generate_input
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_PATH = os.path.join(REPOSITORY_DIR, "bin", "extract_beacons_vectors.py")
+
+
+def sort_records(
+    records: typing.List[typing.Dict[str, typing.Any]]
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Sorts results records, since every storage engine writes them in its own order
+
+    Parameters
+    ----------
+    records : typing.List[typing.Dict[str, typing.Any]]
+        The results records
+
+    Returns
+    -------
+    typing.List[typing.Dict[str, typing.Any]]
+        the records sorted by beacon, and by their contents.
+    """
+
+    return sorted(records, key=lambda record: json.dumps(record, sort_keys=True))
+
+
+@pytest.fixture
+def generated_input(tmp_path) -> typing.Callable[..., str]:
+    """Returns a function that writes a synthetic input JSON file
+
+    The function receives the number of records, and the keyword arguments of
+    `generate_input()`, and returns the path of the file.
+    """
+
+    files_count = 0
+
+    def _generate(records_count: int, **kwargs) -> str:
+        nonlocal files_count
+        files_count += 1
+        input_file_path = str(tmp_path / f"input_{files_count}.json")
+        generate_input(input_file_path, records_count, **kwargs)
+        return input_file_path
+
+    return _generate
+
+
+@pytest.fixture
+def run_extraction(tmp_path) -> typing.Callable[..., typing.List[dict]]:
+    """Returns a function that runs the extraction, and returns the results records
+
+    The function receives the paths of the input JSON files, and the extra arguments
+    of the command line. A run that fails makes the test fail.
+    """
+
+    runs_count = 0
+
+    def _run(
+        input_file_paths: typing.Union[str, typing.List[str]], *args: str
+    ) -> typing.List[dict]:
+        nonlocal runs_count
+        runs_count += 1
+        if isinstance(input_file_paths, str):
+            input_file_paths = [input_file_paths]
+
+        output_directory_path = tmp_path / f"output_{runs_count}"
+        output_directory_path.mkdir()
+        completed_process = subprocess.run(
+            [
+                sys.executable,
+                SCRIPT_PATH,
+                *args,
+                *input_file_paths,
+                str(output_directory_path),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        assert completed_process.returncode == 0, completed_process.stdout
+        results_file_path = output_directory_path / "results.json"
+        assert results_file_path.exists(), completed_process.stdout
+        with open(results_file_path) as results_file:
+            return json.load(results_file)
+
+    return _run
@@ -0,0 +1,142 @@
+"""Tests that a run interrupted after a checkpoint is resumed with the same results
+
+The interrupted run follows an input JSON file that isn't complete yet, saving a
+checkpoint after every JSON document, and it's killed once the last checkpoint covers
+the whole file. The rest of the file is then appended, and the run is resumed.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src import constants
+from src.checkpoint import CheckpointStore
+from tests.conftest import SCRIPT_PATH
+
+TIMEOUT = 60
+
+
+def wait_for_checkpoint(state_directory: str, input_offset: int) -> None:
+    """Waits until the last checkpoint was saved at a position of the input file
+
+    Parameters
+    ----------
+    state_directory : str
+        The state directory of the checkpoints
+    input_offset : int
+        The position in the input JSON file
+    """
+
+    state_file_path = os.path.join(state_directory, CheckpointStore.STATE_FILE_NAME)
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with open(state_file_path) as state_file:
+                if json.load(state_file)["input_offset"] == input_offset:
+                    return
+        except (OSError, ValueError):
+            pass
+
+        time.sleep(0.05)
+
+    raise TimeoutError(f"No checkpoint was saved at the byte {input_offset}")
+
+
+@pytest.mark.parametrize("engine", [constants.MEMORY_ENGINE, constants.HDF5_ENGINE])
+def test_interrupted_run_is_resumed(generated_input, run_extraction, tmp_path, engine):
+    complete_file_path = generated_input(1200, beacons=30, disorder_window=30)
+    expected = run_extraction(complete_file_path, "-e", engine)
+
+    with open(complete_file_path) as complete_file:
+        lines = complete_file.readlines()
+
+    input_file_path = str(tmp_path / "followed.json")
+    with open(input_file_path, "w") as input_file:
+        input_file.writelines(lines[: len(lines) // 2])
+
+    state_directory = str(tmp_path / "state")
+    output_directory_path = tmp_path / "output"
+    output_directory_path.mkdir()
+    checkpoint_args = ["-e", engine, "--checkpoint-dir", state_directory]
+    interrupted_process = subprocess.Popen(
+        [
+            sys.executable,
+            SCRIPT_PATH,
+            *checkpoint_args,
+            "--checkpoint-interval",
+            "0",
+            "--follow",
+            "--poll-interval",
+            "0.05",
+            input_file_path,
+            str(output_directory_path),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    checkpoint_offset = os.path.getsize(input_file_path)
+    try:
+        wait_for_checkpoint(state_directory, checkpoint_offset)
+    finally:
+        interrupted_process.send_signal(signal.SIGKILL)
+        interrupted_process.wait()
+
+    with open(input_file_path, "a") as input_file:
+        input_file.writelines(lines[len(lines) // 2 :])
+
+    completed_process = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT_PATH,
+            *checkpoint_args,
+            "--resume",
+            "--stats",
+            str(tmp_path / "stats.json"),
+            input_file_path,
+            str(output_directory_path),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    assert completed_process.returncode == 0, completed_process.stdout
+    assert "The run is resumed from the byte" in completed_process.stdout
+    with open(output_directory_path / "results.json") as results_file:
+        results = json.load(results_file)
+
+    assert len(results) > 0
+    assert results == expected
+    # Only the lines appended after the checkpoint were read again:
+    with open(tmp_path / "stats.json") as stats_file:
+        counters = json.load(stats_file)["counters"]
+
+    bytes_appended = os.path.getsize(input_file_path) - checkpoint_offset
+    assert counters["bytes_read"] == bytes_appended
+    # The run is complete, so its checkpoint was removed:
+    assert not os.path.exists(
+        os.path.join(state_directory, CheckpointStore.STATE_FILE_NAME)
+    )
+
+
+def test_resume_without_checkpoint_starts_from_the_beginning(
+    generated_input, run_extraction, tmp_path
+):
+    input_file_path = generated_input(1000, beacons=20)
+    state_directory = str(tmp_path / "state")
+
+    expected = run_extraction(input_file_path, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(
+        input_file_path,
+        "-e",
+        constants.MEMORY_ENGINE,
+        "--checkpoint-dir",
+        state_directory,
+        "--resume",
+    )
+
+    assert results == expected
@@ -0,0 +1,86 @@
+"""Tests that the fast decoder decodes the same readings as json and pydantic"""
+
+import json
+
+import pytest
+
+from src import decoders
+from src import models
+
+DOCUMENTS = [
+    {
+        "BeaconId": 208,
+        "ant_id": 201,
+        "dbm_ant": -92.32518086711575,
+        "timestamp": "2016-11-22T09:46:00.000Z",
+    },
+    {"BeaconId": 0, "ant_id": -1, "dbm_ant": 0, "timestamp": "2016-11-22T09:46:00Z"},
+    {"BeaconId": -7, "ant_id": 206, "dbm_ant": 1.5e-07, "timestamp": ""},
+    {"BeaconId": 2**40, "ant_id": 2, "dbm_ant": -1e300, "timestamp": "not a time"},
+]
+
+# Lines that the fast decoder leaves to json and pydantic:
+UNDECODED_LINES = [
+    # The fields aren't in the usual order:
+    '{"ant_id":201,"BeaconId":208,"dbm_ant":-92.3,"timestamp":"2016-11-22T09:46:00Z"}',
+    # Values that pydantic coerces:
+    '{"BeaconId":"208","ant_id":201,"dbm_ant":-92.3,"timestamp":"2016-11-22T09:46Z"}',
+    '{"BeaconId":208.0,"ant_id":201,"dbm_ant":-92.3,"timestamp":"2016-11-22T09:46Z"}',
+    # A string with an escape sequence:
+    '{"BeaconId":208,"ant_id":201,"dbm_ant":-92.3,"timestamp":"2016-11-22\\u005a"}',
+    # An extra field:
+    '{"BeaconId":208,"ant_id":201,"dbm_ant":-92.3,"timestamp":"2016","extra":1}',
+    # A truncated line:
+    '{"BeaconId":208,"ant_id":201,"dbm_ant":-92.3,"timestamp":"2016-11-22T09:',
+]
+
+
+def validate(document: dict) -> models.BeaconReading:
+    """Validates a decoded JSON document with pydantic, as the default path does"""
+
+    json_record = models.JSONDocumentModel(**document)
+    return models.BeaconReading(
+        json_record.beacon_id,
+        json_record.ant_id,
+        json_record.dbm_ant,
+        json_record.timestamp,
+    )
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize(
+    "json_dumps_kwargs", [{"separators": (",", ":")}, {}, {"indent": 1}]
+)
+def test_decode_line_round_trip(document, json_dumps_kwargs):
+    line = json.dumps(document, **json_dumps_kwargs)
+
+    reading = decoders.decode_line(line)
+
+    assert reading is not None
+    assert reading == validate(json.loads(line))
+    assert type(reading.dbm_ant) is float
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_decode_line_bytes_round_trip(document):
+    line = json.dumps(document).encode("utf-8")
+    buffer = b"[\n  " + line + b",\n]"
+    start = buffer.index(b"{")
+
+    reading = decoders.decode_line_bytes(buffer, start, start + len(line))
+
+    assert reading == decoders.decode_line(line.decode("utf-8"))
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_decode_document_round_trip(document):
+    reading = decoders.decode_document(json.loads(json.dumps(document)))
+
+    assert reading is not None
+    assert reading == validate(document)
+
+
+@pytest.mark.parametrize("line", UNDECODED_LINES)
+def test_lines_left_to_json_and_pydantic(line):
+    assert decoders.decode_line(line) is None
+    assert decoders.decode_line_bytes(line.encode("utf-8"), 0, len(line)) is None
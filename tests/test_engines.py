@@ -0,0 +1,91 @@
+"""Compares the results of every storage engine
+
+The input JSON files have duplicated readings, readings out of the timestamps order,
+and malformed lines, so the readings of a beacon are often received after its vector was
+complete, and must be aggregated in a new vector by every engine.
+"""
+
+import json
+
+import pytest
+
+from src import constants
+from tests.conftest import sort_records
+
+OTHER_ENGINES = [
+    engine for engine in constants.ENGINES if engine != constants.MEMORY_ENGINE
+]
+
+
+@pytest.fixture
+def duplicates_input(generated_input) -> str:
+    return generated_input(
+        6000,
+        beacons=40,
+        disorder_window=60,
+        duplicate_rate=0.2,
+        malformed_rate=0.02,
+    )
+
+
+@pytest.mark.parametrize("engine", OTHER_ENGINES)
+def test_engines_write_the_same_results(engine, duplicates_input, run_extraction):
+    expected = run_extraction(duplicates_input, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(duplicates_input, "-e", engine)
+
+    assert len(results) > 0
+    assert sort_records(results) == sort_records(expected)
+
+
+@pytest.mark.parametrize("engine", OTHER_ENGINES)
+@pytest.mark.parametrize("duplicates_reduction", constants.REDUCTIONS)
+def test_engines_reduce_the_duplicates_the_same(
+    engine, duplicates_reduction, duplicates_input, run_extraction
+):
+    args = ("--duplicates", duplicates_reduction, "--count-vector")
+    expected = run_extraction(duplicates_input, "-e", constants.MEMORY_ENGINE, *args)
+    results = run_extraction(duplicates_input, "-e", engine, *args)
+
+    assert sort_records(results) == sort_records(expected)
+
+
+def test_pipelined_parsing_counts_the_same(duplicates_input, run_extraction, tmp_path):
+    counters = []
+    for pipeline_args in ([], ["--pipeline"]):
+        stats_file_path = str(tmp_path / f"stats_{len(pipeline_args)}.json")
+        results = run_extraction(
+            duplicates_input,
+            "-e",
+            constants.MEMORY_ENGINE,
+            *pipeline_args,
+            "--stats",
+            stats_file_path,
+        )
+        with open(stats_file_path) as stats_file:
+            counters.append((results, json.load(stats_file)["counters"]))
+
+    (expected, expected_counters), (results, results_counters) = counters
+    assert results == expected
+    assert results_counters["records_rejected"] > 0
+    for counter in ("records_parsed", "records_rejected", "records_written"):
+        assert results_counters[counter] == expected_counters[counter]
+
+
+def test_parallel_workers_spilling_keep_the_results(generated_input, run_extraction):
+    # Most of the beacons miss some reading, so they overflow a budget of 1 MB:
+    input_file_path = generated_input(
+        60000, beacons=2000, missing_rate=0.3, disorder_window=3000, duplicate_rate=0.05
+    )
+
+    expected = run_extraction(input_file_path, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(
+        input_file_path,
+        "-e",
+        constants.MEMORY_ENGINE,
+        "-w",
+        "2",
+        "--memory-budget",
+        "1",
+    )
+
+    assert sort_records(results) == sort_records(expected)
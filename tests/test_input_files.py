@@ -0,0 +1,136 @@
+"""Tests the compressed input JSON files, and the runs with many input JSON files"""
+
+import bz2
+import gzip
+import json
+import lzma
+import os
+import typing
+
+import pytest
+
+from src import constants
+from tests.conftest import sort_records
+
+OPENERS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+def split_input(
+    input_file_path: str, parts_count: int, opener: typing.Callable = open
+) -> typing.List[str]:
+    """Splits an input JSON file in consecutive input JSON files
+
+    Every part is an array with a JSON document per line, as the input JSON file.
+
+    Parameters
+    ----------
+    input_file_path : str
+        The input JSON file, with a JSON document per line
+    parts_count : int
+        The number of parts
+    opener : typing.Callable
+        Opens every part for writing, e.g. to compress it
+
+    Returns
+    -------
+    typing.List[str]
+        the paths of the parts.
+    """
+
+    with open(input_file_path) as input_file:
+        lines = [line.strip().rstrip(",") for line in input_file]
+
+    documents = [line for line in lines if line not in ("[", "]", "")]
+    part_size = -(-len(documents) // parts_count)
+    part_file_paths = []
+    for part_index in range(parts_count):
+        part_file_path = f"{input_file_path}.part{part_index}"
+        with opener(part_file_path, "wt") as part_file:
+            part_documents = documents[
+                part_index * part_size : (part_index + 1) * part_size
+            ]
+            part_file.write("[\n" + ",\n".join(part_documents) + "\n]\n")
+
+        part_file_paths.append(part_file_path)
+
+    return part_file_paths
+
+
+@pytest.fixture
+def readings_input(generated_input) -> str:
+    return generated_input(4000, beacons=50, disorder_window=30, duplicate_rate=0.05)
+
+
+@pytest.mark.parametrize("compression", sorted(OPENERS))
+@pytest.mark.parametrize("engine", [constants.MEMORY_ENGINE, constants.HDF5_ENGINE])
+def test_compressed_input(readings_input, run_extraction, compression, engine):
+    compressed_file_path = f"{readings_input}.{compression}"
+    with open(readings_input, "rb") as input_file:
+        with OPENERS[compression](compressed_file_path, "wb") as compressed_file:
+            compressed_file.write(input_file.read())
+
+    expected = run_extraction(readings_input, "-e", engine)
+    results = run_extraction(compressed_file_path, "-e", engine)
+
+    assert len(results) > 0
+    assert results == expected
+
+
+@pytest.mark.parametrize(
+    "read_args, compressed",
+    [
+        ([], True),
+        (["--pipeline"], True),
+        (["--input-format", "stream"], True),
+        (["--mmap"], False),
+        (["--checkpoint-interval", "0"], False),
+        (["-w", "2"], False),
+    ],
+)
+def test_bytes_read_are_the_decompressed_bytes(
+    readings_input, run_extraction, tmp_path, read_args, compressed
+):
+    input_file_path = readings_input
+    if compressed:
+        input_file_path = f"{readings_input}.gz"
+        with open(readings_input, "rb") as input_file:
+            with gzip.open(input_file_path, "wb") as compressed_file:
+                compressed_file.write(input_file.read())
+
+    if "--checkpoint-interval" in read_args:
+        read_args = [*read_args, "--checkpoint-dir", str(tmp_path / "state")]
+
+    stats_file_path = str(tmp_path / "stats.json")
+    run_extraction(input_file_path, *read_args, "--stats", stats_file_path)
+    with open(stats_file_path) as stats_file:
+        counters = json.load(stats_file)["counters"]
+
+    assert counters["bytes_read"] == os.path.getsize(readings_input)
+
+
+def test_many_input_files_are_concatenated(readings_input, run_extraction):
+    part_file_paths = split_input(readings_input, 3)
+
+    expected = run_extraction(readings_input, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(part_file_paths, "-e", constants.MEMORY_ENGINE)
+
+    assert sort_records(results) == sort_records(expected)
+
+
+def test_many_compressed_input_files(readings_input, run_extraction):
+    part_file_paths = split_input(readings_input, 3)
+    part_file_paths[1:2] = split_input(part_file_paths[1], 1, gzip.open)
+
+    expected = run_extraction(readings_input, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(part_file_paths, "-e", constants.MEMORY_ENGINE)
+
+    assert sort_records(results) == sort_records(expected)
+
+
+def test_input_file_glob_pattern(readings_input, run_extraction):
+    part_file_paths = split_input(readings_input, 4)
+
+    expected = run_extraction(part_file_paths, "-e", constants.MEMORY_ENGINE)
+    results = run_extraction(f"{readings_input}.part?", "-e", constants.MEMORY_ENGINE)
+
+    assert results == expected
@@ -0,0 +1,52 @@
+"""Tests the parsing of the lines of the input JSON file, and its counters"""
+
+import json
+
+import pytest
+
+from src.lines_parser import LinesParser
+
+DOCUMENT = {
+    "BeaconId": 208,
+    "ant_id": 201,
+    "dbm_ant": -92.32518086711575,
+    "timestamp": "2016-11-22T09:46:00.000Z",
+}
+
+LINES = [
+    "[\n",
+    json.dumps(DOCUMENT) + ",\n",
+    "\n",
+    # A JSON document that doesn't start the line:
+    "x" + json.dumps(DOCUMENT) + ",\n",
+    # A JSON document without the expected fields:
+    '{"BeaconId": 208},\n',
+    json.dumps(DOCUMENT, separators=(",", ":")) + "\n",
+    "]\n",
+    # The lines after the closing bracket aren't parsed:
+    json.dumps(DOCUMENT) + "\n",
+]
+
+
+@pytest.mark.parametrize("fast_decoder", [False, True])
+def test_lines_are_parsed_and_counted(fast_decoder):
+    lines_parser = LinesParser(fast_decoder)
+
+    json_documents = list(lines_parser._iter_json_documents(LINES))
+
+    assert [json_document.beacon_id for json_document in json_documents] == [208, 208]
+    assert lines_parser._records_parsed_count == 2
+    assert lines_parser._records_rejected_count == 2
+    assert lines_parser._closing_bracket_found
+
+
+def test_blocks_parsers_have_their_own_counters():
+    first_parser = LinesParser()
+    second_parser = LinesParser()
+
+    json_documents, closed = first_parser._parse_lines_block((1, LINES[:3]))
+
+    assert len(json_documents) == 1
+    assert not closed
+    assert first_parser._records_parsed_count == 1
+    assert second_parser._records_parsed_count == 0
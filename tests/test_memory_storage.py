@@ -0,0 +1,95 @@
+"""Tests that spilling partitions to disk doesn't change the results of the memory
+engine
+
+The readings are aggregated directly, by two storages: one whose memory budget keeps
+every open beacon vector in memory, and another one whose budget fits one and a half
+vectors, so almost every reading spills partitions to disk.
+"""
+
+import random
+import typing
+
+import pytest
+
+from src import constants
+from src.memory_storage import MemoryStorage
+
+ANTENNA_IDS = [201, 202, 203, 204, 205, 206]
+DEFAULT_DBM_ANT_VALUE = -105
+
+
+class RecordsCollector:
+    """Collects the results records, in place of an output processor"""
+
+    def __init__(self):
+        self.records = []
+
+    def persist_record(self, record: dict) -> None:
+        self.records.append(record)
+
+
+def aggregate(
+    readings: typing.List[typing.Tuple[int, int, float]], spill: bool
+) -> typing.List[dict]:
+    """Aggregates readings of beacons with the same timestamp
+
+    Parameters
+    ----------
+    readings : typing.List[typing.Tuple[int, int, float]]
+        The BeaconId, the antenna slot and the dbm_ant of every reading
+    spill : bool
+        When True, the memory budget fits one and a half open beacon vectors
+
+    Returns
+    -------
+    typing.List[dict]
+        the results records, in the order they were persisted.
+    """
+
+    collector = RecordsCollector()
+    storage = MemoryStorage(
+        "input.json",
+        collector,
+        DEFAULT_DBM_ANT_VALUE,
+        ANTENNA_IDS,
+        memory_budget=constants.DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024,
+    )
+    if spill:
+        storage._memory_budget = storage._open_vector_size * 3 // 2
+
+    try:
+        for beacon_id, slot, dbm_ant in readings:
+            storage._add_reading((beacon_id, 0), slot, dbm_ant)
+
+        storage.persist_beacons_vectors_to_results_file()
+    finally:
+        storage._close_staging_storage()
+
+    return collector.records
+
+
+def test_spilled_beacon_completed_in_memory_is_persisted_once():
+    readings = [(1, 0, -10.0), (2, 0, -30.0), (3, 0, -30.0)]
+    readings += [(1, slot, -20.0) for slot in range(len(ANTENNA_IDS))]
+
+    records = aggregate(readings, spill=True)
+
+    assert [record["beacon"] for record in records].count(
+        "1, 1970-01-01T00:00:00.000Z"
+    ) == 1
+    assert records == aggregate(readings, spill=False)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_spilling_partitions_keeps_the_results(seed):
+    rng = random.Random(seed)
+    readings = [
+        (rng.randrange(200), rng.randrange(len(ANTENNA_IDS)), rng.uniform(-120, -10))
+        for _ in range(3000)
+    ]
+
+    expected = aggregate(readings, spill=False)
+    records = aggregate(readings, spill=True)
+
+    assert len(records) > 200
+    assert sorted(records, key=repr) == sorted(expected, key=repr)
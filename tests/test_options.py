@@ -0,0 +1,75 @@
+"""Tests the verification of the options that can't be combined"""
+
+import argparse
+import typing
+
+import pytest
+
+from src import constants
+from src import utils
+
+
+def parse_args(
+    *args: str, compression: typing.Optional[str] = None, input_files_count: int = 1
+) -> argparse.Namespace:
+    """Parses the command line's arguments, as main() does before verifying them
+
+    The engine and the number of worker processes are selected, so the execution
+    planner isn't needed.
+    """
+
+    input_file_paths = [f"input_{index}.json" for index in range(input_files_count)]
+    parsed_args = utils.init_argparse().parse_args(
+        ["-e", constants.MEMORY_ENGINE, "-w", "1", *args, *input_file_paths, "."]
+    )
+    assert utils.validate_antenna_schema(parsed_args)
+    parsed_args.compression = compression
+    return parsed_args
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        [],
+        ["-w", "4"],
+        ["--pipeline"],
+        ["--follow", "--allowed-lateness", "60"],
+        ["--checkpoint-dir", "state", "--resume"],
+        ["--sort-by", constants.SORT_BY_BEACON],
+        ["--shard-by", constants.SHARD_BY_HOUR],
+    ],
+)
+def test_compatible_options(args):
+    assert utils.validate_options(parse_args(*args))
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-e", constants.HDF5_ENGINE, "-w", "2"],
+        ["--input-format", constants.STREAM_INPUT_FORMAT, "--mmap"],
+        ["--pipeline", "-w", "2"],
+        ["--follow", "--mmap"],
+        ["-e", constants.COLUMNAR_ENGINE, "--follow"],
+        ["--allowed-lateness", "-1"],
+        ["--resume"],
+        ["--checkpoint-dir", "state", "--pipeline"],
+        ["--sort-by", constants.SORT_BY_BEACON, "--follow"],
+        ["--shard-by", constants.SHARD_BY_HOUR, "--sort-by", constants.SORT_BY_BEACON],
+        ["--shard-by", constants.SHARD_BY_BEACON, "--shards", "0"],
+    ],
+)
+def test_incompatible_options(args):
+    assert not utils.validate_options(parse_args(*args))
+
+
+@pytest.mark.parametrize("args", [["--pipeline"], ["--follow"]])
+def test_many_input_files_options(args):
+    assert utils.validate_options(parse_args(input_files_count=3))
+    assert not utils.validate_options(parse_args(*args, input_files_count=3))
+
+
+@pytest.mark.parametrize("args", [["-w", "2"], ["--checkpoint-dir", "state"]])
+def test_compressed_input_options(args):
+    assert utils.validate_options(parse_args(compression="gzip"))
+    assert not utils.validate_options(parse_args(*args, compression="gzip"))
@@ -0,0 +1,104 @@
+"""Tests the sampling of the input, and the execution plans"""
+
+import argparse
+import json
+
+import pytest
+
+from src import constants
+from src import planner
+from src import utils
+
+
+def parse_args(*args: str) -> argparse.Namespace:
+    """Parses the command line's arguments, as main() does before planning"""
+
+    parsed_args = utils.init_argparse().parse_args([*args, "input.json", "."])
+    assert utils.validate_antenna_schema(parsed_args)
+    return parsed_args
+
+
+@pytest.mark.parametrize(
+    "layout, line_delimited",
+    [("lines", True), ("pretty", False), ("minified", False)],
+)
+def test_sample_detects_the_layout(generated_input, layout, line_delimited):
+    input_file_path = generated_input(2000, layout=layout)
+
+    sample = planner.sample_input([input_file_path], constants.ANTENNA_IDS)
+
+    assert sample.sample_readings == 2000
+    assert sample.line_delimited is line_delimited
+
+
+@pytest.mark.parametrize("layout", ["pretty", "minified"])
+def test_documents_not_in_their_own_lines_are_streamed(
+    generated_input, run_extraction, layout
+):
+    expected = run_extraction(
+        generated_input(2000, layout=layout), "--input-format", "stream"
+    )
+    results = run_extraction(generated_input(2000, layout=layout))
+
+    assert len(results) > 0
+    assert results == expected
+
+
+def test_peak_open_beacons_is_estimated(generated_input, run_extraction, tmp_path):
+    input_file_path = generated_input(40000, beacons=300, disorder_window=100)
+    stats_file_path = str(tmp_path / "stats.json")
+    run_extraction(input_file_path, "-e", "memory", "--stats", stats_file_path)
+    with open(stats_file_path) as stats_file:
+        peak_open_beacons = json.load(stats_file)["counters"]["peak_open_beacons"]
+
+    sample = planner.sample_input(
+        [input_file_path], constants.ANTENNA_IDS, sample_size=128 * 1024
+    )
+
+    assert sample.sample_readings < 40000
+    assert sample.estimated_peak_open_beacons < sample.estimated_beacons
+    assert sample.estimated_peak_open_beacons == pytest.approx(
+        peak_open_beacons, rel=0.2
+    )
+
+
+def test_complete_beacons_stay_in_memory():
+    args = parse_args("--memory-budget", "1")
+    sample = planner.InputSample(
+        input_bytes=1024 * planner.MEGABYTE,
+        compressed=False,
+        sample_bytes=planner.MEGABYTE,
+        average_line_bytes=100,
+        sample_readings=10000,
+        sample_beacons=2000,
+        sample_open_beacons=50,
+        open_beacons_growth=0.0,
+        line_delimited=True,
+    )
+
+    execution_plan = planner.create_plan(args, sample, None, 1)
+
+    assert sample.estimated_beacons > 1000000
+    assert sample.estimated_peak_open_beacons == 50
+    assert execution_plan.engine == constants.MEMORY_ENGINE
+    assert execution_plan.input_format == constants.LINES_INPUT_FORMAT
+
+
+def test_open_beacons_that_dont_fit_are_partitioned():
+    args = parse_args("--memory-budget", "1")
+    sample = planner.InputSample(
+        input_bytes=1024 * planner.MEGABYTE,
+        compressed=False,
+        sample_bytes=planner.MEGABYTE,
+        average_line_bytes=100,
+        sample_readings=10000,
+        sample_beacons=2000,
+        sample_open_beacons=1000,
+        open_beacons_growth=0.1,
+        line_delimited=False,
+    )
+
+    execution_plan = planner.create_plan(args, sample, None, 1)
+
+    assert execution_plan.engine == constants.PARTITIONED_ENGINE
+    assert execution_plan.input_format == constants.STREAM_INPUT_FORMAT
@@ -0,0 +1,66 @@
+"""Tests the results sharded by time, when more shards receive records than can be open
+
+The records of every hour are received interleaved with the ones of the other hours,
+so the least recently used shards are closed, and reopened, many times.
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from src import constants
+from src import timestamps
+from src.sharded_output_processor import ShardedOutputProcessor
+
+HOURS_COUNT = 5
+NANOSECONDS_PER_MINUTE = 60 * timestamps.NANOSECONDS_PER_SECOND
+
+
+@pytest.mark.parametrize("output_format", constants.OUTPUT_FORMATS)
+def test_closed_shards_are_reopened(tmp_path, monkeypatch, output_format):
+    monkeypatch.setattr(ShardedOutputProcessor, "MAX_OPEN_TIME_SHARDS", 2)
+    output_processor = ShardedOutputProcessor(
+        str(tmp_path),
+        "results.json",
+        constants.SHARD_BY_HOUR,
+        output_format=output_format,
+    )
+    output_processor.initialize()
+    expected = {}
+    for minute in range(0, 60, 3):
+        for hour in range(HOURS_COUNT):
+            epoch_ns = (hour * 60 + minute) * NANOSECONDS_PER_MINUTE
+            record = {
+                "beacon": f"{100 + hour}, {timestamps.format_timestamp(epoch_ns)}",
+                "vector": [-20.5, -135, float(minute)],
+            }
+            output_processor.persist_record(record)
+            expected.setdefault(hour, []).append(record)
+
+        assert len(output_processor._shards) <= 2
+        pipeline_writers = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "pipeline-writer"
+        ]
+        assert len(pipeline_writers) <= 2
+
+    output_processor.close()
+
+    with open(tmp_path / constants.MANIFEST_FILE_NAME) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    assert manifest["records"] == HOURS_COUNT * 20
+    assert len(manifest["shards"]) == HOURS_COUNT
+    for hour, shard in enumerate(manifest["shards"]):
+        assert shard["records"] == 20
+        assert shard["beacon_ids"] == [100 + hour, 100 + hour]
+        with open(os.path.join(tmp_path, shard["file"])) as shard_file:
+            if output_format == constants.NDJSON_OUTPUT_FORMAT:
+                records = [json.loads(line) for line in shard_file]
+            else:
+                records = json.load(shard_file)
+
+        assert records == expected[hour]
@@ -0,0 +1,77 @@
+"""Tests the conversion of the timestamps into epoch nanoseconds, and back"""
+
+import datetime
+import random
+
+import pytest
+
+from src import timestamps
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        "2016-11-22T09:47:00.000Z",
+        "1970-01-01T00:00:00.000Z",
+        "1969-12-31T23:59:59.999Z",
+        "2000-02-29T12:30:15.123456Z",
+        "2016-11-22T09:47:00.123456789Z",
+        "9999-12-31T23:59:59.999Z",
+    ],
+)
+def test_formatted_timestamps_round_trip(timestamp):
+    epoch_ns = timestamps.parse_timestamp(timestamp)
+
+    assert timestamps.format_timestamp(epoch_ns) == timestamp
+
+
+def test_epoch_nanoseconds_round_trip():
+    rng = random.Random(0)
+    for _ in range(1000):
+        epoch_ns = rng.randrange(-(10**18), 10**18)
+        timestamp = timestamps.format_timestamp(epoch_ns)
+
+        assert timestamps.parse_timestamp(timestamp) == epoch_ns
+
+
+def test_epoch_nanoseconds_match_datetime():
+    instant = datetime.datetime(2016, 11, 22, 9, 47, 0, 250000, datetime.timezone.utc)
+
+    epoch_ns = timestamps.parse_timestamp("2016-11-22T09:47:00.25Z")
+
+    assert epoch_ns == round(instant.timestamp() * 10**6) * 1000
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        "2016-11-22T09:47:00.00Z",
+        "2016-11-22T09:47:00.000000Z",
+        "2016-11-22T09:47:00Z",
+        "2016-11-22T09:47:00",
+        "2016-11-22 09:47:00.000Z",
+        "2016-11-22T10:47:00.000+01:00",
+        "2016-11-22T08:17:00.000-0130",
+    ],
+)
+def test_equivalent_timestamps_are_the_same_instant(timestamp):
+    assert timestamps.parse_timestamp(timestamp) == timestamps.parse_timestamp(
+        "2016-11-22T09:47:00.000Z"
+    )
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        "",
+        "not a timestamp",
+        "2016-11-22",
+        "2016-02-30T09:47:00.000Z",
+        "2016-11-22T24:00:00.000Z",
+        "2016-11-22T09:60:00.000Z",
+        "2016-11-22T09:47:00.0000000000Z",
+        "2016-11-22T09:47:00.000Zulu",
+    ],
+)
+def test_invalid_timestamps_are_rejected(timestamp):
+    assert timestamps.parse_timestamp(timestamp) is None